@@ -0,0 +1,654 @@
+"""Micro benchmarks of the hot helpers in cogs.utils and bot.py, run through ``launcher.py benchmark``.
+
+These run against inventories shaped like the real ones: RTFM is made up of
+the dotted names of the installed packages, timezones come from the zone
+file the Reminder cog uses and the weapons and gear are generated from
+Splatoon-like words. Config files are filled with guild prefixes and
+command traffic comes from a stream of synthetic authors. Log records look
+like the line Stats.register_command writes for every command and jsonb
+values like the reminders and profiles extra columns.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from typing import Any, Callable, Iterable, Iterator
+
+import asyncio
+import contextlib
+import importlib
+import inspect
+import json
+import logging
+import os
+import pkgutil
+import random
+import tempfile
+import time
+import tracemalloc
+
+from cogs.utils import config, db, fuzzy
+from cogs.utils.formats import TabularData
+from cogs.utils.telemetry import percentile
+
+RTFM_PACKAGES = ('discord', 'asyncio', 'asyncpg', 'typing', 'collections', 'json', 'os', 're', 'email', 'http', 'urllib')
+
+# fmt: off
+WEAPON_WORDS = (
+    'Splattershot', 'Splat', 'Roller', 'Charger', 'Dualies', 'Brella', 'Blaster', 'Slosher', 'Splatling', 'Brush',
+    'Stringer', 'Splatana', 'Jr.', 'Pro', 'Nova', 'Luna', 'Rapid', 'Range', 'Clash', 'Tri', 'Heavy', 'Mini', 'Hydra',
+    'Ballpoint', 'Nautilus', 'Carbon', 'Dynamo', 'Flingza', 'Inkbrush', 'Octobrush', 'Squiffer', 'Bamboozler', 'Goo',
+    'Tuber', 'Explosher', 'Sloshing', 'Machine', 'Tenta', 'Undercover', 'Glooga', 'Dapple', 'Dark', 'Tetra', 'Custom',
+    'Deco', 'Sheldon', 'Kensa', 'Forge', 'Zink', 'Neo', 'Foil', 'Nouveau', 'Sorella', 'Gold', 'Tentatek',
+)
+
+GEAR_WORDS = (
+    'Cap', 'Hat', 'Beanie', 'Headband', 'Visor', 'Goggles', 'Shirt', 'Tee', 'Hoodie', 'Jacket', 'Vest', 'Sweater',
+    'Sneakers', 'Boots', 'Shoes', 'Slip-Ons', 'Loafers', 'Moto', 'Squid', 'Octo', 'Retro', 'Camo', 'Striped', 'Black',
+    'White', 'Red', 'Blue', 'Yellow', 'Pink', 'Green', 'Zekko', 'Forge', 'Rockenberg', 'Takoroka', 'Krak-On', 'Firefin',
+    'Inkline', 'Tentatek', 'Splash', 'Mountain', 'Urchin', 'Hero', 'Annaki', 'Enperry', 'Barazushi', 'Emberz',
+)
+# fmt: on
+
+
+def rtfm_inventory(size: int, rng: random.Random) -> list[str]:
+    """Returns up to ``size`` RTFM-like entries, such as ``Client.fetch_guild``."""
+    names: set[str] = set()
+
+    def visit(module: Any, prefix: str) -> None:
+        for name, value in vars(module).items():
+            if name.startswith('_'):
+                continue
+            names.add(f'{prefix}{name}')
+            if inspect.isclass(value):
+                for attr in vars(value):
+                    if not attr.startswith('_'):
+                        names.add(f'{prefix}{name}.{attr}')
+
+    for package in RTFM_PACKAGES:
+        try:
+            module = importlib.import_module(package)
+        except ImportError:
+            continue
+
+        # discord.py entries don't have the discord namespace, like the real inventory
+        visit(module, '' if package == 'discord' else f'{package}.')
+        for info in pkgutil.walk_packages(getattr(module, '__path__', []), prefix=f'{package}.'):
+            try:
+                submodule = importlib.import_module(info.name)
+            except Exception:
+                continue
+            visit(submodule, f'{info.name}.')
+
+    inventory = sorted(names)
+    rng.shuffle(inventory)
+    while len(inventory) < size:
+        # pad with labels, Sphinx inventories have plenty of those
+        inventory.append(f'label:{rng.choice(inventory)}-{len(inventory)}')
+    return inventory[:size]
+
+
+def timezone_inventory() -> list[str]:
+    from dateutil.zoneinfo import get_zonefile_instance
+
+    return sorted(get_zonefile_instance().zones)
+
+
+def word_inventory(words: Iterable[str], size: int, rng: random.Random) -> list[str]:
+    words = list(words)
+    inventory: set[str] = set()
+    while len(inventory) < size:
+        inventory.add(' '.join(rng.sample(words, rng.randint(1, 3))))
+    return sorted(inventory)
+
+
+def make_queries(inventory: list[str], count: int, rng: random.Random) -> list[str]:
+    """Returns what a user would type: a slice of an entry, maybe with a typo in it."""
+    queries = []
+    for _ in range(count):
+        entry = rng.choice(inventory)
+        start = rng.randint(0, max(len(entry) - 4, 0))
+        query = entry[start : start + rng.randint(3, 12)]
+        if len(query) > 4 and rng.random() < 0.3:
+            index = rng.randrange(len(query))
+            query = query[:index] + query[index + 1 :]
+        queries.append(query)
+    return queries
+
+
+def timed(func: Callable[[str], Any], queries: list[str]) -> float:
+    """Returns the average milliseconds ``func`` took per query."""
+    start = time.perf_counter()
+    for query in queries:
+        func(query)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def fuzzy_suite(*, size: int, queries: int, seed: int) -> TabularData:
+    rng = random.Random(seed)
+    inventories = {
+        'RTFM': rtfm_inventory(size, rng),
+        'Timezones': timezone_inventory(),
+        'Weapons': word_inventory(WEAPON_WORDS, 150, rng),
+        'Gear': word_inventory(GEAR_WORDS, 1500, rng),
+    }
+
+    table = TabularData()
+    table.set_columns(['Inventory', 'Items', 'Operation', 'Before (ms)', 'Index (ms)', 'Speedup'])
+    for name, inventory in inventories.items():
+        start = time.perf_counter()
+        index = fuzzy.FuzzyIndex(inventory)
+        build = (time.perf_counter() - start) * 1000
+        table.add_row([name, len(inventory), 'build index', '-', f'{build:.2f}', '-'])
+
+        sample = make_queries(inventory, queries, rng)
+        operations: list[tuple[str, Callable[[str], Any], Callable[[str], Any]]] = [
+            (
+                'finder top 10',
+                lambda q: fuzzy.finder(q, inventory)[:10],
+                lambda q: index.finder(q, limit=10),
+            ),
+            (
+                'extract quick_ratio',
+                lambda q: fuzzy.extract(q, inventory),
+                lambda q: index.extract(q),
+            ),
+            (
+                'extract token_sort_ratio >= 60',
+                lambda q: fuzzy.extract(q, inventory, scorer=fuzzy.token_sort_ratio, score_cutoff=60),
+                lambda q: index.extract(q, scorer=fuzzy.token_sort_ratio, score_cutoff=60),
+            ),
+        ]
+
+        for operation, before, after in operations:
+            for query in sample:
+                expected = before(query)
+                got = after(query)
+                if isinstance(got, list) and got and isinstance(got[0], tuple):
+                    got = [(string, score) for string, score, _ in got]
+                if expected != got:
+                    raise RuntimeError(f'{operation} on {name} gave different results for {query!r}')
+
+            old = timed(before, sample)
+            new = timed(after, sample)
+            table.add_row([name, len(inventory), operation, f'{old:.2f}', f'{new:.2f}', f'{old / new:.1f}x'])
+
+    return table
+
+
+SCORE_CUTOFF = 40
+
+
+def legacy_extract_matches(query: str, choices: list[str], scorer: Callable[[str, str], int]) -> list[tuple[str, int]]:
+    """fuzzy.extract_matches scoring every choice with the scorer."""
+    matches = fuzzy.extract(query, choices, scorer=scorer, score_cutoff=SCORE_CUTOFF, limit=None)
+    return [match for match in matches if match[1] == matches[0][1]]
+
+
+def scorers_suite(*, size: int, queries: int, seed: int) -> TabularData:
+    rng = random.Random(seed)
+    choices = rtfm_inventory(size, rng)
+    sample = make_queries(choices, queries, rng)
+    scorers = [
+        fuzzy.ratio,
+        fuzzy.quick_ratio,
+        fuzzy.partial_ratio,
+        fuzzy.token_sort_ratio,
+        fuzzy.partial_token_sort_ratio,
+    ]
+
+    table = TabularData()
+    table.set_columns(['Scorer', 'Choices', 'Operation', 'Before (ms)', 'Batch (ms)', 'Speedup'])
+    for scorer in scorers:
+        operations: list[tuple[str, Callable[[str], Any], Callable[[str], Any]]] = [
+            (
+                f'score_many >= {SCORE_CUTOFF}',
+                lambda q: [s if s >= SCORE_CUTOFF else 0 for s in (scorer(q, choice) for choice in choices)],
+                lambda q: fuzzy.score_many(q, choices, scorer=scorer, score_cutoff=SCORE_CUTOFF),
+            ),
+            (
+                'extract_matches',
+                lambda q: legacy_extract_matches(q, choices, scorer),
+                lambda q: fuzzy.extract_matches(q, choices, scorer=scorer, score_cutoff=SCORE_CUTOFF),
+            ),
+        ]
+
+        for operation, before, after in operations:
+            for query in sample:
+                if before(query) != after(query):
+                    raise RuntimeError(f'{operation} with {scorer.__name__} gave different results for {query!r}')
+
+            old = timed(before, sample)
+            new = timed(after, sample)
+            name = scorer.__name__
+            table.add_row([name, len(choices), operation, f'{old:.2f}', f'{new:.2f}', f'{old / new:.1f}x'])
+
+    return table
+
+
+JOURNAL_SIZES = (10_000, 100_000, 1_000_000)
+
+
+def prefix_document(size: int, rng: random.Random) -> dict[str, list[str]]:
+    """Returns a prefixes.json-like document with ``size`` guilds."""
+    prefixes = ['?', '!', '$', '>>', 'rd ', 'danny ']
+    return {str(rng.getrandbits(63)): rng.sample(prefixes, rng.randint(1, 3)) for _ in range(size)}
+
+
+async def time_config_writes(document: dict[str, Any], puts: int, rng: random.Random, *, journal: bool) -> list[float]:
+    """Returns the milliseconds a single put, a burst of ``puts`` concurrent puts and reloading took."""
+    with open('config.json', 'w', encoding='utf-8') as fp:
+        json.dump(document, fp, separators=(',', ':'))
+    with contextlib.suppress(FileNotFoundError):
+        os.remove('config.json.journal')
+
+    storage = config.JSONStorage('config.json', journal=journal)
+    expected = dict(document)
+    keys = rng.sample(list(document), puts)
+
+    start = time.perf_counter()
+    await storage.put(keys[0], ['?'])
+    single = time.perf_counter() - start
+    expected[keys[0]] = ['?']
+
+    start = time.perf_counter()
+    await asyncio.gather(*(storage.put(key, ['!']) for key in keys))
+    burst = time.perf_counter() - start
+    expected.update((key, ['!']) for key in keys)
+
+    start = time.perf_counter()
+    reloaded = config.JSONStorage('config.json', journal=journal)
+    load = time.perf_counter() - start
+    if reloaded.all() != expected:
+        raise RuntimeError(f'{"journal" if journal else "rewrite"} lost writes with {len(document)} keys')
+
+    return [single * 1000, burst * 1000, load * 1000]
+
+
+def journal_suite(*, size: int, queries: int, seed: int) -> TabularData:
+    """Compares rewriting the whole file against journal mode at 10k, 100k and 1M keys.
+
+    ``size`` is ignored since the interesting part is how the costs scale.
+    """
+    rng = random.Random(seed)
+    table = TabularData()
+    table.set_columns(['Keys', 'Mode', 'Single put (ms)', f'{queries} concurrent puts (ms)', 'Reload (ms)'])
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        # the temporary file Config writes is named relative to the current directory
+        os.chdir(directory)
+        try:
+            for keys in JOURNAL_SIZES:
+                document = prefix_document(keys, rng)
+                for journal in (False, True):
+                    timings = asyncio.run(time_config_writes(document, queries, rng, journal=journal))
+                    mode = 'journal' if journal else 'rewrite'
+                    table.add_row([keys, mode, *(f'{timing:.1f}' for timing in timings)])
+        finally:
+            os.chdir(cwd)
+
+    return table
+
+
+SPAM_CHECKPOINTS = (10_000, 100_000, 1_000_000)
+# the CooldownMapping scans every live bucket on each lookup, past this it takes minutes
+LEGACY_SPAM_AUTHORS = 100_000
+
+
+def command_traffic(authors: int, rng: random.Random) -> Iterator[tuple[int, float, int]]:
+    """Yields ``(author_id, timestamp, authors seen so far)`` for every command.
+
+    A hundred new authors show up every second. Most use a single command
+    but one in a hundred spams twelve at once and never comes back.
+    """
+    for index in range(authors):
+        current = index / 100
+        author_id = rng.getrandbits(63)
+        for _ in range(12 if rng.random() < 0.01 else 1):
+            yield author_id, current, index + 1
+
+
+class LegacySpamControl:
+    """What process_commands did before SpamControl, a CooldownMapping and a strike Counter."""
+
+    def __init__(self) -> None:
+        from discord.ext import commands
+
+        self.mapping = commands.CooldownMapping.from_cooldown(10, 12.0, commands.BucketType.user)
+        self.strikes: Counter[int] = Counter()
+        # reused for every command since the mapping only looks at message.author.id
+        self.message = type('Message', (), {'author': type('Author', (), {'id': 0})()})()
+
+    def __len__(self) -> int:
+        return len(self.mapping._cache) + len(self.strikes)
+
+    def handle(self, author_id: int, current: float) -> int:
+        self.message.author.id = author_id
+        bucket = self.mapping.get_bucket(self.message, current)
+        if bucket and bucket.update_rate_limit(current):
+            self.strikes[author_id] += 1
+            strikes = self.strikes[author_id]
+            if strikes >= 5:
+                del self.strikes[author_id]
+            return strikes
+
+        self.strikes.pop(author_id, None)
+        return 0
+
+
+class BoundedSpamControl:
+    def __init__(self) -> None:
+        from bot import SpamControl
+
+        self.control = SpamControl(10, 12.0)
+
+    def __len__(self) -> int:
+        return len(self.control)
+
+    def handle(self, author_id: int, current: float) -> int:
+        if self.control.update_rate_limit(author_id, current):
+            strikes = self.control.add_strike(author_id)
+            if strikes >= 5:
+                self.control.clear_strikes(author_id)
+            return strikes
+
+        self.control.clear_strikes(author_id)
+        return 0
+
+
+def run_spam_traffic(
+    factory: Callable[[], Any], authors: int, seed: int, *, trace: bool
+) -> tuple[list[list[Any]], list[int]]:
+    """Feeds the traffic to a new spam control.
+
+    Returns a row for each checkpoint and, unless tracing, the strikes after every command.
+    """
+    if trace:
+        tracemalloc.start()
+
+    control = factory()
+    rows: list[list[Any]] = []
+    results: list[int] = []
+    checkpoints = [checkpoint for checkpoint in SPAM_CHECKPOINTS if checkpoint <= authors]
+    commands = 0
+    start = time.perf_counter()
+    for author_id, current, seen in command_traffic(authors, random.Random(seed)):
+        if seen > checkpoints[0]:
+            elapsed = time.perf_counter() - start
+            memory = tracemalloc.get_traced_memory()[0] // 1024 if trace else 0
+            rows.append([checkpoints.pop(0), len(control), memory, elapsed * 1e6 / commands])
+
+        strikes = control.handle(author_id, current)
+        if not trace:
+            results.append(strikes)
+        commands += 1
+
+    elapsed = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0] // 1024 if trace else 0
+    rows.append([checkpoints.pop(0), len(control), memory, elapsed * 1e6 / commands])
+    if trace:
+        tracemalloc.stop()
+    return rows, results
+
+
+def spam_suite(*, size: int, queries: int, seed: int) -> TabularData:
+    """Feeds up to a million distinct authors through the spam control that process_commands uses.
+
+    The entry count and memory should stay flat once the oldest authors
+    start to expire. ``size`` and ``queries`` are ignored.
+    """
+    table = TabularData()
+    table.set_columns(['Implementation', 'Authors', 'Entries', 'Memory (KiB)', 'Per command (us)'])
+
+    implementations = [
+        ('CooldownMapping + Counter', LegacySpamControl, LEGACY_SPAM_AUTHORS),
+        ('SpamControl', BoundedSpamControl, SPAM_CHECKPOINTS[-1]),
+    ]
+    expected: list[int] = []
+    for name, factory, authors in implementations:
+        # memory is measured in a second pass since tracing slows everything down
+        timings, results = run_spam_traffic(factory, authors, seed, trace=False)
+        memory, _ = run_spam_traffic(factory, authors, seed, trace=True)
+        if expected and results[: len(expected)] != expected:
+            raise RuntimeError(f'{name} gave different strikes than the CooldownMapping')
+        expected = results
+
+        for (authors, entries, _, per_command), (_, _, kib, _) in zip(timings, memory):
+            table.add_row([name, authors, entries, kib, f'{per_command:.2f}'])
+
+    return table
+
+
+LOG_RATES = (10_000, 100_000)
+LOG_SECONDS = 2.0
+
+
+class _CountingFilter(logging.Filter):
+    def __init__(self) -> None:
+        super().__init__()
+        self.count: int = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        self.count += 1
+        return True
+
+
+def emit_records(logger: logging.Logger, rate: int, rng: random.Random) -> list[float]:
+    """Logs at ``rate`` records a second for ``LOG_SECONDS`` and returns how long each call took."""
+    latencies: list[float] = []
+    interval = 1 / rate
+    start = time.perf_counter()
+    for index in range(int(rate * LOG_SECONDS)):
+        delay = start + index * interval - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        before = time.perf_counter()
+        logger.info('%s used %s in %s (ID: %s)', rng.getrandbits(63), 'tag', rng.getrandbits(63), rng.getrandbits(63))
+        latencies.append(time.perf_counter() - before)
+    return latencies
+
+
+def logging_suite(*, size: int, queries: int, seed: int) -> TabularData:
+    """Compares logging straight to a rotating file with the queue that setup_logging uses.
+
+    Records are logged for two seconds at 10k and 100k records a second.
+    The files rotate every MiB to include the cost of rotating them.
+    ``size`` and ``queries`` are ignored.
+    """
+    from logging.handlers import QueueListener, RotatingFileHandler
+    import queue
+
+    from launcher import NonBlockingQueueHandler
+
+    rng = random.Random(seed)
+    table = TabularData()
+    table.set_columns(['Setup', 'Rate', 'p50 (us)', 'p99 (us)', 'Max (us)', 'Written', 'Dropped', 'Drain (ms)'])
+    fmt = logging.Formatter('[{asctime}] [{levelname:<7}] {name}: {message}', '%Y-%m-%d %H:%M:%S', style='{')
+
+    with tempfile.TemporaryDirectory() as directory:
+        for rate in LOG_RATES:
+            for setup in ('RotatingFileHandler', 'QueueListener'):
+                logger = logging.getLogger(f'benchmarks.logging.{setup}.{rate}')
+                logger.propagate = False
+                logger.setLevel(logging.INFO)
+                filename = os.path.join(directory, f'{setup}-{rate}.log')
+                file_handler = RotatingFileHandler(filename, encoding='utf-8', maxBytes=1024 * 1024, backupCount=2)
+                file_handler.setFormatter(fmt)
+                written = _CountingFilter()
+                file_handler.addFilter(written)
+
+                listener = queue_handler = None
+                if setup == 'QueueListener':
+                    max_records = 10_000
+                    queue_handler = NonBlockingQueueHandler(queue.Queue(max_records), high_water=max_records // 2)
+                    listener = QueueListener(queue_handler.queue, file_handler, respect_handler_level=True)
+                    logger.addHandler(queue_handler)
+                    listener.start()
+                else:
+                    logger.addHandler(file_handler)
+
+                latencies = sorted(emit_records(logger, rate, rng))
+                start = time.perf_counter()
+                if listener is not None:
+                    listener.stop()
+                drain = time.perf_counter() - start
+                file_handler.close()
+
+                dropped = queue_handler.dropped if queue_handler is not None else 0
+                lost = len(latencies) - written.count - dropped
+                if lost:
+                    raise RuntimeError(f'{setup} lost {lost} records without counting them')
+
+                table.add_row(
+                    [
+                        setup,
+                        rate,
+                        f'{percentile(latencies, 50) * 1e6:.1f}',
+                        f'{percentile(latencies, 99) * 1e6:.1f}',
+                        f'{latencies[-1] * 1e6:.1f}',
+                        written.count,
+                        dropped,
+                        f'{drain * 1000:.1f}',
+                    ]
+                )
+
+    return table
+
+
+JSONB_ITERATIONS = 100_000
+
+
+def jsonb_payloads(rng: random.Random) -> dict[str, Any]:
+    text = ' '.join(rng.choice(WEAPON_WORDS) for _ in range(40))
+    return {
+        'tempban timer': {'args': [rng.getrandbits(63), rng.getrandbits(63), rng.getrandbits(63)], 'kwargs': {}},
+        'reminder timer': {
+            'args': [rng.getrandbits(63), rng.getrandbits(63), text],
+            'kwargs': {'message_id': rng.getrandbits(63)},
+        },
+        'profile extra': {
+            'sp3_weapon': {'name': 'Splattershot Jr.', 'sub': 'Splat Bomb', 'special': 'Big Bubbler'},
+            'sp3_rank': {'grade': 'S+', 'number': 50},
+        },
+    }
+
+
+def jsonb_suite(*, size: int, queries: int, seed: int) -> TabularData:
+    """Compares the old text jsonb codec built on the json module with the binary one in cogs.utils.db.
+
+    The binary codec uses orjson when it's installed. ``size`` and ``queries`` are ignored.
+    """
+    rng = random.Random(seed)
+    backend = 'orjson' if db.orjson is not None else 'json'
+    table = TabularData()
+    table.set_columns(['Payload', 'Bytes', 'Operation', 'Text json (us)', f'Binary {backend} (us)', 'Speedup'])
+    for name, payload in jsonb_payloads(rng).items():
+        text = json.dumps(payload)
+        binary = db.encode_jsonb(payload)
+        if db.decode_jsonb(binary) != json.loads(text):
+            raise RuntimeError(f'The binary codec changed the {name} payload')
+
+        operations: list[tuple[str, Callable[[], Any], Callable[[], Any]]] = [
+            ('encode', lambda: json.dumps(payload), lambda: db.encode_jsonb(payload)),
+            ('decode', lambda: json.loads(text), lambda: db.decode_jsonb(binary)),
+        ]
+        for operation, before, after in operations:
+            timings = []
+            for func in (before, after):
+                start = time.perf_counter()
+                for _ in range(JSONB_ITERATIONS):
+                    func()
+                timings.append((time.perf_counter() - start) * 1e6 / JSONB_ITERATIONS)
+
+            old, new = timings
+            table.add_row([name, len(binary), operation, f'{old:.2f}', f'{new:.2f}', f'{old / new:.1f}x'])
+
+    return table
+
+
+EXPIRING_SIZES = (1_000, 10_000, 100_000)
+EXPIRING_LOOKUPS = 1_000
+
+
+class LegacyExpiringCache(dict):
+    """ExpiringCache as it was before, every lookup scans all entries for expired ones."""
+
+    def __init__(self, seconds: float):
+        self.__ttl: float = seconds
+        super().__init__()
+
+    def __verify_cache_integrity(self):
+        current_time = time.monotonic()
+        to_remove = [k for (k, (v, t)) in super().items() if current_time > (t + self.__ttl)]
+        for k in to_remove:
+            del self[k]
+
+    def __contains__(self, key: Any):
+        self.__verify_cache_integrity()
+        return super().__contains__(key)
+
+    def __getitem__(self, key: Any):
+        self.__verify_cache_integrity()
+        v, _ = super().__getitem__(key)
+        return v
+
+    def __setitem__(self, key: Any, value: Any):
+        super().__setitem__(key, (value, time.monotonic()))
+
+
+def expiring_suite(*, size: int, queries: int, seed: int) -> TabularData:
+    """Times lookups in an ExpiringCache holding a thousand to a hundred thousand live entries.
+
+    The old cache scanned every entry on each lookup so it got slower the
+    more it held, the current one should take the same time at every size.
+    ``size`` and ``queries`` are ignored.
+    """
+    from cogs.utils.cache import ExpiringCache
+
+    rng = random.Random(seed)
+    table = TabularData()
+    table.set_columns(['Entries', 'Operation', 'Old (us)', 'ExpiringCache (us)', 'Speedup'])
+    for entries in EXPIRING_SIZES:
+        keys = [rng.getrandbits(63) for _ in range(entries)]
+        lookups = [rng.choice(keys) for _ in range(EXPIRING_LOOKUPS)]
+        caches = []
+        for factory in (LegacyExpiringCache, ExpiringCache):
+            cache = factory(3600.0)
+            for key in keys:
+                cache[key] = key
+            caches.append(cache)
+
+        old, new = caches
+        if [old[key] for key in lookups[:10]] != [new[key] for key in lookups[:10]]:
+            raise RuntimeError('ExpiringCache returned different values than the old cache')
+
+        operations: list[tuple[str, Callable[[Any, Any], Any]]] = [
+            ('contains', lambda cache, key: key in cache),
+            ('getitem', lambda cache, key: cache[key]),
+            ('setitem', lambda cache, key: cache.__setitem__(key, key)),
+        ]
+        for operation, func in operations:
+            timings = []
+            for cache in caches:
+                start = time.perf_counter()
+                for key in lookups:
+                    func(cache, key)
+                timings.append((time.perf_counter() - start) * 1e6 / len(lookups))
+
+            before, after = timings
+            table.add_row([entries, operation, f'{before:.2f}', f'{after:.2f}', f'{before / after:.1f}x'])
+
+    return table
+
+
+SUITES: dict[str, Callable[..., TabularData]] = {
+    'fuzzy': fuzzy_suite,
+    'scorers': scorers_suite,
+    'journal': journal_suite,
+    'spam': spam_suite,
+    'logging': logging_suite,
+    'jsonb': jsonb_suite,
+    'expiring': expiring_suite,
+}
@@ -1,21 +1,33 @@
 from __future__ import annotations
 
 from discord.ext import commands
+from discord.ext.commands.view import StringView
 import discord
+from cogs.utils.bus import Bus
+from cogs.utils import cache
+from cogs.utils.cache import ExpiringCache
 from cogs.utils.config import Config
 from cogs.utils.context import Context
-import datetime
+from cogs.utils.formats import TabularData
+from cogs.utils.telemetry import GatewayTelemetry, LoopLagMonitor
+import asyncio
+import contextvars
 import logging
 import traceback
+import re
+import heapq
+import time
 import aiohttp
 import sys
-from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Coroutine, Iterable, Optional, Union
-from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Coroutine, Iterable, Iterator, Optional, Union
+from collections import Counter, OrderedDict
+from functools import partial
 
 import config
-import asyncpg
 
 if TYPE_CHECKING:
+    from cogs.utils.db import Pool
+    from launcher import IdentifyGate
     from cogs.reminder import Reminder
     from cogs.config import Config as ConfigCog
 
@@ -51,6 +63,10 @@ initial_extensions = (
     'cogs.dictionary',
 )
 
+# extension: the extensions that have to be loaded before it
+# anything not listed here is loaded concurrently with the rest
+extension_dependencies: dict[str, tuple[str, ...]] = {}
+
 
 def _prefix_callable(bot: RoboDanny, msg: discord.Message):
     user_id = bot.user.id
@@ -69,9 +85,385 @@ class ProxyObject(discord.Object):
         self.guild: Optional[discord.abc.Snowflake] = guild
 
 
+class Blacklist:
+    """The set of user and guild IDs that are globally blocked from using the bot.
+
+    Lookups are done against an in-memory set of integers while the
+    underlying :class:`Config` is only touched when the blacklist changes.
+    """
+
+    def __init__(self, config: Config[bool]) -> None:
+        self.config: Config[bool] = config
+        self._ids: set[int] = {int(key) for key in config.all()}
+
+    def __contains__(self, object_id: int) -> bool:
+        return object_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids)
+
+    def contains_any(self, object_ids: Iterable[int]) -> bool:
+        """Returns ``True`` if any of the given IDs are blocked."""
+        return not self._ids.isdisjoint(object_ids)
+
+    async def add(self, object_id: int) -> None:
+        self._ids.add(object_id)
+        await self.config.put(object_id, True)
+
+    async def remove(self, object_id: int) -> None:
+        self._ids.discard(object_id)
+        try:
+            await self.config.remove(object_id)
+        except KeyError:
+            pass
+
+    def mirror_add(self, object_id: int) -> None:
+        """Applies an :meth:`add` made by another process."""
+        self._ids.add(object_id)
+        self.config.mirror_put(object_id, True)
+
+    def mirror_remove(self, object_id: int) -> None:
+        """Applies a :meth:`remove` made by another process."""
+        self._ids.discard(object_id)
+        self.config.mirror_remove(object_id)
+
+    async def reload(self) -> None:
+        await self.config.load()
+        self._ids = {int(key) for key in self.config.all()}
+
+
+class PrefixStore:
+    """Custom guild prefixes keyed by the guild ID.
+
+    This mirrors the underlying :class:`Config` with integer keys so that
+    the hot path does not have to go through string conversion.
+    """
+
+    def __init__(self, config: Config[list[str]]) -> None:
+        self.config: Config[list[str]] = config
+        self._prefixes: dict[int, list[str]] = {int(key): value for key, value in config.all().items()}
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self._prefixes
+
+    def get(self, guild_id: int, default: list[str]) -> list[str]:
+        return self._prefixes.get(guild_id, default)
+
+    async def put(self, guild_id: int, prefixes: list[str]) -> None:
+        self._prefixes[guild_id] = prefixes
+        await self.config.put(guild_id, prefixes)
+
+    def mirror(self, guild_id: int, prefixes: list[str]) -> None:
+        """Applies a :meth:`put` made by another process."""
+        self._prefixes[guild_id] = prefixes
+        self.config.mirror_put(guild_id, prefixes)
+
+    async def reload(self) -> None:
+        await self.config.load()
+        self._prefixes = {int(key): value for key, value in self.config.all().items()}
+
+
+class PrefixMatcher:
+    """Keeps a compiled prefix pattern for every guild.
+
+    The pattern is an alternation of the escaped prefixes in the same
+    order as :func:`_prefix_callable` returns them, so the prefix that
+    ends up matching is the same one discord.py would have picked.
+
+    Patterns are built lazily and have to be invalidated whenever the
+    prefixes of a guild change.
+    """
+
+    def __init__(self, bot: RoboDanny) -> None:
+        self.bot: RoboDanny = bot
+        # guild_id (or None for DMs): compiled pattern
+        self._patterns: dict[Optional[int], re.Pattern[str]] = {}
+
+    def _compile(self, message: discord.Message) -> re.Pattern[str]:
+        prefixes = _prefix_callable(self.bot, message)
+        return re.compile('|'.join(map(re.escape, prefixes)))
+
+    def match(self, message: discord.Message) -> Optional[str]:
+        """Returns the prefix the message starts with, if any."""
+        guild_id = message.guild and message.guild.id
+        try:
+            pattern = self._patterns[guild_id]
+        except KeyError:
+            pattern = self._patterns[guild_id] = self._compile(message)
+
+        match = pattern.match(message.content)
+        return match and match.group()
+
+    def invalidate(self, guild_id: Optional[int]) -> None:
+        self._patterns.pop(guild_id, None)
+
+    def clear(self) -> None:
+        self._patterns.clear()
+
+
+class ExtensionTiming:
+    """How long an extension took to load, in seconds.
+
+    ``import_time`` is everything up until the extension's ``setup``
+    calls :meth:`RoboDanny.add_cog`, so it includes creating the cog.
+    ``cog_load_time`` is the time spent inside ``add_cog``, which is
+    mostly the cog's ``cog_load``.
+    """
+
+    __slots__ = ('name', 'start', 'import_time', 'cog_load_time', 'total', 'failed')
+
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+        self.start: float = time.perf_counter()
+        self.import_time: Optional[float] = None
+        self.cog_load_time: float = 0.0
+        self.total: float = 0.0
+        self.failed: bool = False
+
+    @property
+    def setup_time(self) -> float:
+        return self.total - (self.import_time or self.total) - self.cog_load_time
+
+
+# the extension currently being loaded by the running task, if any
+_loading_extension: contextvars.ContextVar[Optional[ExtensionTiming]] = contextvars.ContextVar(
+    '_loading_extension', default=None
+)
+
+
+class _SpamEntry:
+    __slots__ = ('window', 'tokens', 'strikes', 'last_seen')
+
+    def __init__(self, window: float, tokens: int) -> None:
+        self.window: float = window
+        self.tokens: int = tokens
+        self.strikes: int = 0
+        self.last_seen: float = window
+
+
+class SpamControl:
+    """Per user command rate limiting with bounded memory.
+
+    Every user gets ``rate`` commands every ``per`` seconds. Each time a
+    user goes over that they get a strike, which is cleared once they use
+    a command without going over.
+
+    Entries are kept in least recently used order. Entries that have been
+    idle for ``ttl`` seconds are expired and once there are more than
+    ``max_size`` entries the least recently used ones are evicted.
+    """
+
+    def __init__(self, rate: int, per: float, *, ttl: float = 300.0, max_size: int = 100_000) -> None:
+        self.rate: int = rate
+        self.per: float = per
+        self.ttl: float = ttl
+        self.max_size: int = max_size
+        self._entries: OrderedDict[int, _SpamEntry] = OrderedDict()
+        # user_id: time their rate limit ends
+        self._throttled: dict[int, float] = {}
+        # (time their rate limit ends, user_id), might contain stale entries
+        self._throttled_heap: list[tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expire(self, current: float) -> None:
+        entries = self._entries
+        while entries:
+            user_id, entry = next(iter(entries.items()))
+            if len(entries) <= self.max_size and current - entry.last_seen < self.ttl:
+                break
+            del entries[user_id]
+
+        heap = self._throttled_heap
+        while heap and heap[0][0] <= current:
+            until, user_id = heapq.heappop(heap)
+            if self._throttled.get(user_id) == until:
+                del self._throttled[user_id]
+
+    def update_rate_limit(self, user_id: int, current: float) -> Optional[float]:
+        """Uses up a command for the user and returns how long they're rate limited for, if at all."""
+        try:
+            entry = self._entries[user_id]
+        except KeyError:
+            entry = self._entries[user_id] = _SpamEntry(current, self.rate)
+        else:
+            self._entries.move_to_end(user_id)
+
+        entry.last_seen = current
+        if current > entry.window + self.per:
+            entry.window = current
+            entry.tokens = self.rate
+
+        if entry.tokens == 0:
+            retry_after = self.per - (current - entry.window)
+            until = entry.window + self.per
+            if self._throttled.get(user_id) != until:
+                self._throttled[user_id] = until
+                heapq.heappush(self._throttled_heap, (until, user_id))
+            self._expire(current)
+            return retry_after
+
+        entry.tokens -= 1
+        self._expire(current)
+        return None
+
+    def add_strike(self, user_id: int) -> int:
+        """Adds a strike to the user and returns their total strikes."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return 0
+        entry.strikes += 1
+        return entry.strikes
+
+    def clear_strikes(self, user_id: int) -> None:
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            entry.strikes = 0
+
+    def throttled_count(self, current: float) -> int:
+        """Returns the number of users that are currently rate limited."""
+        self._expire(current)
+        return len(self._throttled)
+
+
+class MemberResolver:
+    """Resolves members that aren't in the member cache.
+
+    Concurrent lookups for the same member share a single request, and
+    lookups in the same guild made during the same loop iteration are
+    merged into shared 100 member ``query_members`` chunks. Up to
+    ``max_concurrent_chunks`` of these chunks are requested at once.
+
+    Members that could not be found are remembered for ``negative_ttl``
+    seconds. Members that join in the meantime are found in the member
+    cache before this is consulted so they aren't affected by it.
+    """
+
+    def __init__(self, bot: RoboDanny, *, negative_ttl: float = 60.0, max_concurrent_chunks: int = 4) -> None:
+        self.bot: RoboDanny = bot
+        self.max_concurrent_chunks: int = max_concurrent_chunks
+        # (guild_id, member_id)
+        self._absent: ExpiringCache = ExpiringCache(negative_ttl)
+        self._in_flight: dict[tuple[int, int], asyncio.Future[Optional[discord.Member]]] = {}
+        # guild_id: member_ids waiting for the next query_members batch
+        self._pending: dict[int, list[int]] = {}
+        # hits: found in the member cache
+        # misses: required a request
+        # negative_hits: known to be absent
+        # coalesced: joined an in-flight request
+        # absent: a request found no member
+        self.stats: Counter[str] = Counter()
+
+    def _complete(self, guild_id: int, member_id: int, member: Optional[discord.Member]) -> None:
+        if member is None:
+            self._absent[(guild_id, member_id)] = True
+            self.stats['absent'] += 1
+
+        future = self._in_flight.pop((guild_id, member_id), None)
+        if future is not None and not future.done():
+            future.set_result(member)
+
+    def _fail(self, guild_id: int, member_id: int, exc: BaseException) -> None:
+        future = self._in_flight.pop((guild_id, member_id), None)
+        if future is not None and not future.done():
+            future.set_exception(exc)
+
+    async def _fetch(self, guild: discord.Guild, member_id: int) -> None:
+        try:
+            member = await guild.fetch_member(member_id)
+        except discord.HTTPException:
+            member = None
+        except Exception as e:
+            self._fail(guild.id, member_id, e)
+            return
+        self._complete(guild.id, member_id, member)
+
+    async def _query_chunk(self, guild: discord.Guild, member_ids: list[int]) -> None:
+        try:
+            members = await guild.query_members(limit=100, user_ids=member_ids, cache=True)
+        except Exception as e:
+            for member_id in member_ids:
+                self._fail(guild.id, member_id, e)
+            return
+
+        resolved = {member.id: member for member in members}
+        for member_id in member_ids:
+            self._complete(guild.id, member_id, resolved.get(member_id))
+
+    async def _query(self, guild: discord.Guild) -> None:
+        # give other callers in this iteration of the loop a chance to join the batch
+        await asyncio.sleep(0)
+        member_ids = self._pending.pop(guild.id, [])
+        shard: discord.ShardInfo = self.bot.get_shard(guild.shard_id)  # type: ignore  # will never be None
+
+        running: set[asyncio.Task[None]] = set()
+        for index in range(0, len(member_ids), 100):
+            # Back off to one chunk at a time if the shard is running into its gateway rate limit
+            limit = 1 if shard.is_ws_ratelimited() else self.max_concurrent_chunks
+            while len(running) >= limit:
+                _, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+
+            running.add(asyncio.create_task(self._query_chunk(guild, member_ids[index : index + 100])))
+
+        if running:
+            await asyncio.wait(running)
+
+    def _request(
+        self, guild: discord.Guild, member_id: int, *, allow_fetch: bool
+    ) -> asyncio.Future[Optional[discord.Member]]:
+        key = (guild.id, member_id)
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.stats['coalesced'] += 1
+            return future
+
+        self.stats['misses'] += 1
+        self._in_flight[key] = future = self.bot.loop.create_future()
+        # don't warn if every waiter was cancelled before the failure came in
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+        if allow_fetch:
+            shard: discord.ShardInfo = self.bot.get_shard(guild.shard_id)  # type: ignore  # will never be None
+            if shard.is_ws_ratelimited():
+                asyncio.create_task(self._fetch(guild, member_id))
+                return future
+
+        try:
+            self._pending[guild.id].append(member_id)
+        except KeyError:
+            self._pending[guild.id] = [member_id]
+            asyncio.create_task(self._query(guild))
+        return future
+
+    def lookup(
+        self, guild: discord.Guild, member_ids: Iterable[int]
+    ) -> tuple[list[discord.Member], list[asyncio.Future[Optional[discord.Member]]]]:
+        """Returns the cached members and the pending requests for the rest."""
+
+        member_ids = list(member_ids)
+        allow_fetch = len(member_ids) == 1
+        found = []
+        futures = []
+        for member_id in member_ids:
+            member = guild.get_member(member_id)
+            if member is not None:
+                self.stats['hits'] += 1
+                found.append(member)
+            elif (guild.id, member_id) in self._absent:
+                self.stats['negative_hits'] += 1
+            else:
+                futures.append(self._request(guild, member_id, allow_fetch=allow_fetch))
+        return found, futures
+
+
 class RoboDanny(commands.AutoShardedBot):
     user: discord.ClientUser
-    pool: asyncpg.Pool
+    pool: Pool
+    session: aiohttp.ClientSession
     command_stats: Counter[str]
     socket_stats: Counter[str]
     command_types_used: Counter[bool]
@@ -79,7 +471,14 @@ class RoboDanny(commands.AutoShardedBot):
     bot_app_info: discord.AppInfo
     old_tree_error = Callable[[discord.Interaction, discord.app_commands.AppCommandError], Coroutine[Any, Any, None]]
 
-    def __init__(self):
+    def __init__(
+        self,
+        *,
+        shard_ids: Optional[list[int]] = None,
+        shard_count: Optional[int] = None,
+        cluster_id: Optional[int] = None,
+        identify_gate: Optional[IdentifyGate] = None,
+    ):
         allowed_mentions = discord.AllowedMentions(roles=False, everyone=False, users=True)
         intents = discord.Intents(
             guilds=True,
@@ -101,65 +500,135 @@ class RoboDanny(commands.AutoShardedBot):
             allowed_mentions=allowed_mentions,
             intents=intents,
             enable_debug_events=True,
+            shard_ids=shard_ids,
+            shard_count=shard_count,
         )
 
+        # set when running as one of several processes, see launcher.py cluster
+        self.cluster_id: Optional[int] = cluster_id
+        self.identify_gate: Optional[IdentifyGate] = identify_gate
+        # only connected when running as a cluster
+        self.bus: Optional[Bus] = None
+
         self.client_id: str = config.client_id
         self.carbon_key: str = config.carbon_key
         self.bots_key: str = config.bots_key
         self.challonge_api_key: str = config.challonge_api_key
 
-        # shard_id: List[datetime.datetime]
-        # shows the last attempted IDENTIFYs and RESUMEs
-        self.resumes: defaultdict[int, list[datetime.datetime]] = defaultdict(list)
-        self.identifies: defaultdict[int, list[datetime.datetime]] = defaultdict(list)
+        # shows the last attempted IDENTIFYs and RESUMEs per shard
+        # along with latency and reconnect history
+        self.gateway_telemetry: GatewayTelemetry = GatewayTelemetry()
 
-        # in case of even further spam, add a cooldown mapping
+        # in case of even further spam, add a rate limit
         # for people who excessively spam commands
-        self.spam_control = commands.CooldownMapping.from_cooldown(10, 12.0, commands.BucketType.user)
-
-        # A counter to auto-ban frequent spammers
         # Triggering the rate limit 5 times in a row will auto-ban the user from the bot.
-        self._auto_spam_count = Counter()
+        self.spam_control = SpamControl(10, 12.0)
+
+        # compiled prefixes per guild, see get_context
+        self.prefix_matcher = PrefixMatcher(self)
+
+        # shared member requests for get_or_fetch_member and resolve_member_ids
+        self.member_resolver = MemberResolver(self)
+
+        # scheduling delay of the event loop and what was blocking it
+        self.loop_monitor: LoopLagMonitor = LoopLagMonitor()
+
+        # extension: how long it took to load during setup_hook
+        self.extension_timings: dict[str, ExtensionTiming] = {}
+        self.extensions_load_time: float = 0.0
 
     async def setup_hook(self) -> None:
-        self.session = aiohttp.ClientSession()
+        # the load test installs its own session before logging in
+        if not hasattr(self, 'session'):
+            self.session = aiohttp.ClientSession()
+        self.loop_monitor.start()
+        # only the primary process writes these files, the others apply
+        # their changes in memory and send them to it over the bus
+        read_only = not self.is_primary
+
         # guild_id: list
-        self.prefixes: Config[list[str]] = Config('prefixes.json')
+        self.prefixes: PrefixStore = PrefixStore(Config('prefixes.json', journal=True, read_only=read_only))
 
         # guild_id and user_id mapped to True
         # these are users and guilds globally blacklisted
         # from using the bot
-        self.blacklist: Config[bool] = Config('blacklist.json')
+        self.blacklist: Blacklist = Blacklist(Config('blacklist.json', read_only=read_only))
+
+        if self.cluster_id is not None:
+            # keeps the blacklist and prefixes in sync with the other processes
+            self.bus = Bus(self.pool, self.pool.dsn)
+            self.bus.subscribe('blacklist', self._on_remote_blacklist)
+            self.bus.subscribe('prefixes', self._on_remote_prefixes)
+            self.bus.add_reconnect_listener(self._resync_shared_state)
+            # cache.cache invalidations are sent to the other processes too
+            self.bus.subscribe('cache', cache.apply_remote_invalidation)
+            cache.set_invalidation_publisher(partial(self.bus.publish_nowait, 'cache'))
+            self.bus.start()
 
         self.bot_app_info = await self.application_info()
         self.owner_id = self.bot_app_info.owner.id
 
+        start = time.perf_counter()
+        tasks: dict[str, asyncio.Task[None]] = {}
         for extension in initial_extensions:
-            try:
-                await self.load_extension(extension)
-            except Exception as e:
-                log.exception('Failed to load extension %s.', extension)
+            dependencies = [tasks[name] for name in extension_dependencies.get(extension, ())]
+            tasks[extension] = asyncio.create_task(self._load_initial_extension(extension, dependencies))
+
+        await asyncio.gather(*tasks.values())
+        self.extensions_load_time = time.perf_counter() - start
+        log.info('Loaded extensions in %.2fms\n%s', self.extensions_load_time * 1000, self.format_extension_timings())
+
+    async def _load_initial_extension(self, extension: str, dependencies: list[asyncio.Task[None]]) -> None:
+        if dependencies:
+            await asyncio.wait(dependencies)
+
+        timing = ExtensionTiming(extension)
+        _loading_extension.set(timing)
+        self.extension_timings[extension] = timing
+        try:
+            await self.load_extension(extension)
+        except Exception:
+            timing.failed = True
+            log.exception('Failed to load extension %s.', extension)
+        finally:
+            timing.total = time.perf_counter() - timing.start
+
+    async def add_cog(self, cog: commands.Cog, /, **kwargs: Any) -> None:
+        timing = _loading_extension.get()
+        if timing is None:
+            return await super().add_cog(cog, **kwargs)
+
+        start = time.perf_counter()
+        if timing.import_time is None:
+            timing.import_time = start - timing.start
+
+        try:
+            await super().add_cog(cog, **kwargs)
+        finally:
+            timing.cog_load_time += time.perf_counter() - start
+
+    def format_extension_timings(self) -> str:
+        """Renders the startup timings of the initial extensions, slowest first."""
+        table = TabularData()
+        table.set_columns(['Extension', 'Import', 'Setup', 'cog_load', 'Total'])
+        timings = sorted(self.extension_timings.values(), key=lambda t: t.total, reverse=True)
+        for timing in timings:
+            name = f'{timing.name} (failed)' if timing.failed else timing.name
+            durations = (timing.import_time or 0.0, timing.setup_time, timing.cog_load_time, timing.total)
+            table.add_row([name, *(f'{duration * 1000:.2f}ms' for duration in durations)])
+        return table.render()
 
     @property
     def owner(self) -> discord.User:
         return self.bot_app_info.owner
 
-    def _clear_gateway_data(self) -> None:
-        one_week_ago = discord.utils.utcnow() - datetime.timedelta(days=7)
-        for shard_id, dates in self.identifies.items():
-            to_remove = [index for index, dt in enumerate(dates) if dt < one_week_ago]
-            for index in reversed(to_remove):
-                del dates[index]
-
-        for shard_id, dates in self.resumes.items():
-            to_remove = [index for index, dt in enumerate(dates) if dt < one_week_ago]
-            for index in reversed(to_remove):
-                del dates[index]
-
     async def before_identify_hook(self, shard_id: int, *, initial: bool):
-        self._clear_gateway_data()
-        self.identifies[shard_id].append(discord.utils.utcnow())
-        await super().before_identify_hook(shard_id, initial=initial)
+        self.gateway_telemetry[shard_id].record_identify(initial=initial)
+        if self.identify_gate is None:
+            await super().before_identify_hook(shard_id, initial=initial)
+        else:
+            # the IDENTIFY rate limit is shared with the other processes
+            await self.identify_gate.wait()
 
     async def on_command_error(self, ctx: Context, error: commands.CommandError) -> None:
         if isinstance(error, commands.NoPrivateMessage):
@@ -178,7 +647,8 @@ class RoboDanny(commands.AutoShardedBot):
         return local_inject(self, proxy_msg)  # type: ignore  # lying
 
     def get_raw_guild_prefixes(self, guild_id: int) -> list[str]:
-        return self.prefixes.get(guild_id, ['?', '!'])
+        # callers mutate this so a copy is returned
+        return list(self.prefixes.get(guild_id, ['?', '!']))
 
     async def set_guild_prefixes(self, guild: discord.abc.Snowflake, prefixes: list[str]) -> None:
         if len(prefixes) == 0:
@@ -188,14 +658,49 @@ class RoboDanny(commands.AutoShardedBot):
         else:
             await self.prefixes.put(guild.id, sorted(set(prefixes), reverse=True))
 
+        self.prefix_matcher.invalidate(guild.id)
+        await self.publish('prefixes', {'guild_id': guild.id, 'prefixes': self.prefixes.get(guild.id, [])})
+
     async def add_to_blacklist(self, object_id: int):
-        await self.blacklist.put(object_id, True)
+        await self.blacklist.add(object_id)
+        await self.publish('blacklist', {'id': object_id, 'blocked': True})
 
     async def remove_from_blacklist(self, object_id: int):
-        try:
-            await self.blacklist.remove(object_id)
-        except KeyError:
-            pass
+        await self.blacklist.remove(object_id)
+        await self.publish('blacklist', {'id': object_id, 'blocked': False})
+
+    async def publish(self, topic: str, data: Any = None) -> None:
+        """Publishes a message to the other processes of the cluster, if there are any."""
+        if self.bus is not None:
+            await self.bus.publish(topic, data)
+
+    async def _on_remote_prefixes(self, data: dict[str, Any]) -> None:
+        guild_id = data['guild_id']
+        if self.is_primary:
+            # the process that made the change couldn't write it itself
+            await self.prefixes.put(guild_id, data['prefixes'])
+        else:
+            self.prefixes.mirror(guild_id, data['prefixes'])
+        self.prefix_matcher.invalidate(guild_id)
+
+    async def _on_remote_blacklist(self, data: dict[str, Any]) -> None:
+        object_id = data['id']
+        if self.is_primary:
+            # the process that made the change couldn't write it itself
+            if data['blocked']:
+                await self.blacklist.add(object_id)
+            else:
+                await self.blacklist.remove(object_id)
+        elif data['blocked']:
+            self.blacklist.mirror_add(object_id)
+        else:
+            self.blacklist.mirror_remove(object_id)
+
+    async def _resync_shared_state(self) -> None:
+        cache.clear_all()
+        await self.blacklist.reload()
+        await self.prefixes.reload()
+        self.prefix_matcher.clear()
 
     async def query_member_named(
         self, guild: discord.Guild, argument: str, *, cache: bool = False
@@ -240,23 +745,12 @@ class RoboDanny(commands.AutoShardedBot):
             The member or None if not found.
         """
 
-        member = guild.get_member(member_id)
-        if member is not None:
-            return member
-
-        shard: discord.ShardInfo = self.get_shard(guild.shard_id)  # type: ignore  # will never be None
-        if shard.is_ws_ratelimited():
-            try:
-                member = await guild.fetch_member(member_id)
-            except discord.HTTPException:
-                return None
-            else:
-                return member
-
-        members = await guild.query_members(limit=1, user_ids=[member_id], cache=True)
-        if not members:
+        found, futures = self.member_resolver.lookup(guild, (member_id,))
+        if found:
+            return found[0]
+        if not futures:
             return None
-        return members[0]
+        return await asyncio.shield(futures[0])
 
     async def resolve_member_ids(self, guild: discord.Guild, member_ids: Iterable[int]) -> AsyncIterator[discord.Member]:
         """Bulk resolves member IDs to member instances, if possible.
@@ -280,40 +774,14 @@ class RoboDanny(commands.AutoShardedBot):
             The resolved members.
         """
 
-        needs_resolution = []
-        for member_id in member_ids:
-            member = guild.get_member(member_id)
-            if member is not None:
-                yield member
-            else:
-                needs_resolution.append(member_id)
+        found, futures = self.member_resolver.lookup(guild, member_ids)
+        for member in found:
+            yield member
 
-        total_need_resolution = len(needs_resolution)
-        if total_need_resolution == 1:
-            shard: discord.ShardInfo = self.get_shard(guild.shard_id)  # type: ignore  # will never be None
-            if shard.is_ws_ratelimited():
-                try:
-                    member = await guild.fetch_member(needs_resolution[0])
-                except discord.HTTPException:
-                    pass
-                else:
-                    yield member
-            else:
-                members = await guild.query_members(limit=1, user_ids=needs_resolution, cache=True)
-                if members:
-                    yield members[0]
-        elif total_need_resolution <= 100:
-            # Only a single resolution call needed here
-            resolved = await guild.query_members(limit=100, user_ids=needs_resolution, cache=True)
-            for member in resolved:
+        for future in asyncio.as_completed([asyncio.shield(f) for f in futures]):
+            member = await future
+            if member is not None:
                 yield member
-        else:
-            # We need to chunk these in bits of 100...
-            for index in range(0, total_need_resolution, 100):
-                to_resolve = needs_resolution[index : index + 100]
-                members = await guild.query_members(limit=100, user_ids=to_resolve, cache=True)
-                for member in members:
-                    yield member
 
     async def on_ready(self):
         if not hasattr(self, 'uptime'):
@@ -323,7 +791,13 @@ class RoboDanny(commands.AutoShardedBot):
 
     async def on_shard_resumed(self, shard_id: int):
         log.info('Shard ID %s has resumed...', shard_id)
-        self.resumes[shard_id].append(discord.utils.utcnow())
+        self.gateway_telemetry[shard_id].record_resume()
+
+    async def on_shard_disconnect(self, shard_id: int):
+        self.gateway_telemetry[shard_id].record_disconnect()
+
+    async def on_shard_ready(self, shard_id: int):
+        self.gateway_telemetry[shard_id].record_ready()
 
     @discord.utils.cached_property
     def stats_webhook(self) -> discord.Webhook:
@@ -348,6 +822,10 @@ class RoboDanny(commands.AutoShardedBot):
         return await wh.send(embed=embed)
 
     async def get_context(self, origin: Union[discord.Interaction, discord.Message], /, *, cls=Context) -> Context:
+        # The vast majority of messages are not commands, so reject them with a
+        # single pre-compiled match rather than going through every prefix.
+        if isinstance(origin, discord.Message) and self.prefix_matcher.match(origin) is None:
+            return cls(prefix=None, view=StringView(origin.content), bot=self, message=origin)
         return await super().get_context(origin, cls=cls)
 
     async def process_commands(self, message: discord.Message):
@@ -356,27 +834,25 @@ class RoboDanny(commands.AutoShardedBot):
         if ctx.command is None:
             return
 
-        if ctx.author.id in self.blacklist:
-            return
-
-        if ctx.guild is not None and ctx.guild.id in self.blacklist:
+        if ctx.guild is None:
+            if ctx.author.id in self.blacklist:
+                return
+        elif self.blacklist.contains_any((ctx.author.id, ctx.guild.id)):
             return
 
-        bucket = self.spam_control.get_bucket(message)
         current = message.created_at.timestamp()
-        retry_after = bucket and bucket.update_rate_limit(current)
         author_id = message.author.id
+        retry_after = self.spam_control.update_rate_limit(author_id, current)
         if retry_after and author_id != self.owner_id:
-            self._auto_spam_count[author_id] += 1
-            if self._auto_spam_count[author_id] >= 5:
+            if self.spam_control.add_strike(author_id) >= 5:
                 await self.add_to_blacklist(author_id)
-                del self._auto_spam_count[author_id]
+                self.spam_control.clear_strikes(author_id)
                 await self.log_spammer(ctx, message, retry_after, autoblock=True)
             else:
                 await self.log_spammer(ctx, message, retry_after)
             return
         else:
-            self._auto_spam_count.pop(author_id, None)
+            self.spam_control.clear_strikes(author_id)
 
         await self.invoke(ctx)
 
@@ -390,12 +866,26 @@ class RoboDanny(commands.AutoShardedBot):
             await guild.leave()
 
     async def close(self) -> None:
+        self.loop_monitor.stop()
+        if self.bus is not None:
+            cache.set_invalidation_publisher(None)
+            await self.bus.close()
         await super().close()
-        await self.session.close()
+        # logging in can fail before setup_hook makes the session
+        if hasattr(self, 'session'):
+            await self.session.close()
 
     async def start(self) -> None:
         await super().start(config.token, reconnect=True)
 
+    @property
+    def is_primary(self) -> bool:
+        """Whether this process runs the work that must only happen once in a cluster.
+
+        This is always ``True`` outside of cluster mode.
+        """
+        return self.cluster_id in (None, 0)
+
     @property
     def config(self):
         return __import__('config')
@@ -15,7 +15,7 @@ import sys
 import copy
 import time
 import subprocess
-from typing import TYPE_CHECKING, Any, Awaitable, Callable, Union, Optional
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Literal, Union, Optional
 
 # to expose to the eval command
 import datetime
@@ -141,6 +141,20 @@ class Admin(commands.Cog):
         else:
             await ctx.send('\N{OK HAND SIGN}')
 
+    @commands.command(hidden=True)
+    async def startup(self, ctx: Context):
+        """Shows how long each extension took to load at startup."""
+        if not self.bot.extension_timings:
+            return await ctx.send('No extensions were loaded at startup.')
+
+        total = self.bot.extensions_load_time * 1000
+        fmt = f'```\n{self.bot.format_extension_timings()}\n```\n*Loaded in {total:.2f}ms*'
+        if len(fmt) > 2000:
+            fp = io.BytesIO(fmt.encode('utf-8'))
+            await ctx.send('Too many results...', file=discord.File(fp, 'startup.txt'))
+        else:
+            await ctx.send(fmt)
+
     _GIT_PULL_REGEX = re.compile(r'\s*(?P<filename>.+?)\s*\|\s*[0-9]+\s*[+-]+')
 
     def find_modules_from_git(self, output: str) -> list[tuple[int, str]]:
@@ -464,21 +478,100 @@ class Admin(commands.Cog):
 
     @sql.command(name='explain', aliases=['analyze'], hidden=True)
     async def sql_explain(self, ctx: Context, *, query: str):
-        """Explain an SQL query."""
+        """Explain an SQL query.
+
+        Pass `slow:<index>` to explain a query from the slow query log with its original arguments.
+        """
+        from .utils import db
+
         query = self.cleanup_code(query)
         analyze = ctx.invoked_with == 'analyze'
-        if analyze:
-            query = f'EXPLAIN (ANALYZE, COSTS, VERBOSE, BUFFERS, FORMAT JSON)\n{query}'
-        else:
-            query = f'EXPLAIN (COSTS, VERBOSE, FORMAT JSON)\n{query}'
+        args: tuple[Any, ...] = ()
+        if query.startswith('slow:'):
+            try:
+                slow = list(reversed(db.query_log.slow_queries))[int(query[5:]) - 1]
+            except (ValueError, IndexError):
+                return await ctx.send('Could not find a slow query with that index.')
+            query, args = slow.query, slow.args
 
-        json = await ctx.db.fetchrow(query)
-        if json is None:
+        plan = await db.explain(ctx.db, query, *args, analyze=analyze)
+        if plan is None:
             return await ctx.send('Somehow nothing returned.')
 
-        file = discord.File(io.BytesIO(json[0].encode('utf-8')), filename='explain.json')
+        file = discord.File(io.BytesIO(plan.encode('utf-8')), filename='explain.json')
         await ctx.send(file=file)
 
+    @sql.command(name='top', hidden=True)
+    async def sql_top(self, ctx: Context, sort: Literal['total', 'p99'] = 'total', limit: int = 10):
+        """Shows the queries that took the most total or p99 time recently."""
+        from .utils import db
+        from .utils.formats import TabularData
+
+        query_log = db.query_log
+        since = query_log.window_start
+        top = query_log.top(key=sort, limit=limit)
+        if not top:
+            return await ctx.send('No queries have been run recently.')
+
+        table = TabularData()
+        table.set_columns(['#', 'Call Site', 'Calls', 'Total', 'p50', 'p99', 'Query'])
+        for index, stats in enumerate(top, start=1):
+            p50, p99 = stats.window_percentiles(since, 50, 99)
+            table.add_row(
+                [
+                    index,
+                    stats.site,
+                    stats.window_calls(since),
+                    f'{stats.window_total(since):.2f}s',
+                    f'{p50 * 1000:.2f}ms',
+                    f'{p99 * 1000:.2f}ms',
+                    stats.display_query[:60],
+                ]
+            )
+
+        render = table.render()
+        fmt = f'```\n{render}\n```\n*Last {query_log.window} minutes, {len(query_log)} queries tracked*'
+        if len(fmt) > 2000:
+            fp = io.BytesIO(fmt.encode('utf-8'))
+            await ctx.send('Too many results...', file=discord.File(fp, 'top_queries.txt'))
+        else:
+            await ctx.send(fmt)
+
+    @sql.command(name='slow', hidden=True)
+    async def sql_slow(self, ctx: Context, index: Optional[int] = None):
+        """Shows the slow query log.
+
+        If an index is given then the full query and its plan is shown.
+        """
+        from .utils import db
+        from .utils import time
+
+        query_log = db.query_log
+        slow_queries = list(reversed(query_log.slow_queries))
+        if index is not None:
+            try:
+                slow = slow_queries[index - 1]
+            except IndexError:
+                return await ctx.send('Could not find a slow query with that index.')
+
+            fmt = (
+                f'{slow.duration * 1000:.2f}ms from `{slow.site}` {time.format_relative(slow.when)}\n'
+                f'```sql\n{slow.query}\n```\nArguments: `{slow.args!r}`'
+            )
+            files = []
+            if slow.plan is not None:
+                files.append(discord.File(io.BytesIO(slow.plan.encode('utf-8')), filename='explain.json'))
+            return await ctx.send(fmt[:2000], files=files)
+
+        if not slow_queries:
+            return await ctx.send(f'No queries have taken over {query_log.slow_threshold * 1000:.0f}ms.')
+
+        lines = [
+            f'{i}. {slow.duration * 1000:.0f}ms {time.format_relative(slow.when)} `{slow.site}`'
+            for i, slow in enumerate(slow_queries[:15], start=1)
+        ]
+        await ctx.send('\n'.join(lines))
+
     @commands.command(hidden=True)
     async def sudo(
         self,
@@ -181,11 +181,13 @@ class API(commands.Cog):
 
     faq_entries: dict[str, str]
     _rtfm_cache: dict[str, dict[str, str]]
+    _rtfm_index: dict[str, fuzzy.FuzzyIndex[tuple[str, str]]]
     repo_examples: list[RepositoryExample]
 
     def __init__(self, bot: RoboDanny):
         self.bot: RoboDanny = bot
         self.issue = re.compile(r'##(?P<number>[0-9]+)')
+        self._autocomplete = fuzzy.AutocompleteCache()
 
     @property
     def display_emoji(self) -> discord.PartialEmoji:
@@ -266,6 +268,7 @@ class API(commands.Cog):
                 stream = SphinxObjectFileReader(await resp.read())
                 cache[key] = self.parse_object_inv(stream, page)
 
+        self._rtfm_index = {key: fuzzy.FuzzyIndex(entries.items(), key=lambda t: t[0]) for key, entries in cache.items()}
         self._rtfm_cache = cache
 
     async def do_rtfm(self, ctx: Context, key: str, obj: Optional[str]):
@@ -289,8 +292,7 @@ class API(commands.Cog):
                     obj = f'abc.Messageable.{name}'
                     break
 
-        cache = list(self._rtfm_cache[key].items())
-        matches = fuzzy.finder(obj, cache, key=lambda t: t[0])[:8]
+        matches = self._rtfm_index[key].finder(obj, limit=8)
 
         e = discord.Embed(colour=discord.Colour.blurple())
         if len(matches) == 0:
@@ -336,8 +338,8 @@ class API(commands.Cog):
         elif key == 'jp':
             key = 'latest-jp'
 
-        matches = fuzzy.finder(current, self._rtfm_cache[key])[:10]
-        return [app_commands.Choice(name=m, value=m) for m in matches]
+        matches = self._autocomplete.finder(interaction.user.id, current, self._rtfm_index[key], scope=key)[:10]
+        return [app_commands.Choice(name=m, value=m) for m, _ in matches]
 
     @commands.hybrid_group(aliases=['rtfd'], fallback='stable')
     @app_commands.describe(entity='The object to search for')
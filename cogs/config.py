@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from discord.ext import commands, menus
-from .utils import checks, cache
+from .utils import checks, cache, db
 from .utils.paginator import RoboPages, SimplePages
 
 from collections import defaultdict
@@ -25,6 +25,14 @@ async def plonk_iterator(bot: RoboDanny, guild: discord.Guild, records: list[Rec
         yield str(resolved)
 
 
+_IS_PLONKED_QUERY = db.prepared_statements.register(
+    'config.is_plonked', "SELECT 1 FROM plonks WHERE guild_id=$1 AND entity_id=$2;"
+)
+_COMMAND_PERMISSIONS_QUERY = db.prepared_statements.register(
+    'config.command_permissions', "SELECT name, channel_id, whitelist FROM command_config WHERE guild_id=$1;"
+)
+
+
 class PlonkedPageSource(menus.AsyncIteratorPageSource):
     def __init__(self, bot: RoboDanny, guild: discord.Guild, records: list[Record]):
         super().__init__(plonk_iterator(bot, guild, records), per_page=20)
@@ -170,7 +178,7 @@ class Config(commands.Cog):
     def display_emoji(self) -> discord.PartialEmoji:
         return discord.PartialEmoji(name='\N{GEAR}\ufe0f')
 
-    @cache.cache(strategy=cache.Strategy.lru, maxsize=1024, ignore_kwargs=True)
+    @cache.cache(strategy=cache.Strategy.lru, maxsize=1024, ignore_kwargs=True, partition='guild_id')
     async def is_plonked(
         self,
         guild_id: int,
@@ -180,7 +188,7 @@ class Config(commands.Cog):
         connection: Optional[Connection | Pool] = None,
         check_bypass: bool = True,
     ) -> bool:
-        if member_id in self.bot.blacklist or guild_id in self.bot.blacklist:
+        if self.bot.blacklist.contains_any((member_id, guild_id)):
             return True
 
         if check_bypass:
@@ -193,8 +201,7 @@ class Config(commands.Cog):
         connection = connection or self.bot.pool
 
         if channel is None:
-            query = "SELECT 1 FROM plonks WHERE guild_id=$1 AND entity_id=$2;"
-            row = await connection.fetchrow(query, guild_id, member_id)
+            row = await db.fetchrow_prepared(connection, _IS_PLONKED_QUERY, guild_id, member_id)
         else:
             if isinstance(channel, discord.Thread):
                 query = "SELECT 1 FROM plonks WHERE guild_id=$1 AND entity_id IN ($2, $3, $4);"
@@ -226,14 +233,12 @@ class Config(commands.Cog):
 
         return not is_plonked
 
-    @cache.cache()
+    @cache.cache(strategy=cache.Strategy.revalidate)
     async def get_command_permissions(
         self, guild_id: int, *, connection: Optional[Connection | Pool] = None
     ) -> ResolvedCommandPermissions:
         connection = connection or self.bot.pool
-        query = "SELECT name, channel_id, whitelist FROM command_config WHERE guild_id=$1;"
-
-        records = await connection.fetch(query, guild_id)
+        records = await db.fetch_prepared(connection, _COMMAND_PERMISSIONS_QUERY, guild_id)
         return ResolvedCommandPermissions(guild_id, records)
 
     async def bot_check(self, ctx: Context) -> bool:
@@ -262,7 +267,7 @@ class Config(commands.Cog):
                 await con.copy_records_to_table('plonks', columns=('guild_id', 'entity_id'), records=to_insert)
 
                 # invalidate the cache for this guild
-                self.is_plonked.invalidate_containing(f'{ctx.guild.id!r}:')
+                self.is_plonked.invalidate_partition(ctx.guild.id)
 
     async def cog_command_error(self, ctx: Context, error: commands.CommandError):
         if isinstance(error, commands.BadArgument):
@@ -293,7 +298,7 @@ class Config(commands.Cog):
             await ctx.db.execute(query, ctx.guild.id, ctx.channel.id)
 
             # invalidate the cache for this guild
-            self.is_plonked.invalidate_containing(f'{ctx.guild.id!r}:')
+            self.is_plonked.invalidate_partition(ctx.guild.id)
         else:
             await self._bulk_ignore_entries(ctx, entities)
 
@@ -344,7 +349,7 @@ class Config(commands.Cog):
 
         query = "DELETE FROM plonks WHERE guild_id=$1;"
         await ctx.db.execute(query, ctx.guild.id)
-        self.is_plonked.invalidate_containing(f'{ctx.guild.id!r}:')
+        self.is_plonked.invalidate_partition(ctx.guild.id)
         await ctx.send('Successfully cleared all ignores.')
 
     @config.group(pass_context=True, invoke_without_command=True, aliases=['unplonk'])
@@ -365,7 +370,7 @@ class Config(commands.Cog):
             entity_ids = [c.id for c in entities]
             await ctx.db.execute(query, ctx.guild.id, entity_ids)
 
-        self.is_plonked.invalidate_containing(f'{ctx.guild.id!r}:')
+        self.is_plonked.invalidate_partition(ctx.guild.id)
         await ctx.send(ctx.tick(True))
 
     @unignore.command(name='all')
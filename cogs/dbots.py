@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
 from discord.ext import commands
 import discord
@@ -20,32 +20,34 @@ class DiscordBots(commands.Cog):
     def __init__(self, bot: RoboDanny):
         self.bot: RoboDanny = bot
 
-    async def update(self) -> None:
-        guild_count = len(self.bot.guilds)
-
-        payload = json.dumps(
-            {
-                'guildCount': guild_count,
-                'shardCount': len(self.bot.shards),
-            }
-        )
-
+    async def post(self, payload: dict[str, int]) -> None:
         headers = {
             'authorization': self.bot.bots_key,
             'content-type': 'application/json',
         }
 
         url = f'{DISCORD_BOTS_API}/bots/{self.bot.user.id}/stats'
-        async with self.bot.session.post(url, data=payload, headers=headers) as resp:
+        async with self.bot.session.post(url, data=json.dumps(payload), headers=headers) as resp:
             log.info(f'DBots statistics returned {resp.status} for {payload}')
 
+    async def update(self, shard_id: Optional[int] = None) -> None:
+        if self.bot.cluster_id is None:
+            await self.post({'guildCount': len(self.bot.guilds), 'shardCount': len(self.bot.shards)})
+            return
+
+        # each process of a cluster only knows about its own shards so they're posted one by one
+        shard_ids = list(self.bot.shards) if shard_id is None else [shard_id]
+        for shard_id in shard_ids:
+            guild_count = sum(1 for guild in self.bot.guilds if guild.shard_id == shard_id)
+            await self.post({'guildCount': guild_count, 'shardCount': self.bot.shard_count or 1, 'shardId': shard_id})
+
     @commands.Cog.listener()
     async def on_guild_join(self, guild: discord.Guild) -> None:
-        await self.update()
+        await self.update(guild.shard_id)
 
     @commands.Cog.listener()
     async def on_guild_remove(self, guild: discord.Guild) -> None:
-        await self.update()
+        await self.update(guild.shard_id)
 
     @commands.Cog.listener()
     async def on_ready(self) -> None:
@@ -7,7 +7,7 @@ from discord import app_commands
 from discord.utils import MISSING
 
 from .utils.context import ConfirmationView
-from .utils import checks, time, cache, flags
+from .utils import checks, time, cache, db, flags
 from .utils.queue import CancellableQueue
 from .utils.paginator import SimplePages
 from .utils.formats import plural, human_join
@@ -42,6 +42,8 @@ V = TypeVar('V')
 
 log = logging.getLogger(__name__)
 
+_GUILD_CONFIG_QUERY = db.prepared_statements.register('mod.guild_config', 'SELECT * FROM guild_mod_config WHERE id=$1;')
+
 ## Misc utilities
 
 
@@ -197,6 +199,11 @@ class GatekeeperRoleState(enum.Enum):
     pending_add = 'pending_add'
     pending_remove = 'pending_remove'
 
+    @property
+    def priority(self) -> int:
+        # People who passed verification shouldn't wait behind a raid
+        return 0 if self is GatekeeperRoleState.pending_remove else 1
+
 
 class Gatekeeper:
     """A gatekeeper that prevents users from participating in the server until certain conditions are met.
@@ -284,12 +291,12 @@ class Gatekeeper:
         if self.started_at is not None:
             self.started_at = self.started_at.replace(tzinfo=datetime.timezone.utc)
 
-        self.queue: CancellableQueue[int, tuple[int, GatekeeperRoleState]] = CancellableQueue()
+        self.queue: CancellableQueue[int, tuple[int, GatekeeperRoleState]] = CancellableQueue(priorities=2)
         for member in members:
             state = GatekeeperRoleState(member['state'])
             member_id = member['user_id']
             if state is not GatekeeperRoleState.added:
-                self.queue.put(member_id, (member_id, state))
+                self.queue.put(member_id, (member_id, state), priority=state.priority)
 
     def __repr__(self) -> str:
         attrs = [
@@ -315,6 +322,7 @@ class Gatekeeper:
             ('Message', self.message.jump_url if self.message is not None else 'Not set up'),
             ('Bypass Action', self.bypass_action.title()),
             ('Auto Trigger', f'{self.rate[0]}/{self.rate[1]}s' if self.rate is not None else 'Not set up'),
+            ('Role Queue', f'{len(self.queue)} pending, oldest {self.queue.oldest_age():.0f}s ago'),
         ]
         return '\n'.join(f'{header}: {value}' for header, value in headers)
 
@@ -382,28 +390,65 @@ class Gatekeeper:
         add_role = self.bot.http.add_role
 
         while self.role_id is not None:
-            member_id, action = await self.queue.get()
+            # The HTTP calls are paced by the library's rate limiting, the database
+            # writes are done once per batch rather than once per member.
+            batch = await self.queue.get_many(100, max_wait=1.0)
+            added: list[int] = []
+            removed: list[int] = []
+            stopped = False
+
+            for index, (member_id, action) in enumerate(batch):
+                try:
+                    if action is GatekeeperRoleState.pending_add:
+                        await add_role(
+                            self.id, member_id, self.role_id, reason=f'RoboMod Gatekeeper is active since {self.started_at}'
+                        )
+                        added.append(member_id)
+                    elif action is GatekeeperRoleState.pending_remove:
+                        await remove_role(
+                            self.id, member_id, self.role_id, reason='Completed RoboMod Gatekeeper verification'
+                        )
+                        removed.append(member_id)
+                except discord.DiscordServerError:
+                    self.queue.put(member_id, (member_id, action), priority=action.priority)
+                except discord.NotFound as e:
+                    # Unknown role/user
+                    if e.code not in (10011, 10013):
+                        # Leave the rest of the batch for when the loop is restarted
+                        for member_id, action in batch[index + 1 :]:
+                            self.queue.put(member_id, (member_id, action), priority=action.priority)
+                        stopped = True
+                        break
+                except Exception:
+                    log.exception('[Gatekeeper] An exception happened in the role loop of guild ID %d', self.id)
+                    continue
 
             try:
-                if action is GatekeeperRoleState.pending_add:
-                    await add_role(
-                        self.id, member_id, self.role_id, reason=f'RoboMod Gatekeeper is active since {self.started_at}'
-                    )
-                    query = "UPDATE guild_gatekeeper_members SET state = 'added' WHERE guild_id = $1 AND user_id = $2"
-                    await self.bot.pool.execute(query, self.id, member_id)
-                elif action is GatekeeperRoleState.pending_remove:
-                    await remove_role(self.id, member_id, self.role_id, reason='Completed RoboMod Gatekeeper verification')
-                    query = 'DELETE FROM guild_gatekeeper_members WHERE guild_id = $1 AND user_id = $2'
-                    await self.bot.pool.execute(query, self.id, member_id)
-            except discord.DiscordServerError:
-                self.queue.put(member_id, (member_id, action))
-            except discord.NotFound as e:
-                # Unknown role/user
-                if e.code not in (10011, 10013):
-                    break
+                await self.flush_role_changes(added, removed)
             except Exception:
-                log.exception('[Gatekeeper] An exception happened in the role loop of guild ID %d', self.id)
-                continue
+                log.exception('[Gatekeeper] Could not save the role changes of guild ID %d', self.id)
+
+            if stopped:
+                break
+
+    async def flush_role_changes(self, added: list[int], removed: list[int]) -> None:
+        if not added and not removed:
+            return
+
+        async with self.bot.pool.acquire(timeout=300.0) as conn:
+            async with conn.transaction():
+                # members can be unblocked or blocked again while their role is
+                # being changed, those rows have moved on and must be left alone
+                if added:
+                    query = """UPDATE guild_gatekeeper_members SET state = 'added'
+                               WHERE guild_id = $1 AND user_id = ANY($2::bigint[]) AND state = 'pending_add'
+                            """
+                    await conn.execute(query, self.id, added)
+                if removed:
+                    query = """DELETE FROM guild_gatekeeper_members
+                               WHERE guild_id = $1 AND user_id = ANY($2::bigint[]) AND state = 'pending_remove'
+                            """
+                    await conn.execute(query, self.id, removed)
 
     async def cleanup_loop(self, members: set[int]) -> None:
         # This can be potentially expensive if there's hundreds of members
@@ -450,7 +495,8 @@ class Gatekeeper:
                 )
                 await conn.execute(query, self.id)
                 for member_id in self.members:
-                    self.queue.put((member_id), (member_id, GatekeeperRoleState.pending_remove))
+                    state = GatekeeperRoleState.pending_remove
+                    self.queue.put(member_id, (member_id, state), priority=state.priority)
                 self.members.clear()
 
     @property
@@ -488,9 +534,12 @@ class Gatekeeper:
 
     async def block(self, member: discord.Member) -> None:
         self.members.add(member.id)
-        query = "INSERT INTO guild_gatekeeper_members(guild_id, user_id) VALUES ($1, $2) ON CONFLICT DO NOTHING"
+        query = """INSERT INTO guild_gatekeeper_members(guild_id, user_id) VALUES ($1, $2)
+                   ON CONFLICT (guild_id, user_id) DO UPDATE SET state = 'pending_add'
+                """
         await self.bot.pool.execute(query, self.id, member.id)
-        self.queue.put(member.id, (member.id, GatekeeperRoleState.pending_add))
+        state = GatekeeperRoleState.pending_add
+        self.queue.put(member.id, (member.id, state), priority=state.priority)
 
     async def force_enable_with(self, members: Sequence[discord.Member]) -> None:
         self.members.update(m.id for m in members)
@@ -503,8 +552,9 @@ class Gatekeeper:
                 await conn.executemany(query, [(self.id, m.id) for m in members])
 
         self.started_at = now
+        state = GatekeeperRoleState.pending_add
         for member in members:
-            self.queue.put(member.id, (member.id, GatekeeperRoleState.pending_add))
+            self.queue.put(member.id, (member.id, state), priority=state.priority)
 
     async def unblock(self, member: discord.Member) -> None:
         self.members.discard(member.id)
@@ -515,7 +565,8 @@ class Gatekeeper:
         else:
             query = "UPDATE guild_gatekeeper_members SET state = 'pending_remove' WHERE guild_id = $1 AND user_id = $2"
             await self.bot.pool.execute(query, self.id, member.id)
-            self.queue.put(member.id, (member.id, GatekeeperRoleState.pending_remove))
+            state = GatekeeperRoleState.pending_remove
+            self.queue.put(member.id, (member.id, state), priority=state.priority)
 
 
 ## Views
@@ -2039,11 +2090,10 @@ class Mod(commands.Cog):
 
             self.message_batches.clear()
 
-    @cache.cache()
+    @cache.cache(strategy=cache.Strategy.revalidate)
     async def get_guild_config(self, guild_id: int) -> Optional[ModConfig]:
-        query = """SELECT * FROM guild_mod_config WHERE id=$1;"""
         async with self.bot.pool.acquire(timeout=300.0) as con:
-            record = await con.fetchrow(query, guild_id)
+            record = await db.fetchrow_prepared(con, _GUILD_CONFIG_QUERY, guild_id)
             if record is not None:
                 return ModConfig.from_record(record, self.bot)
             return None
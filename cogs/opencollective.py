@@ -117,7 +117,9 @@ class OpenCollective(commands.Cog):
         self.bot: RoboDanny = bot
 
     async def cog_load(self) -> None:
-        self.update_contributor_metadata.start()
+        # only one process of a cluster should be syncing
+        if self.bot.is_primary:
+            self.update_contributor_metadata.start()
 
     async def cog_unload(self) -> None:
         self.update_contributor_metadata.stop()
@@ -387,7 +387,7 @@ class Profile(commands.Cog):
         if cog is None:
             return []
 
-        weapons = cog.query_weapons_autocomplete(current)[:25]
+        weapons = cog.query_weapons_autocomplete(current, interaction.user.id)[:25]
         return [app_commands.Choice(name=weapon.choice_name, value=weapon.name) for weapon in weapons]
 
     @profile.command(usage='<mode> <rank>')
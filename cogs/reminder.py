@@ -136,6 +136,11 @@ class TimeZone(NamedTuple):
         return app_commands.Choice(name=self.label, value=self.key)
 
 
+# these timers act on the guild given as their first argument, in a
+# cluster they're dispatched by the process that has that guild
+GUILD_TIMER_EVENTS = frozenset({'tempban', 'tempmute', 'tempblock', 'lockdown'})
+
+
 class Timer:
     __slots__ = ('args', 'kwargs', 'event', 'id', 'created_at', 'expires', 'timezone')
 
@@ -180,6 +185,25 @@ class Timer:
     def __hash__(self) -> int:
         return hash(self.id)
 
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Self:
+        record = {
+            **data,
+            'created': datetime.datetime.fromisoformat(data['created']),
+            'expires': datetime.datetime.fromisoformat(data['expires']),
+        }
+        return cls(record=record)  # type: ignore
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'id': self.id,
+            'extra': {'args': self.args, 'kwargs': self.kwargs},
+            'event': self.event,
+            'created': self.created_at.isoformat(),
+            'expires': self.expires.isoformat(),
+            'timezone': self.timezone,
+        }
+
     @property
     def human_delta(self) -> str:
         return time.format_relative(self.created_at)
@@ -243,7 +267,10 @@ class Reminder(commands.Cog):
         self.bot: RoboDanny = bot
         self._have_data = asyncio.Event()
         self._current_timer: Optional[Timer] = None
-        self._task = bot.loop.create_task(self.dispatch_timers())
+        # only the primary process dispatches timers, the others hand it the ones they create
+        self._task: Optional[asyncio.Task[None]] = None
+        if bot.is_primary:
+            self._task = bot.loop.create_task(self.dispatch_timers())
         self.valid_timezones: set[str] = set(get_zonefile_instance().zones)
         # User-friendly timezone names, some manual and most from the CLDR database.
         self._timezone_aliases: dict[str, str] = {
@@ -262,16 +289,26 @@ class Reminder(commands.Cog):
             'PDT': 'America/Los_Angeles',
         }
         self._default_timezones: list[app_commands.Choice[str]] = []
+        self._timezone_index: fuzzy.FuzzyIndex[str] = fuzzy.FuzzyIndex(self.valid_timezones)
+        self._timezone_alias_index: fuzzy.FuzzyIndex[str] = fuzzy.FuzzyIndex(self._timezone_aliases)
+        self._autocomplete = fuzzy.AutocompleteCache()
 
     async def cog_load(self) -> None:
         await self.parse_bcp47_timezones()
+        if self.bot.bus is not None:
+            self.bot.bus.subscribe('timer_created', self._on_remote_timer_created)
+            self.bot.bus.subscribe('timer_claimed', self._on_remote_timer_claimed)
 
     @property
     def display_emoji(self) -> discord.PartialEmoji:
         return discord.PartialEmoji(name='\N{ALARM CLOCK}')
 
     def cog_unload(self) -> None:
-        self._task.cancel()
+        if self._task is not None:
+            self._task.cancel()
+        if self.bot.bus is not None:
+            self.bot.bus.unsubscribe('timer_created', self._on_remote_timer_created)
+            self.bot.bus.unsubscribe('timer_claimed', self._on_remote_timer_claimed)
 
     async def cog_command_error(self, ctx: Context, error: commands.CommandError):
         if isinstance(error, commands.BadArgument):
@@ -321,6 +358,8 @@ class Reminder(commands.Cog):
                 if entry is not None:
                     self._default_timezones.append(app_commands.Choice(name=entry.description, value=entry.aliases[0]))
 
+            self._timezone_alias_index = fuzzy.FuzzyIndex(self._timezone_aliases)
+
     @cache.cache()
     async def get_timezone(self, user_id: int, /) -> Optional[str]:
         query = "SELECT timezone from user_settings WHERE id = $1;"
@@ -333,13 +372,20 @@ class Reminder(commands.Cog):
             return datetime.timezone.utc
         return dateutil.tz.gettz(tz) or datetime.timezone.utc
 
-    def find_timezones(self, query: str) -> list[TimeZone]:
+    def find_timezones(self, query: str, *, user_id: Optional[int] = None) -> list[TimeZone]:
         # A bit hacky, but if '/' is in the query then it's looking for a raw identifier
         # otherwise it's looking for a CLDR alias
         if '/' in query:
-            return [TimeZone(key=a, label=a) for a in fuzzy.finder(query, self.valid_timezones)]
-
-        keys = fuzzy.finder(query, self._timezone_aliases.keys())
+            if user_id is not None:
+                matches = self._autocomplete.finder(user_id, query, self._timezone_index, scope='raw')
+            else:
+                matches = self._timezone_index.finder(query)
+            return [TimeZone(key=a, label=a) for a in matches]
+
+        if user_id is not None:
+            keys = self._autocomplete.finder(user_id, query, self._timezone_alias_index, scope='alias')
+        else:
+            keys = self._timezone_alias_index.finder(query)
         return [TimeZone(label=k, key=self._timezone_aliases[k]) for k in keys]
 
     async def get_active_timer(self, *, connection: Optional[asyncpg.Connection] = None, days: int = 7) -> Optional[Timer]:
@@ -368,15 +414,52 @@ class Reminder(commands.Cog):
             # At this point we always have data
             return await self.get_active_timer(connection=con, days=days)  # type: ignore
 
+    def restart_dispatch(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = self.bot.loop.create_task(self.dispatch_timers())
+
+    def is_local(self, timer: Timer) -> bool:
+        """Whether this process is the one that has to dispatch the timer."""
+        if timer.event in GUILD_TIMER_EVENTS and self.bot.bus is not None:
+            shard_id = (timer.args[0] >> 22) % self.bot.shard_count  # type: ignore
+            return shard_id in (self.bot.shard_ids or ())
+        return self.bot.is_primary
+
     async def call_timer(self, timer: Timer) -> None:
-        # delete the timer
-        query = "DELETE FROM reminders WHERE id=$1;"
-        await self.bot.pool.execute(query, timer.id)
+        # delete the timer, if it's already gone then it was deleted
+        # while we were waiting for it and must not be dispatched
+        query = "DELETE FROM reminders WHERE id=$1 RETURNING id;"
+        claimed = await self.bot.pool.fetchval(query, timer.id)
+        if claimed is None:
+            return
+
+        if not self.is_local(timer):
+            await self.bot.publish('timer_claimed', timer.to_dict())
+            return
 
         # dispatch the event
         event_name = f'{timer.event}_timer_complete'
         self.bot.dispatch(event_name, timer)
 
+    def _on_remote_timer_claimed(self, data: dict[str, Any]) -> None:
+        timer = Timer.from_dict(data)
+        if self.is_local(timer):
+            self.bot.dispatch(f'{timer.event}_timer_complete', timer)
+
+    def _on_remote_timer_created(self, data: dict[str, Any]) -> None:
+        self.wake_dispatch(datetime.datetime.fromisoformat(data['expires']))
+
+    def wake_dispatch(self, when: datetime.datetime) -> None:
+        # only set the data check if it can be waited on
+        if (when - datetime.datetime.utcnow()).total_seconds() <= (86400 * 40):  # 40 days
+            self._have_data.set()
+
+        # check if this timer is earlier than our currently run timer
+        if self._current_timer and when < self._current_timer.expires:
+            # cancel the task and re-run it
+            self.restart_dispatch()
+
     async def dispatch_timers(self) -> None:
         try:
             while not self.bot.is_closed():
@@ -394,8 +477,7 @@ class Reminder(commands.Cog):
         except asyncio.CancelledError:
             raise
         except (OSError, discord.ConnectionClosed, asyncpg.PostgresConnectionError):
-            self._task.cancel()
-            self._task = self.bot.loop.create_task(self.dispatch_timers())
+            self.restart_dispatch()
 
     async def short_timer_optimisation(self, seconds: float, timer: Timer) -> None:
         await asyncio.sleep(seconds)
@@ -445,8 +527,7 @@ class Reminder(commands.Cog):
         # if the current timer is being deleted
         if record is not None and self._current_timer and self._current_timer.id == record['id']:
             # cancel the task and re-run it
-            self._task.cancel()
-            self._task = self.bot.loop.create_task(self.dispatch_timers())
+            self.restart_dispatch()
 
     async def create_timer(self, when: datetime.datetime, event: str, /, *args: Any, **kwargs: Any) -> Timer:
         r"""Creates a timer.
@@ -509,15 +590,10 @@ class Reminder(commands.Cog):
         row = await pool.fetchrow(query, event, {'args': args, 'kwargs': kwargs}, when, now, timezone_name)
         timer.id = row[0]
 
-        # only set the data check if it can be waited on
-        if delta <= (86400 * 40):  # 40 days
-            self._have_data.set()
-
-        # check if this timer is earlier than our currently run timer
-        if self._current_timer and when < self._current_timer.expires:
-            # cancel the task and re-run it
-            self._task.cancel()
-            self._task = self.bot.loop.create_task(self.dispatch_timers())
+        if self._task is None:
+            await self.bot.publish('timer_created', {'expires': when.isoformat()})
+        else:
+            self.wake_dispatch(when)
 
         return timer
 
@@ -646,8 +722,7 @@ class Reminder(commands.Cog):
         # if the current timer is being deleted
         if self._current_timer and self._current_timer.id == id:
             # cancel the task and re-run it
-            self._task.cancel()
-            self._task = self.bot.loop.create_task(self.dispatch_timers())
+            self.restart_dispatch()
 
         await ctx.send('Successfully deleted reminder.', ephemeral=True)
 
@@ -678,8 +753,7 @@ class Reminder(commands.Cog):
 
         # Check if the current timer is the one being cleared and cancel it if so
         if self._current_timer and self._current_timer.author_id == ctx.author.id:
-            self._task.cancel()
-            self._task = self.bot.loop.create_task(self.dispatch_timers())
+            self.restart_dispatch()
 
         await ctx.send(f'Successfully deleted {formats.plural(total):reminder}.', ephemeral=True)
 
@@ -735,7 +809,7 @@ class Reminder(commands.Cog):
     ) -> list[app_commands.Choice[str]]:
         if not argument:
             return self._default_timezones
-        matches = self.find_timezones(argument)
+        matches = self.find_timezones(argument, user_id=interaction.user.id)
         return [tz.to_choice() for tz in matches[:25]]
 
     @timezone.command(name='get')
@@ -694,13 +694,13 @@ class SplatNet3:
             data = await resp.json()
             return data
 
-    async def schedule(self) -> Optional[SplatNetSchedule]:
+    async def schedule(self) -> Optional[dict[str, Any]]:
         # Called StageScheduleQuery internally
         data = await self.cached_graphql_query('9b6b90568f990b2a14f04c25dd6eb53b35cc12ac815db85ececfccee64215edd')
         data = data.get('data', {})
         if not data:
             return None
-        return SplatNetSchedule(data)
+        return data
 
     async def shop(self) -> Optional[SplatNetShopPayload]:
         # Called GesotownQuery internally
@@ -1848,14 +1848,14 @@ class AddWeaponModal(discord.ui.Modal, title='Add New Weapon'):
         self.cog: Splatoon = cog
 
     async def on_submit(self, interaction: discord.Interaction) -> None:
-        weapons = self.cog.splat3_data.get('weapons', [])
         entry: SplatoonConfigWeapon = {
             'name': str(self.name),
             'sub': str(self.sub),
             'special': str(self.special),
         }
-        weapons.append(Weapon(entry))
-        await self.cog.splat3_data.put('weapons', weapons)
+        # a new list so the weapon autocomplete searches it from scratch
+        weapons = [*self.cog.splat3_data.get('weapons', []), Weapon(entry)]
+        await self.cog.put_splat3('weapons', weapons)
         await interaction.response.send_message(f'Successfully added new weapon {self.name}')
 
 
@@ -1894,7 +1894,7 @@ class AdminPanel(discord.ui.View):
         name = modal.input.value
         entry = self.cog.splat3_data.get('maps', [])
         entry.append(name)
-        await self.cog.splat3_data.put('maps', entry)
+        await self.cog.put_splat3('maps', entry)
 
         await modal.interaction.response.send_message(f'Successfully added new map {name}')
 
@@ -1924,10 +1924,11 @@ class Splatoon(commands.GroupCog):
         self.splat2_data: config.Config[Any] = config.Config(
             'splatoon2.json', object_hook=splatoon_decoder, encoder=SplatoonEncoder
         )
-        self.splat3_data: config.Config[Any] = config.Config(
-            'splatoon3.json', object_hook=splatoon_decoder, encoder=SplatoonEncoder
+        # only a handful of these keys are needed at a time, the rest are decoded when first used
+        storage = config.SQLiteStorage(
+            'splatoon3.db', object_hook=splatoon_decoder, encoder=SplatoonEncoder, migrate_from='splatoon3.json'
         )
-        self._splatnet3: asyncio.Task[None] = asyncio.create_task(self.splatnet3())
+        self.splat3_data: config.Config[Any] = config.Config('splatoon3.db', storage=storage)
         self._last_request: datetime.datetime = discord.utils.utcnow()
 
         # mode: List[Rotation]
@@ -1936,12 +1937,56 @@ class Splatoon(commands.GroupCog):
         self.sp3_shop: list[Merchandise] = []
         self._last_battle: Optional[VsHistoryDetailPayload] = None
 
+        # only the primary process talks to SplatNet, the others load what it found from splat3_data
+        self.load_splatnet3_results()
+        self._splatnet3: Optional[asyncio.Task[None]] = None
+        if bot.is_primary:
+            self._splatnet3 = asyncio.create_task(self.splatnet3())
+        self._autocomplete = fuzzy.AutocompleteCache()
+
     @property
     def display_emoji(self) -> discord.PartialEmoji:
         return discord.PartialEmoji(name='SquidPink', id=230079634086166530)
 
+    async def cog_load(self) -> None:
+        if self.bot.bus is not None:
+            self.bot.bus.subscribe('splatoon3', self._on_remote_splat3)
+
     def cog_unload(self):
-        self._splatnet3.cancel()
+        if self._splatnet3 is not None:
+            self._splatnet3.cancel()
+        if self.bot.bus is not None:
+            self.bot.bus.unsubscribe('splatoon3', self._on_remote_splat3)
+
+    async def put_splat3(self, key: str, value: Any) -> None:
+        """Stores a Splatoon 3 entry and tells the other processes that it changed."""
+        await self.splat3_data.put(key, value)
+        await self.bot.publish('splatoon3', {'key': key})
+
+    async def _on_remote_splat3(self, data: dict[str, Any]) -> None:
+        # the new value is already in the shared database, only the decoded copies are stale
+        await self.splat3_data.load()
+        key = data['key']
+        if key == 'session_token':
+            self.restart_splatnet3()
+        elif key in ('schedule', 'shop', 'last_battle'):
+            self.load_splatnet3_results()
+
+    def load_splatnet3_results(self) -> None:
+        schedule = self.splat3_data.get('schedule')
+        self.sp3_map_data = schedule and SplatNetSchedule(schedule)
+        self.load_splatnet3_shop(self.splat3_data.get('shop') or {})
+        self._last_battle = self.splat3_data.get('last_battle')
+
+    def load_splatnet3_shop(self, payload: SplatNetShopPayload) -> None:
+        self.sp3_shop = [Merchandise(item) for item in payload.get('pickupBrand', {}).get('brandGears', [])]
+        self.sp3_shop.extend(Merchandise(item) for item in payload.get('limitedGears', []))
+        self.sp3_shop.sort(key=lambda x: x.end_time)
+
+    def restart_splatnet3(self) -> None:
+        if self._splatnet3 is not None:
+            self._splatnet3.cancel()
+            self._splatnet3 = self.bot.loop.create_task(self.splatnet3())
 
     async def cog_command_error(self, ctx: Context, error: commands.CommandError):
         if isinstance(error, commands.BadArgument):
@@ -2032,7 +2077,9 @@ class Splatoon(commands.GroupCog):
         return images
 
     async def parse_splatnet3_schedule(self) -> Optional[float]:
-        self.sp3_map_data = schedule = await self.splatnet.schedule()
+        payload = await self.splatnet.schedule()
+        await self.put_splat3('schedule', payload)
+        self.sp3_map_data = schedule = payload and SplatNetSchedule(payload)
         expiry = schedule and schedule.soonest_expiry
         log.info('Successfully retrieved SplatNet 3 schedule')
         if expiry:
@@ -2041,21 +2088,17 @@ class Splatoon(commands.GroupCog):
         return None
 
     async def parse_splatnet3_onlineshop(self) -> Optional[float]:
-        self.sp3_shop = []
         payload = await self.splatnet.shop()
+        await self.put_splat3('shop', payload)
         if payload is None:
+            self.sp3_shop = []
             log.info('No information retreived from SplatNet 3 online shop')
             return None
 
         log.info('Successfully retrieved SplatNet 3 online shop')
-        for item in payload.get('pickupBrand', {}).get('brandGears', []):
-            self.sp3_shop.append(Merchandise(item))
-        for item in payload.get('limitedGears', []):
-            self.sp3_shop.append(Merchandise(item))
-
+        self.load_splatnet3_shop(payload)
         await self.bulk_upload_images(self.find_all_images(payload))
 
-        self.sp3_shop.sort(key=lambda x: x.end_time)
         try:
             expiry = self.sp3_shop[0].end_time
         except IndexError:
@@ -2129,6 +2172,9 @@ class Splatoon(commands.GroupCog):
             with open(base_path / f'{parse_battle_id(newest_raw_battle_id)}.json', 'r', encoding='utf-8') as f:
                 self._last_battle = json.load(f).get('vsHistoryDetail')
 
+        if new_entries:
+            await self.put_splat3('last_battle', self._last_battle)
+
         await self.bulk_upload_images(images)
         if new_entries:
             log.info('Scraped Splatoon 3 results from %s games.', new_entries)
@@ -2150,7 +2196,7 @@ class Splatoon(commands.GroupCog):
             fp = io.BytesIO(data)
             msg = await channel.send(file=discord.File(fp, filename=f'{key}.png'))
             attachments[key] = url = msg.attachments[0].url
-            await self.splat3_data.put('attachments', attachments)
+            await self.put_splat3('attachments', attachments)
             return url
 
     def get_image_url_for(self, key: str) -> Optional[str]:
@@ -2186,15 +2232,12 @@ class Splatoon(commands.GroupCog):
                     attachments[file.filename[:-4]] = attachment.url
 
         if new_images:
-            await self.splat3_data.put('attachments', attachments)
+            await self.put_splat3('attachments', attachments)
             log.info('Successfully scraped and uploaded %s images from SplatNet 3.', new_images)
 
     async def refresh_splatnet_session(self, session_token: Optional[str]) -> None:
-        config = self.splat3_data.all()
-        config['session_token'] = session_token
-        await self.splat3_data.save()
-        self._splatnet3.cancel()
-        self._splatnet3 = self.bot.loop.create_task(self.splatnet3())
+        await self.put_splat3('session_token', session_token)
+        self.restart_splatnet3()
 
     async def splatnet3(self) -> None:
         try:
@@ -2222,8 +2265,7 @@ class Splatoon(commands.GroupCog):
         except asyncio.CancelledError:
             raise
         except (OSError, discord.ConnectionClosed):
-            self._splatnet3.cancel()
-            self._splatnet3 = self.bot.loop.create_task(self.splatnet3())
+            self.restart_splatnet3()
         except Exception:
             await self.log_error(extra='SplatNet 3 Error')
 
@@ -2235,8 +2277,10 @@ class Splatoon(commands.GroupCog):
         results = fuzzy.extract_or_exact(name, choices, scorer=fuzzy.token_sort_ratio, score_cutoff=60)
         return [v for k, _, v in results]
 
-    def query_weapons_autocomplete(self, name: str) -> list[Weapon]:
+    def query_weapons_autocomplete(self, name: str, user_id: Optional[int] = None) -> list[Weapon]:
         data: list[Weapon] = self.splat3_data.get('weapons', [])
+        if user_id is not None:
+            return self._autocomplete.finder(user_id, name, data, key=lambda w: w.choice_name, scope='weapons')
         results = fuzzy.finder(name, data, key=lambda w: w.choice_name)
         return results
 
@@ -2469,7 +2513,7 @@ class Splatoon(commands.GroupCog):
 
     @weapon.autocomplete('query')
     async def weapon_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
-        weapons = self.query_weapons_autocomplete(current)[:25]
+        weapons = self.query_weapons_autocomplete(current, interaction.user.id)[:25]
         return [app_commands.Choice(name=weapon.choice_name, value=weapon.name) for weapon in weapons]
 
     def filter_gear_choices(
@@ -2564,8 +2608,19 @@ class Splatoon(commands.GroupCog):
     @gear.autocomplete('name')
     async def gear_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
         namespace = interaction.namespace
-        matches = self.filter_gear_choices(
-            current, brand=namespace.brand, ability=namespace.ability, frequent=namespace.frequent, type=namespace.type
+        filters = dict(brand=namespace.brand, ability=namespace.ability, frequent=namespace.frequent, type=namespace.type)
+        if not current:
+            matches = self.filter_gear_choices(None, **filters)[:25]
+            return [app_commands.Choice(name=g.name, value=g.name) for g in matches]
+
+        matches = self._autocomplete.finder(
+            interaction.user.id,
+            current,
+            lambda: self.filter_gear_choices(None, **filters),
+            key=lambda g: g.name,
+            scope=('gear', *filters.values()),
+            # the lists the gear choices are built from, replaced whenever the data is reloaded
+            source=tuple(self.splat3_data.get(key) for key in ('head', 'shoes', 'clothes', 'brands')),
         )[:25]
         return [app_commands.Choice(name=g.name, value=g.name) for g in matches]
 
@@ -2657,6 +2712,9 @@ class Splatoon(commands.GroupCog):
     async def splatoon_admin(self, ctx: Context):
         """Administration panel for Splatoon configuration"""
 
+        if self._splatnet3 is None:
+            return await ctx.send('SplatNet 3 is only handled by the primary process (cluster 0).')
+
         e = discord.Embed(colour=self.random_colour(), title='Splatoon Cog Administration')
         splatnet = not self._splatnet3.done()
         unauthed = self._splatnet3.done() and isinstance(self._splatnet3.exception(), Unauthenticated)
@@ -2675,7 +2733,7 @@ class Splatoon(commands.GroupCog):
 
         async with ctx.typing():
             last_battle = self.last_battle
-            if last_battle is None or not last_battle.is_recent():
+            if (last_battle is None or not last_battle.is_recent()) and self._splatnet3 is not None:
                 await self.scrape_splatnet3_stats_and_images()
                 last_battle = self.last_battle
 
@@ -4,7 +4,7 @@ from typing_extensions import Annotated
 
 from discord.ext import commands, tasks
 from discord import app_commands
-from .utils import checks, cache
+from .utils import checks, cache, db
 from .utils.formats import plural
 from .utils.paginator import SimplePages
 
@@ -29,6 +29,8 @@ if TYPE_CHECKING:
 
 log = logging.getLogger(__name__)
 
+_STARBOARD_QUERY = db.prepared_statements.register('stars.starboard', 'SELECT * FROM starboard WHERE id=$1;')
+
 
 class StarError(commands.CheckFailure):
     pass
@@ -157,8 +159,7 @@ class Stars(commands.Cog):
         self, guild_id: int, *, connection: Optional[asyncpg.Pool | asyncpg.Connection] = None
     ) -> StarboardConfig:
         connection = connection or self.bot.pool
-        query = "SELECT * FROM starboard WHERE id=$1;"
-        record = await connection.fetchrow(query, guild_id)
+        record = await db.fetchrow_prepared(connection, _STARBOARD_QUERY, guild_id)
         return StarboardConfig(guild_id=guild_id, bot=self.bot, record=record)
 
     def star_emoji(self, stars: int) -> str:
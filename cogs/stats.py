@@ -1,12 +1,12 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Any, Optional, TypedDict
+from typing import TYPE_CHECKING, Any, Literal, Optional, TypedDict
 from typing_extensions import Annotated
 
 import sys
 from discord.ext import commands, tasks, menus
 from collections import Counter, defaultdict
 
-from .utils import time, formats
+from .utils import time, formats, cache
 from .utils.paginator import RoboPages, FieldPageSource
 
 import pkg_resources
@@ -14,6 +14,7 @@ import logging
 import discord
 import textwrap
 import datetime
+import json
 import traceback
 import itertools
 import asyncpg
@@ -45,6 +46,14 @@ class DataBatchEntry(TypedDict):
     app_command: bool
 
 
+def get_log_queue_handler() -> Optional[logging.Handler]:
+    """Returns the root queue handler set up by the launcher, if any."""
+    for handler in logging.getLogger().handlers:
+        if getattr(handler, 'listener', None) is not None:
+            return handler
+    return None
+
+
 class LoggingHandler(logging.Handler):
     def __init__(self, cog: Stats):
         self.cog: Stats = cog
@@ -87,6 +96,7 @@ class Stats(commands.Cog):
         self.bulk_insert_loop.start()
         self._logging_queue = asyncio.Queue()
         self.logging_worker.start()
+        self.gateway_latency_loop.start()
 
     @property
     def display_emoji(self) -> discord.PartialEmoji:
@@ -118,12 +128,23 @@ class Stats(commands.Cog):
     def cog_unload(self):
         self.bulk_insert_loop.stop()
         self.logging_worker.cancel()
+        self.gateway_latency_loop.cancel()
 
     @tasks.loop(seconds=10.0)
     async def bulk_insert_loop(self):
         async with self._batch_lock:
             await self.bulk_insert()
 
+    @tasks.loop(minutes=1.0)
+    async def gateway_latency_loop(self):
+        for shard_id, shard in self.bot.shards.items():
+            if not shard.is_closed():
+                self.bot.gateway_telemetry[shard_id].record_latency(shard.latency)
+
+    @gateway_latency_loop.before_loop
+    async def before_gateway_latency_loop(self):
+        await self.bot.wait_until_ready()
+
     @tasks.loop(seconds=0.0)
     async def logging_worker(self):
         record = await self._logging_queue.get()
@@ -696,7 +717,8 @@ class Stats(commands.Cog):
     def add_record(self, record: logging.LogRecord) -> None:
         # if self.bot.config.debug:
         #     return
-        self._logging_queue.put_nowait(record)
+        # this is called from the logging thread
+        self.bot.loop.call_soon_threadsafe(self._logging_queue.put_nowait, record)
 
     async def send_log_record(self, record: logging.LogRecord) -> None:
         attributes = {'INFO': '\N{INFORMATION SOURCE}\ufe0f', 'WARNING': '\N{WARNING SIGN}\ufe0f'}
@@ -718,9 +740,6 @@ class Stats(commands.Cog):
     async def bothealth(self, ctx: Context):
         """Various bot health monitoring tools."""
 
-        # This uses a lot of private methods because there is no
-        # clean way of doing this otherwise.
-
         HEALTHY = discord.Colour(value=0x43B581)
         UNHEALTHY = discord.Colour(value=0xF04947)
         WARNING = discord.Colour(value=0xF09E47)
@@ -730,35 +749,48 @@ class Stats(commands.Cog):
 
         # Check the connection pool health.
         pool = self.bot.pool
-        total_waiting = len(pool._queue._getters)  # type: ignore
+        wait_p50, wait_p99 = pool.acquire_percentiles(50, 99)
+
         current_generation = pool._generation
 
         description = [
-            f'Total `Pool.acquire` Waiters: {total_waiting}',
+            f'Total `Pool.acquire` Waiters: {pool.waiting}',
             f'Current Pool Generation: {current_generation}',
-            f'Connections In Use: {len(pool._holders) - pool._queue.qsize()}',  # type: ignore
+            f'Connections In Use: {pool.in_use}/{pool.limit} (open: {pool.get_size()}, idle: {pool.get_idle_size()})',
+            f'Acquire Wait: p50 {wait_p50 * 1000:.2f}ms, p99 {wait_p99 * 1000:.2f}ms',
         ]
 
         questionable_connections = 0
         connection_value = []
         for index, holder in enumerate(pool._holders, start=1):
+            if holder._con is None:
+                # connections are opened on demand so most holders might not have one yet
+                continue
+
             generation = holder._generation
             in_use = holder._in_use is not None
-            is_closed = holder._con is None or holder._con.is_closed()
+            is_closed = holder._con.is_closed()
             display = f'gen={holder._generation} in_use={in_use} closed={is_closed}'
+            if in_use:
+                display = f'{display} site={pool.held_by(holder._proxy)}'
             questionable_connections += any((in_use, generation != current_generation))
             connection_value.append(f'<Holder i={index} {display}>')
 
         joined_value = '\n'.join(connection_value)
+        if len(joined_value) > 1000:
+            joined_value = joined_value[: joined_value.rfind('\n', 0, 1000)] + '\n...'
         embed.add_field(name='Connections', value=f'```py\n{joined_value}\n```', inline=False)
 
-        spam_control = self.bot.spam_control
-        being_spammed = [str(key) for key, value in spam_control._cache.items() if value._tokens == 0]
+        being_spammed = self.bot.spam_control.throttled_count(discord.utils.utcnow().timestamp())
 
-        description.append(f'Current Spammers: {", ".join(being_spammed) if being_spammed else "None"}')
+        description.append(f'Current Spammers: {being_spammed}')
         description.append(f'Questionable Connections: {questionable_connections}')
 
         total_warnings += questionable_connections
+        if wait_p99 >= pool.target_wait or pool.waiting:
+            embed.colour = WARNING
+            total_warnings += 1
+
         if being_spammed:
             embed.colour = WARNING
             total_warnings += 1
@@ -786,6 +818,28 @@ class Stats(commands.Cog):
         global_rate_limit = not self.bot.http._global_over.is_set()
         description.append(f'Global Rate Limit: {global_rate_limit}')
 
+        monitor = self.bot.loop_monitor
+        lag_p50, lag_p99 = monitor.percentiles(50, 99)
+        description.append(f'Loop Lag: p50 {lag_p50 * 1000:.2f}ms, p99 {lag_p99 * 1000:.2f}ms')
+        if monitor.stalls:
+            stall = monitor.stalls[-1]
+            description.append(
+                f'Last Loop Stall: {stall.duration * 1000:.0f}ms in {stall.source} ({time.format_relative(stall.when)})'
+            )
+        if lag_p99 >= monitor.threshold:
+            total_warnings += 1
+            embed.colour = WARNING
+
+        queue_handler = get_log_queue_handler()
+        if queue_handler is not None:
+            description.append(f'Dropped Log Records: {queue_handler.dropped}')  # type: ignore
+
+        lookups = self.bot.member_resolver.stats
+        description.append(
+            f'Member Lookups: {lookups["hits"]} hits, {lookups["misses"]} requests, '
+            f'{lookups["coalesced"]} coalesced, {lookups["negative_hits"]} negative hits'
+        )
+
         if command_waiters >= 8:
             total_warnings += 1
             embed.colour = WARNING
@@ -797,31 +851,157 @@ class Stats(commands.Cog):
         embed.description = '\n'.join(description)
         await ctx.send(embed=embed)
 
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def looplag(self, ctx: Context, index: Optional[int] = None):
+        """Shows event loop lag and the most recent loop stalls.
+
+        If an index is given then the stack of that stall is shown.
+        """
+
+        monitor = self.bot.loop_monitor
+        stalls = list(reversed(monitor.stalls))
+        if index is not None:
+            try:
+                stall = stalls[index - 1]
+            except IndexError:
+                return await ctx.send('Could not find a loop stall with that index.')
+            fmt = f'{stall.duration * 1000:.0f}ms in {stall.source}\n```py\n{stall.stack}\n```'
+            return await ctx.safe_send(fmt, escape_mentions=False)
+
+        p50, p90, p99, worst = monitor.percentiles(50, 90, 99, 100)
+        embed = discord.Embed(title='Event Loop Lag', colour=discord.Colour.blurple())
+        embed.description = (
+            f'p50: {p50 * 1000:.2f}ms\n'
+            f'p90: {p90 * 1000:.2f}ms\n'
+            f'p99: {p99 * 1000:.2f}ms\n'
+            f'max: {worst * 1000:.2f}ms\n'
+            f'Samples: {len(monitor.lags)}, Total Stalls: {monitor.total_stalls}'
+        )
+
+        lines = [
+            f'{i}. {stall.duration * 1000:.0f}ms {time.format_relative(stall.when)}: {stall.source}'
+            for i, stall in enumerate(stalls[:5], start=1)
+        ]
+        if lines:
+            embed.add_field(name=f'Stalls Over {monitor.threshold * 1000:.0f}ms', value='\n'.join(lines), inline=False)
+        await ctx.send(embed=embed)
+
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def pool(self, ctx: Context):
+        """Shows connection pool usage and the call sites holding connections the longest."""
+
+        pool = self.bot.pool
+        p50, p90, p99, worst = pool.acquire_percentiles(50, 90, 99, 100)
+        depth_p50, depth_p99 = pool.queue_depth_percentiles(50, 99)
+        embed = discord.Embed(title='Connection Pool', colour=discord.Colour.blurple())
+        embed.description = (
+            f'In Use: {pool.in_use}/{pool.limit} (bounds: {pool.min_size}-{pool.max_size})\n'
+            f'Open: {pool.get_size()}, Idle: {pool.get_idle_size()}, Waiting: {pool.waiting}\n'
+            f'Queue Depth: p50 {depth_p50}, p99 {depth_p99}'
+        )
+        embed.add_field(
+            name='Acquire Wait',
+            value=(
+                f'p50: {p50 * 1000:.2f}ms\n'
+                f'p90: {p90 * 1000:.2f}ms\n'
+                f'p99: {p99 * 1000:.2f}ms\n'
+                f'max: {worst * 1000:.2f}ms'
+            ),
+            inline=False,
+        )
+
+        sites = sorted(pool.call_sites.values(), key=lambda s: s.total_hold, reverse=True)
+        lines = []
+        for site in sites[:6]:
+            hold_p50, hold_p99 = site.percentiles(50, 99)
+            lines.append(
+                f'`{site.name}`: {site.calls} calls, {site.total_hold:.1f}s total, '
+                f'p50 {hold_p50 * 1000:.1f}ms, p99 {hold_p99 * 1000:.1f}ms'
+            )
+        if lines:
+            embed.add_field(name='Hold Time By Call Site', value='\n'.join(lines), inline=False)
+        await ctx.send(embed=embed)
+
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def caches(self, ctx: Context, output: Literal['table', 'json'] = 'table'):
+        """Shows hit rates, evictions and memory of every cached function.
+
+        Passing "json" uploads the full stats as a JSON file instead.
+        """
+
+        stats = cache.get_all_stats()
+        if output == 'json':
+            fp = io.BytesIO(json.dumps(cache.dump_stats(), indent=2).encode('utf-8'))
+            return await ctx.send(file=discord.File(fp, 'caches.json'))
+
+        stats.sort(key=lambda s: s.hits + s.misses, reverse=True)
+        table = formats.TabularData()
+        table.set_columns(['Function', 'Size', 'Hits', 'Misses', 'Hit %', 'Evicted', 'Pending', 'Failed', 'KiB'])
+        for s in stats:
+            if s.strategy is cache.Strategy.lru or s.strategy is cache.Strategy.revalidate:
+                size = f'{s.entries}/{s.maxsize}'
+            elif s.strategy is cache.Strategy.timed:
+                size = f'{s.entries} ({s.maxsize}s)'
+            else:
+                size = str(s.entries)
+
+            table.add_row(
+                [
+                    # cogs.config.Config.is_plonked -> Config.is_plonked
+                    '.'.join(s.name.split('.')[-2:]),
+                    size,
+                    s.hits,
+                    s.misses,
+                    f'{s.hit_rate:.1%}',
+                    s.evictions,
+                    s.in_flight,
+                    s.failed,
+                    f'{s.approximate_memory() / 1024:.1f}',
+                ]
+            )
+
+        fmt = f'```\n{table.render()}\n```'
+        if len(fmt) > 2000:
+            fp = io.BytesIO(fmt.encode('utf-8'))
+            await ctx.send('Too many results...', file=discord.File(fp, 'caches.txt'))
+        else:
+            await ctx.send(fmt)
+
     @commands.command(hidden=True)
     @commands.is_owner()
     async def gateway(self, ctx: Context):
         """Gateway related stats."""
 
         yesterday = discord.utils.utcnow() - datetime.timedelta(days=1)
+        telemetry = self.bot.gateway_telemetry
 
         # fmt: off
         identifies = {
-            shard_id: sum(1 for dt in dates if dt > yesterday)
-            for shard_id, dates in self.bot.identifies.items()
+            shard.shard_id: shard.count_since(shard.identifies, yesterday)
+            for shard in telemetry
         }
         resumes = {
-            shard_id: sum(1 for dt in dates if dt > yesterday)
-            for shard_id, dates in self.bot.resumes.items()
+            shard.shard_id: shard.count_since(shard.resumes, yesterday)
+            for shard in telemetry
         }
         # fmt: on
 
         total_identifies = sum(identifies.values())
+        successful_resumes = sum(shard.successful_resumes for shard in telemetry)
+        failed_resumes = sum(shard.failed_resumes for shard in telemetry)
+        total_resumes = successful_resumes + failed_resumes
 
         builder = [
             f'Total RESUMEs: {sum(resumes.values())}',
             f'Total IDENTIFYs: {total_identifies}',
         ]
 
+        if total_resumes:
+            builder.append(f'Resume Success Rate: {successful_resumes / total_resumes:.2%}')
+
         shard_count = len(self.bot.shards)
         if total_identifies > (shard_count * 10):
             issues = 2 + (total_identifies // 10) - shard_count
@@ -847,7 +1027,7 @@ class Stats(commands.Cog):
             if badge is None:
                 badge = '<:online:316856575413321728>'
 
-            stats = []
+            stats = [f'{shard.latency * 1000:.0f}ms']
             identify = identifies.get(shard_id, 0)
             resume = resumes.get(shard_id, 0)
             if resume != 0:
@@ -855,10 +1035,13 @@ class Stats(commands.Cog):
             if identify != 0:
                 stats.append(f'ID: {identify}')
 
-            if stats:
-                builder.append(f'Shard ID {shard_id}: {badge} ({", ".join(stats)})')
-            else:
-                builder.append(f'Shard ID {shard_id}: {badge}')
+            history = telemetry.get(shard_id)
+            if history is not None:
+                reconnect = history.average_reconnect_duration
+                if reconnect is not None:
+                    stats.append(f'Reconnect: {reconnect:.1f}s')
+
+            builder.append(f'Shard ID {shard_id}: {badge} ({", ".join(stats)})')
 
         if issues == 0:
             colour = 0x43B581
@@ -1178,7 +1361,13 @@ async def setup(bot: RoboDanny):
     cog = Stats(bot)
     await bot.add_cog(cog)
     bot.logging_handler = handler = LoggingHandler(cog)
-    logging.getLogger().addHandler(handler)
+    queue_handler = get_log_queue_handler()
+    if queue_handler is None:
+        logging.getLogger().addHandler(handler)
+    else:
+        # feed off the same queue as the rest of the log handlers
+        listener = queue_handler.listener  # type: ignore
+        listener.handlers = (*listener.handlers, handler)
     commands.AutoShardedBot.on_error = on_error
     bot.old_tree_error = bot.tree.on_error  # type: ignore
     bot.tree.on_error = on_app_command_error
@@ -1186,6 +1375,11 @@ async def setup(bot: RoboDanny):
 
 async def teardown(bot: RoboDanny):
     commands.AutoShardedBot.on_error = old_on_error
-    logging.getLogger().removeHandler(bot.logging_handler)
+    queue_handler = get_log_queue_handler()
+    if queue_handler is None:
+        logging.getLogger().removeHandler(bot.logging_handler)
+    else:
+        listener = queue_handler.listener  # type: ignore
+        listener.handlers = tuple(h for h in listener.handlers if h is not bot.logging_handler)
     bot.tree.on_error = bot.old_tree_error  # type: ignore
     del bot.logging_handler
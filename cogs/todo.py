@@ -791,6 +791,7 @@ class Todo(commands.Cog):
         self.active_todo: Optional[ActiveDueTodo] = None
         self._task: asyncio.Task[None] = MISSING
         self._message_cache: dict[int, discord.Message] = {}
+        self._autocomplete = fuzzy.AutocompleteCache()
         self.ctx_menu = app_commands.ContextMenu(name='Add todo', callback=self.todo_add_context_menu)
         self.bot.tree.add_command(self.ctx_menu)
 
@@ -904,7 +905,11 @@ class Todo(commands.Cog):
             self._task = self.bot.loop.create_task(self.run_due_date_reminders())
 
     async def send_due_date_reminder(self, todo: ActiveDueTodo) -> None:
-        await self.bot.pool.execute('UPDATE todo SET reminder_triggered = TRUE WHERE id = $1', todo.id)
+        # every process of a cluster waits for the same todo, only the one that flips the flag sends it
+        query = 'UPDATE todo SET reminder_triggered = TRUE WHERE id = $1 AND NOT reminder_triggered RETURNING id'
+        if await self.bot.pool.fetchval(query, todo.id) is None:
+            return
+
         if todo.message_id is not None and todo.message is None:
             await todo.fetch_message()
 
@@ -921,7 +926,7 @@ class Todo(commands.Cog):
 
     async def todo_id_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[int]]:
         todos = await self.get_todos(interaction.user.id)
-        results = fuzzy.finder(current, todos, key=lambda t: t.choice_text, raw=True)
+        results = self._autocomplete.finder(interaction.user.id, current, todos, key=lambda t: t.choice_text, raw=True)
         return [
             app_commands.Choice(name=get_shortened_string(length, start, todo.choice_text), value=todo.id)
             for length, start, todo in results[:20]
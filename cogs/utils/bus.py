@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional, Union
+
+import asyncio
+import inspect
+import json
+import logging
+import uuid
+
+import asyncpg
+
+if TYPE_CHECKING:
+    from .db import Pool
+
+log = logging.getLogger(__name__)
+
+Callback = Callable[[Any], Union[Awaitable[None], None]]
+
+
+class Bus:
+    """Sends small JSON messages to every process connected to the same database.
+
+    Messages are published with ``pg_notify`` through the pool and received on
+    a dedicated connection that ``LISTEN``\\s on ``channel``. A process does not
+    receive the messages it published itself since it is expected to have
+    applied the change already.
+
+    NOTIFY is not durable, so anything published while the listening
+    connection was down is lost. Once it reconnects every reconnect listener
+    is called so it can resynchronise whatever it might have missed.
+    """
+
+    def __init__(self, pool: Pool, dsn: str, *, channel: str = 'robodanny', reconnect_delay: float = 5.0) -> None:
+        self.pool: Pool = pool
+        self.dsn: str = dsn
+        self.channel: str = channel
+        self.reconnect_delay: float = reconnect_delay
+        self.origin: str = uuid.uuid4().hex
+        self.published: int = 0
+        self.received: int = 0
+        # topic: callbacks
+        self._subscribers: defaultdict[str, list[Callback]] = defaultdict(list)
+        self._reconnect_listeners: list[Callable[[], Union[Awaitable[None], None]]] = []
+        self._connection: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task[None]] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._connection is not None and not self._connection.is_closed()
+
+    def subscribe(self, topic: str, callback: Callback) -> None:
+        """Calls ``callback`` with the data of every message published to ``topic`` by other processes."""
+        self._subscribers[topic].append(callback)
+
+    def unsubscribe(self, topic: str, callback: Callback) -> None:
+        try:
+            self._subscribers[topic].remove(callback)
+        except ValueError:
+            pass
+
+    def add_reconnect_listener(self, callback: Callable[[], Union[Awaitable[None], None]]) -> None:
+        self._reconnect_listeners.append(callback)
+
+    def remove_reconnect_listener(self, callback: Callable[[], Union[Awaitable[None], None]]) -> None:
+        try:
+            self._reconnect_listeners.remove(callback)
+        except ValueError:
+            pass
+
+    async def publish(self, topic: str, data: Any = None) -> None:
+        """Publishes a message to every other process. The encoded message must be under 8000 bytes."""
+        payload = json.dumps({'o': self.origin, 't': topic, 'd': data}, separators=(',', ':'))
+        await self.pool.execute('SELECT pg_notify($1, $2)', self.channel, payload)
+        self.published += 1
+
+    def publish_nowait(self, topic: str, data: Any = None) -> None:
+        """Like :meth:`publish` but from synchronous code. Failures are logged."""
+        asyncio.create_task(self._await(self.publish, self.publish(topic, data)))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._listen())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+        connection, self._connection = self._connection, None
+        if connection is not None and not connection.is_closed():
+            await connection.close()
+
+    async def _listen(self) -> None:
+        first = True
+        while True:
+            try:
+                connection: asyncpg.Connection = await asyncpg.connect(self.dsn)
+            except (OSError, asyncpg.PostgresError):
+                log.warning('Could not connect the bus listener, retrying in %.0fs.', self.reconnect_delay, exc_info=True)
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+
+            lost = asyncio.Event()
+            connection.add_termination_listener(lambda _: lost.set())
+            await connection.add_listener(self.channel, self._on_notification)
+            self._connection = connection
+            if not first:
+                log.info('Bus listener reconnected, resynchronising.')
+                for callback in self._reconnect_listeners:
+                    self._call(callback)
+
+            first = False
+            await lost.wait()
+            self._connection = None
+            log.warning('Bus listener connection lost, reconnecting in %.0fs.', self.reconnect_delay)
+            await asyncio.sleep(self.reconnect_delay)
+
+    def _on_notification(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            log.warning('Ignoring malformed bus message: %r', payload)
+            return
+
+        if message.get('o') == self.origin:
+            return
+
+        self.received += 1
+        for callback in self._subscribers.get(message['t'], ()):
+            self._call(callback, message['d'])
+
+    def _call(self, callback: Callable[..., Any], *args: Any) -> None:
+        try:
+            result = callback(*args)
+        except Exception:
+            log.exception('Bus callback %r raised an exception.', callback)
+            return
+
+        if inspect.isawaitable(result):
+            asyncio.create_task(self._await(callback, result))
+
+    async def _await(self, callback: Callable[..., Any], result: Awaitable[None]) -> None:
+        try:
+            await result
+        except Exception:
+            log.exception('Bus callback %r raised an exception.', callback)
@@ -2,10 +2,14 @@ from __future__ import annotations
 
 import asyncio
 import enum
+import inspect
+import random
+import sys
 import time
 
-from functools import wraps
-from typing import Any, Callable, Coroutine, MutableMapping, TypeVar, Protocol
+from collections import OrderedDict
+from functools import partial, wraps
+from typing import Any, Callable, Coroutine, Iterator, MutableMapping, NamedTuple, Optional, TypeVar, Protocol
 
 from lru import LRU
 
@@ -13,12 +17,13 @@ R = TypeVar('R')
 
 # Can't use ParamSpec due to https://github.com/python/typing/discussions/946
 class CacheProtocol(Protocol[R]):
-    cache: MutableMapping[str, asyncio.Task[R]]
+    cache: MutableMapping[tuple[Any, ...], asyncio.Task[R]]
+    stats: CacheStats
 
     def __call__(self, *args: Any, **kwds: Any) -> asyncio.Task[R]:
         ...
 
-    def get_key(self, *args: Any, **kwargs: Any) -> str:
+    def get_key(self, *args: Any, **kwargs: Any) -> tuple[Any, ...]:
         ...
 
     def invalidate(self, *args: Any, **kwargs: Any) -> bool:
@@ -27,92 +32,477 @@ class CacheProtocol(Protocol[R]):
     def invalidate_containing(self, key: str) -> None:
         ...
 
+    def invalidate_partition(self, value: Any) -> None:
+        ...
+
     def get_stats(self) -> tuple[int, int]:
         ...
 
 
-class ExpiringCache(dict):
-    def __init__(self, seconds: float):
-        self.__ttl: float = seconds
-        super().__init__()
+class ExpiringCache(MutableMapping[Any, Any]):
+    """A mapping whose entries expire ``seconds`` after they were last set.
+
+    Every entry has the same TTL so the order entries were set in is also
+    the order they expire in. They're kept in that order and expired ones
+    are popped off the front whenever the cache is accessed, making lookups
+    amortized O(1) no matter how many entries there are.
+
+    If ``max_size`` is given then the oldest entries are evicted to make
+    room for new ones. ``callback`` is called with the key and value of
+    every entry that expires or is evicted, like :class:`lru.LRU`'s.
+    """
+
+    def __init__(
+        self,
+        seconds: float,
+        *,
+        max_size: Optional[int] = None,
+        callback: Optional[Callable[[Any, Any], Any]] = None,
+    ):
+        self.ttl: float = seconds
+        self.max_size: Optional[int] = max_size
+        self.callback: Optional[Callable[[Any, Any], Any]] = callback
+        # key: (value, time it was set)
+        self._data: OrderedDict[Any, tuple[Any, float]] = OrderedDict()
+
+    def _expire(self, now: float) -> None:
+        data = self._data
+        cutoff = now - self.ttl
+        while data:
+            # peeking at the oldest entry is O(1)
+            oldest = next(iter(data))
+            value, set_at = data[oldest]
+            if set_at >= cutoff:
+                break
+            del data[oldest]
+            if self.callback is not None:
+                self.callback(oldest, value)
+
+    def __contains__(self, key: Any) -> bool:
+        self._expire(time.monotonic())
+        return key in self._data
+
+    def __getitem__(self, key: Any) -> Any:
+        self._expire(time.monotonic())
+        return self._data[key][0]
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        now = time.monotonic()
+        self._expire(now)
+        data = self._data
+        if key in data:
+            data.move_to_end(key)
+        data[key] = (value, now)
+        if self.max_size is not None and len(data) > self.max_size:
+            evicted, (value, _) = data.popitem(last=False)
+            if self.callback is not None:
+                self.callback(evicted, value)
+
+    def __delitem__(self, key: Any) -> None:
+        del self._data[key]
+
+    def __iter__(self) -> Iterator[Any]:
+        self._expire(time.monotonic())
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        self._expire(time.monotonic())
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f'<ExpiringCache ttl={self.ttl} size={len(self)}>'
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+# Invalidations are shared with other processes by handing them to a
+# publisher, see set_invalidation_publisher. Each one is a dict with the
+# name of the cached function, the operation ('key', 'containing' or
+# 'partition') and the key, which is the same in every process since it
+# is built from plain values and reprs rather than object identities.
+
+
+class _LocalCache(NamedTuple):
+    invalidate: Callable[[Any], bool]
+    invalidate_containing: Callable[[str], None]
+    invalidate_partition: Callable[[Any], None]
+    clear: Callable[[], None]
+    stats: CacheStats
+
+
+# qualified function name: its cache in this process
+_caches: dict[str, _LocalCache] = {}
+_publisher: Optional[Callable[[dict[str, Any]], None]] = None
+
+
+def set_invalidation_publisher(publisher: Optional[Callable[[dict[str, Any]], None]]) -> None:
+    """Sets the function every invalidation is passed to so it can be sent to other processes."""
+    global _publisher
+    _publisher = publisher
+
+
+def apply_remote_invalidation(data: dict[str, Any]) -> None:
+    """Applies an invalidation published by another process, without publishing it again."""
+    local = _caches.get(data['cache'])
+    if local is None:
+        return
+
+    op = data['op']
+    if op == 'containing':
+        local.invalidate_containing(data['key'])
+    elif op == 'partition':
+        local.invalidate_partition(data['key'])
+    else:
+        # JSON turned the key tuple and its tokens into lists
+        local.invalidate(_decode_key(data['key']))
+
+
+def clear_all() -> None:
+    """Clears every cache in this process, e.g. after missing invalidations from other processes."""
+    for local in _caches.values():
+        local.clear()
+
+
+def _publish(name: str, op: str, key: Any) -> None:
+    if _publisher is not None:
+        _publisher({'cache': name, 'op': op, 'key': key})
+
+
+def _approximate_size(o: Any, seen: set[int], depth: int = 0) -> int:
+    if id(o) in seen:
+        return 0
+
+    seen.add(id(o))
+    size = sys.getsizeof(o)
+    if depth >= 4 or o.__class__ in _PLAIN_TYPES:
+        return size
+
+    depth += 1
+    if isinstance(o, dict):
+        for k, v in o.items():
+            size += _approximate_size(k, seen, depth) + _approximate_size(v, seen, depth)
+    elif isinstance(o, (list, tuple, set, frozenset)):
+        for v in o:
+            size += _approximate_size(v, seen, depth)
+    elif hasattr(o, '__dict__'):
+        size += _approximate_size(o.__dict__, seen, depth)
+    else:
+        for attr in getattr(o.__class__, '__slots__', ()):
+            size += _approximate_size(getattr(o, attr, None), seen, depth)
+    return size
+
+
+class CacheStats:
+    """Usage of a single :func:`cache` decorated function in this process.
+
+    The counters are updated as the function is used. Entries, in-flight
+    tasks and memory are worked out from the cache when asked for.
+    """
+
+    __slots__ = ('name', 'strategy', 'maxsize', 'hits', 'misses', 'evictions', 'failed', 'cache')
+
+    def __init__(self, name: str, strategy: Strategy, maxsize: int, cache: MutableMapping[Any, asyncio.Task[Any]]) -> None:
+        self.name: str = name
+        self.strategy: Strategy = strategy
+        self.maxsize: int = maxsize
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.failed: int = 0
+        self.cache: MutableMapping[Any, asyncio.Task[Any]] = cache
+
+    def __repr__(self) -> str:
+        return f'<CacheStats name={self.name!r} hits={self.hits} misses={self.misses} entries={self.entries}>'
+
+    @property
+    def entries(self) -> int:
+        return len(self.cache)
+
+    @property
+    def in_flight(self) -> int:
+        return sum(not task.done() for task in list(self.cache.values()))
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def approximate_memory(self) -> int:
+        """Roughly how many bytes the keys, tasks and results take up. This walks every entry."""
+        seen: set[int] = set()
+        total = 0
+        for key, task in list(self.cache.items()):
+            total += _approximate_size(key, seen) + sys.getsizeof(task)
+            if task.done() and not task.cancelled() and task.exception() is None:
+                total += _approximate_size(task.result(), seen)
+        return total
+
+    def task_done(self, task: asyncio.Task[Any]) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            self.failed += 1
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'name': self.name,
+            'strategy': self.strategy.name,
+            # the timed strategy uses it as the TTL in seconds
+            'maxsize': None if self.strategy is Strategy.raw else self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'evictions': self.evictions,
+            'in_flight': self.in_flight,
+            'failed': self.failed,
+            'entries': self.entries,
+            'approximate_memory': self.approximate_memory(),
+        }
+
+
+def get_all_stats() -> list[CacheStats]:
+    """Returns the stats of every cached function in this process."""
+    return [local.stats for local in _caches.values()]
+
+
+def dump_stats() -> list[dict[str, Any]]:
+    """Returns the stats of every cached function as JSON serializable dicts."""
+    return [stats.to_dict() for stats in get_all_stats()]
 
-    def __verify_cache_integrity(self):
-        # Have to do this in two steps...
-        current_time = time.monotonic()
-        to_remove = [k for (k, (v, t)) in super().items() if current_time > (t + self.__ttl)]
-        for k in to_remove:
-            del self[k]
 
-    def __contains__(self, key: str):
-        self.__verify_cache_integrity()
-        return super().__contains__(key)
+class _ReprToken(tuple):
+    """Stands in for an argument by its repr.
 
-    def __getitem__(self, key: str):
-        self.__verify_cache_integrity()
-        v, _ = super().__getitem__(key)
-        return v
+    Keys only hold ints, strings and None as they are, so ``1``, ``1.0`` and
+    ``True`` stay different keys like they were when keys were strings, and
+    the key doesn't keep the argument alive. Being a tuple it's hashed and
+    compared without calling back into Python and it's a one element list
+    to JSON, which :func:`_decode_key` turns back into a token.
+    """
 
-    def get(self, key: str, default: Any = None):
-        v = super().get(key, default)
-        if v is default:
-            return default
-        return v[0]
+    __slots__ = ()
 
-    def __setitem__(self, key: str, value: Any):
-        super().__setitem__(key, (value, time.monotonic()))
+    def __new__(cls, text: str) -> _ReprToken:
+        return tuple.__new__(cls, (text,))
 
-    def values(self):
-        return map(lambda x: x[0], super().values())
+    def __repr__(self) -> str:
+        return self[0]
 
-    def items(self):
-        return map(lambda x: (x[0], x[1][0]), super().items())
+
+# class: its token
+_class_tokens: dict[type, _ReprToken] = {}
+
+_BOOL_TOKENS = {True: _ReprToken('True'), False: _ReprToken('False')}
+
+# types sys.getsizeof covers entirely
+_PLAIN_TYPES = frozenset((int, str, bool, float, type(None)))
+
+
+def _key_part(o: Any) -> Any:
+    cls = o.__class__
+    if cls is int or cls is str or o is None:
+        return o
+
+    if cls is bool:
+        return _BOOL_TOKENS[o]
+
+    # we don't care which instance 'self' is, only what it is
+    if cls.__repr__ is object.__repr__:
+        try:
+            return _class_tokens[cls]
+        except KeyError:
+            token = _class_tokens[cls] = _ReprToken(f'<{cls.__module__}.{cls.__name__}>')
+            return token
+
+    return _ReprToken(repr(o))
+
+
+def _decode_key(parts: list[Any]) -> tuple[Any, ...]:
+    return tuple(_ReprToken(part[0]) if isinstance(part, list) else part for part in parts)
 
 
 class Strategy(enum.Enum):
     lru = 1
     raw = 2
     timed = 3
+    # LRU that serves stale results while they're refreshed in the background
+    revalidate = 4
+
+
+class _Freshness:
+    __slots__ = ('expires', 'discard_at', 'refresh')
+
+    def __init__(self) -> None:
+        # stays fresh until the task settles
+        self.expires: float = float('inf')
+        # when the last good result is too old to be served while refreshing
+        self.discard_at: float = float('inf')
+        self.refresh: Optional[asyncio.Task[Any]] = None
+
+
+def _jittered(seconds: float) -> float:
+    # spreads retries out so a failing database isn't hit by every key at once
+    return seconds * random.uniform(0.5, 1.5)
 
 
 def cache(
     maxsize: int = 128,
     strategy: Strategy = Strategy.lru,
     ignore_kwargs: bool = False,
+    partition: Optional[str] = None,
+    ttl: float = 300.0,
+    error_ttl: float = 5.0,
+    max_stale: float = 3600.0,
 ) -> Callable[[Callable[..., Coroutine[Any, Any, R]]], CacheProtocol[R]]:
+    """Caches the task of a coroutine function keyed by its arguments.
+
+    Keys are tuples of the arguments. Ints, strings and None are used as
+    they are, arguments that use the default repr, like ``self``, are
+    replaced by their class and everything else by their repr.
+
+    If ``partition`` names a parameter, such as ``'guild_id'``, then the keys
+    are also indexed by that argument so ``invalidate_partition`` only has
+    to touch the keys of that partition.
+
+    With :attr:`Strategy.revalidate` a result is fresh for ``ttl`` seconds.
+    After that it keeps being served while a single background call per key
+    refreshes it, for up to ``max_stale`` more seconds. Past that callers
+    wait for the refresh and see its error if it fails. Failures are only
+    kept for a jittered ``error_ttl``, both when there's no result to fall
+    back on and between failed refreshes. With the other strategies failed
+    calls are dropped from the cache once they finish.
+
+    Every decorated function registers its :class:`CacheStats`, see
+    :func:`get_all_stats`.
+    """
+
     def decorator(func: Callable[..., Coroutine[Any, Any, R]]) -> CacheProtocol[R]:
-        if strategy is Strategy.lru:
-            _internal_cache = LRU(maxsize)
-            _stats = _internal_cache.get_stats
+        name = f'{func.__module__}.{func.__qualname__}'
+        key_prefix = f'{func.__module__}.{func.__name__}'
+
+        # partition value: keys in it
+        _partitions: dict[Any, set[tuple[Any, ...]]] = {}
+        # key: its partition value
+        _key_partitions: dict[tuple[Any, ...], Any] = {}
+
+        def _forget_partition(key: tuple[Any, ...]) -> None:
+            try:
+                partition_value = _key_partitions.pop(key)
+            except KeyError:
+                return
+
+            keys = _partitions.get(partition_value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del _partitions[partition_value]
+
+        # key: when its task goes stale, only used by Strategy.revalidate
+        _freshness: dict[tuple[Any, ...], _Freshness] = {}
+
+        # key: its string form, made the first time invalidate_containing searches it
+        _key_strings: dict[tuple[Any, ...], str] = {}
+
+        def _evicted(key: tuple[Any, ...], task: asyncio.Task[R]) -> None:
+            stats.evictions += 1
+            _freshness.pop(key, None)
+            _key_strings.pop(key, None)
+            if partition is not None:
+                _forget_partition(key)
+
+        if strategy is Strategy.lru or strategy is Strategy.revalidate:
+            _internal_cache = LRU(maxsize, _evicted)
         elif strategy is Strategy.raw:
             _internal_cache = {}
-            _stats = lambda: (0, 0)
         elif strategy is Strategy.timed:
-            _internal_cache = ExpiringCache(maxsize)
-            _stats = lambda: (0, 0)
-
-        def _make_key(args: tuple[Any, ...], kwargs: dict[str, Any]) -> str:
-            # this is a bit of a cluster fuck
-            # we do care what 'self' parameter is when we __repr__ it
-            def _true_repr(o):
-                if o.__class__.__repr__ is object.__repr__:
-                    return f'<{o.__class__.__module__}.{o.__class__.__name__}>'
-                return repr(o)
-
-            key = [f'{func.__module__}.{func.__name__}']
-            key.extend(_true_repr(o) for o in args)
-            if not ignore_kwargs:
+            _internal_cache = ExpiringCache(maxsize, callback=_evicted)
+
+        stats = CacheStats(name, strategy, maxsize, _internal_cache)
+
+        partition_index = -1
+        if partition is not None:
+            partition_index = list(inspect.signature(func).parameters).index(partition)
+
+        def _make_key(args: tuple[Any, ...], kwargs: dict[str, Any]) -> tuple[Any, ...]:
+            key = tuple(map(_key_part, args))
+            if not ignore_kwargs and kwargs:
+                extra = []
                 for k, v in kwargs.items():
                     # note: this only really works for this use case in particular
                     # I want to pass asyncpg.Connection objects to the parameters
-                    # however, they use default __repr__ and I do not care what
-                    # connection is passed in, so I needed a bypass.
+                    # however, I do not care what connection is passed in, so
+                    # I needed a bypass.
                     if k == 'connection' or k == 'pool':
                         continue
 
-                    key.append(_true_repr(k))
-                    key.append(_true_repr(v))
+                    extra.append(k)
+                    extra.append(_key_part(v))
+                key += tuple(extra)
+            return key
 
-            return ':'.join(key)
+        def _key_string(key: tuple[Any, ...]) -> str:
+            # the format keys used to have, which invalidate_containing searches
+            return ':'.join([key_prefix, *map(repr, key)])
+
+        def _settled(freshness: _Freshness, task: asyncio.Task[R]) -> None:
+            now = time.monotonic()
+            if task.cancelled() or task.exception() is not None:
+                freshness.expires = now + _jittered(error_ttl)
+            else:
+                freshness.expires = now + ttl
+                freshness.discard_at = now + ttl + max_stale
+
+        def _refreshed(key: tuple[Any, ...], freshness: _Freshness, task: asyncio.Task[R]) -> None:
+            freshness.refresh = None
+            # it was invalidated or evicted while refreshing
+            if _freshness.get(key) is not freshness:
+                return
+
+            _settled(freshness, task)
+            # past max_stale the failure replaces the old result so callers see it
+            if (not task.cancelled() and task.exception() is None) or time.monotonic() >= freshness.discard_at:
+                _internal_cache[key] = task
+
+        def _discard_failed(key: tuple[Any, ...], task: asyncio.Task[R]) -> None:
+            if (task.cancelled() or task.exception() is not None) and _internal_cache.get(key) is task:
+                _invalidate_key(key)
+
+        def _revalidate(key: tuple[Any, ...], task: asyncio.Task[R], args: tuple[Any, ...], kwargs: dict[str, Any]):
+            freshness = _freshness[key]
+            now = time.monotonic()
+            if freshness.expires > now:
+                stats.hits += 1
+                return task
+
+            if task.cancelled() or task.exception() is not None:
+                # nothing to fall back on so callers have to wait for the retry
+                stats.misses += 1
+                return _store(key, args, kwargs)
+
+            refresh = freshness.refresh
+            if refresh is None:
+                # the caller's connection might be released before this finishes
+                kwargs = {k: v for k, v in kwargs.items() if k != 'connection' and k != 'pool'}
+                freshness.refresh = refresh = asyncio.create_task(func(*args, **kwargs))
+                refresh.add_done_callback(stats.task_done)
+                refresh.add_done_callback(partial(_refreshed, key, freshness))
+
+            if now >= freshness.discard_at:
+                # too old to keep serving, wait for the refresh instead
+                stats.misses += 1
+                return refresh
+
+            stats.hits += 1
+            return task
+
+        def _store(key: tuple[Any, ...], args: tuple[Any, ...], kwargs: dict[str, Any]) -> asyncio.Task[R]:
+            _internal_cache[key] = task = asyncio.create_task(func(*args, **kwargs))
+            task.add_done_callback(stats.task_done)
+            if strategy is Strategy.revalidate:
+                _freshness[key] = freshness = _Freshness()
+                task.add_done_callback(partial(_settled, freshness))
+            else:
+                task.add_done_callback(partial(_discard_failed, key))
+            return task
 
         @wraps(func)
         def wrapper(*args: Any, **kwargs: Any):
@@ -120,35 +510,91 @@ def cache(
             try:
                 task = _internal_cache[key]
             except KeyError:
-                _internal_cache[key] = task = asyncio.create_task(func(*args, **kwargs))
+                stats.misses += 1
+                task = _store(key, args, kwargs)
+                if partition_index != -1:
+                    value = args[partition_index] if len(args) > partition_index else kwargs.get(partition)
+                    _key_partitions[key] = value
+                    _partitions.setdefault(value, set()).add(key)
                 return task
             else:
+                if strategy is Strategy.revalidate:
+                    return _revalidate(key, task, args, kwargs)
+                stats.hits += 1
                 return task
 
-        def _invalidate(*args: Any, **kwargs: Any) -> bool:
+        def _invalidate_key(key: tuple[Any, ...]) -> bool:
+            _forget_partition(key)
+            _freshness.pop(key, None)
+            _key_strings.pop(key, None)
             try:
-                del _internal_cache[_make_key(args, kwargs)]
+                del _internal_cache[key]
             except KeyError:
                 return False
             else:
                 return True
 
-        def _invalidate_containing(key: str) -> None:
+        def _invalidate_keys_containing(key: str) -> None:
             to_remove = []
             for k in _internal_cache.keys():
-                if key in k:
+                try:
+                    string = _key_strings[k]
+                except KeyError:
+                    string = _key_strings[k] = _key_string(k)
+                if key in string:
                     to_remove.append(k)
             for k in to_remove:
+                _invalidate_key(k)
+
+        def _invalidate_keys_in_partition(value: Any) -> None:
+            for k in _partitions.pop(value, ()):
+                _key_partitions.pop(k, None)
+                _freshness.pop(k, None)
+                _key_strings.pop(k, None)
                 try:
                     del _internal_cache[k]
                 except KeyError:
                     continue
 
+        def _clear() -> None:
+            _internal_cache.clear()
+            _partitions.clear()
+            _key_partitions.clear()
+            _freshness.clear()
+            _key_strings.clear()
+
+        def _invalidate(*args: Any, **kwargs: Any) -> bool:
+            key = _make_key(args, kwargs)
+            # other processes might have it cached even if this one doesn't
+            _publish(name, 'key', key)
+            return _invalidate_key(key)
+
+        def _invalidate_containing(key: str) -> None:
+            _publish(name, 'containing', key)
+            _invalidate_keys_containing(key)
+
+        def _invalidate_partition(value: Any) -> None:
+            if partition is None:
+                raise TypeError(f'{name} does not have a partition')
+            _publish(name, 'partition', value)
+            _invalidate_keys_in_partition(value)
+
+        # the latest definition wins, e.g. after an extension reload
+        _caches[name] = _LocalCache(
+            _invalidate_key,
+            _invalidate_keys_containing,
+            _invalidate_keys_in_partition,
+            _clear,
+            stats,
+        )
+
         wrapper.cache = _internal_cache
         wrapper.get_key = lambda *args, **kwargs: _make_key(args, kwargs)
         wrapper.invalidate = _invalidate
-        wrapper.get_stats = _stats
+        wrapper.get_stats = lambda: (stats.hits, stats.misses)
+        wrapper.stats = stats
         wrapper.invalidate_containing = _invalidate_containing
+        wrapper.invalidate_partition = _invalidate_partition
         return wrapper  # type: ignore
 
     return decorator
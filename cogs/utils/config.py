@@ -1,16 +1,75 @@
 import json
 import os
-from typing import Any, Callable, Dict, Generic, Optional, Type, TypeVar, Union, overload
+import sqlite3
+from typing import Any, Callable, Dict, Generic, List, Optional, Protocol, Type, TypeVar, Union, overload
 import uuid
 import asyncio
 
+from lru import LRU
+
 _T = TypeVar('_T')
 
 ObjectHook = Callable[[Dict[str, Any]], Any]
 
+# journal entries are JSON arrays, one per line:
+# ["p", key, value] for a put and ["d", key] for a removal
+_JOURNAL_PUT = 'p'
+_JOURNAL_DELETE = 'd'
 
-class Config(Generic[_T]):
-    """The "database" object. Internally based on ``json``."""
+_MISSING: Any = object()
+
+
+class Storage(Protocol):
+    """The interface a :class:`Config` storage backend has to implement.
+
+    Keys are always strings by the time they reach the storage.
+    """
+
+    def get(self, key: str, default: Any = None) -> Any:
+        ...
+
+    async def put(self, key: str, value: Any) -> None:
+        ...
+
+    async def remove(self, key: str) -> None:
+        ...
+
+    def __contains__(self, key: str) -> bool:
+        ...
+
+    def __len__(self) -> int:
+        ...
+
+    def all(self) -> Dict[str, Any]:
+        ...
+
+    async def load(self) -> None:
+        ...
+
+    async def save(self) -> None:
+        ...
+
+    def refresh(self, key: str, value: Any) -> None:
+        """Updates the in-memory view of a key that another process changed.
+
+        ``value`` is ``_MISSING`` if the key was removed. Nothing is written.
+        """
+        ...
+
+
+class JSONStorage:
+    """Keeps the entire document in memory and persists it to a JSON file.
+
+    By default every change rewrites the entire file. When ``journal`` is
+    ``True`` changes are instead appended to a ``<name>.journal`` file.
+    Changes made within ``coalesce_delay`` seconds of each other are written
+    with a single ``fsync`` and once the journal holds more than
+    ``compact_after`` entries it is folded back into the main file in the
+    background.
+
+    Only one process may write the file. The others should pass
+    ``read_only=True``, in which case changes are only applied in memory.
+    """
 
     def __init__(
         self,
@@ -19,13 +78,27 @@ class Config(Generic[_T]):
         object_hook: Optional[ObjectHook] = None,
         encoder: Optional[Type[json.JSONEncoder]] = None,
         load_later: bool = False,
+        journal: bool = False,
+        coalesce_delay: float = 0.05,
+        compact_after: int = 1000,
+        read_only: bool = False,
     ):
         self.name = name
         self.object_hook = object_hook
         self.encoder = encoder
+        self.journal = journal
+        self.journal_name = f'{name}.journal'
+        self.coalesce_delay = coalesce_delay
+        self.compact_after = compact_after
+        self.read_only = read_only
         self.loop = asyncio.get_running_loop()
         self.lock = asyncio.Lock()
-        self._db: Dict[str, Union[_T, Any]] = {}
+        self._db: Dict[str, Any] = {}
+        self._journal_entries: int = 0
+        # keys changed since the last journal flush, in order
+        self._pending: Dict[str, None] = {}
+        self._flush_future: Optional[asyncio.Future[None]] = None
+        self._compaction: Optional[asyncio.Task[None]] = None
         if load_later:
             self.loop.create_task(self.load())
         else:
@@ -38,6 +111,36 @@ class Config(Generic[_T]):
         except FileNotFoundError:
             self._db = {}
 
+        if self.journal:
+            self._replay_journal()
+
+    def _replay_journal(self) -> None:
+        self._journal_entries = 0
+        torn = False
+        try:
+            with open(self.journal_name, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line, object_hook=self.object_hook)
+                    except json.JSONDecodeError:
+                        # a torn write at the end of the journal, everything
+                        # before it was fsync'd so it's safe to stop here.
+                        # Compact right away so new entries don't get appended
+                        # after the broken line.
+                        torn = True
+                        break
+
+                    if entry[0] == _JOURNAL_PUT:
+                        self._db[entry[1]] = entry[2]
+                    else:
+                        self._db.pop(entry[1], None)
+                    self._journal_entries += 1
+        except FileNotFoundError:
+            pass
+
+        if torn and not self.read_only:
+            self._dump()
+
     async def load(self):
         async with self.lock:
             await self.loop.run_in_executor(None, self.load_from_file)
@@ -50,10 +153,250 @@ class Config(Generic[_T]):
         # atomically move the file
         os.replace(temp, self.name)
 
+        if self.journal:
+            # everything in the journal is now part of the snapshot
+            # if we crash before this then replaying it again is harmless
+            with open(self.journal_name, 'w', encoding='utf-8'):
+                pass
+            self._journal_entries = 0
+
+    def _append_journal(self, entries: List[list]) -> None:
+        lines = [json.dumps(entry, ensure_ascii=True, cls=self.encoder, separators=(',', ':')) for entry in entries]
+        lines.append('')
+        with open(self.journal_name, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._journal_entries += len(entries)
+
+    async def _compact(self) -> None:
+        try:
+            await self.save()
+        finally:
+            self._compaction = None
+
+    async def _flush_journal(self) -> None:
+        await asyncio.sleep(self.coalesce_delay)
+        future = self._flush_future
+        keys, self._pending = self._pending, {}
+        self._flush_future = None
+
+        # only the latest value of each key needs to be written
+        entries = []
+        for key in keys:
+            try:
+                entries.append([_JOURNAL_PUT, key, self._db[key]])
+            except KeyError:
+                entries.append([_JOURNAL_DELETE, key])
+
+        try:
+            async with self.lock:
+                await self.loop.run_in_executor(None, self._append_journal, entries)
+        except Exception as e:
+            future.set_exception(e)  # type: ignore
+        else:
+            future.set_result(None)  # type: ignore
+
+        if self._journal_entries > self.compact_after and self._compaction is None:
+            # rewriting the snapshot takes as long as a plain save would so
+            # don't make the writers wait for it
+            self._compaction = self.loop.create_task(self._compact())
+
+    async def _write(self, key: str) -> None:
+        if self.read_only:
+            return
+
+        if not self.journal:
+            await self.save()
+            return
+
+        self._pending[key] = None
+        if self._flush_future is None:
+            self._flush_future = self.loop.create_future()
+            self.loop.create_task(self._flush_journal())
+
+        await asyncio.shield(self._flush_future)
+
     async def save(self) -> None:
+        if self.read_only:
+            return
+
         async with self.lock:
             await self.loop.run_in_executor(None, self._dump)
 
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._db.get(key, default)
+
+    async def put(self, key: str, value: Any) -> None:
+        self._db[key] = value
+        await self._write(key)
+
+    async def remove(self, key: str) -> None:
+        del self._db[key]
+        await self._write(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._db
+
+    def __len__(self) -> int:
+        return len(self._db)
+
+    def all(self) -> Dict[str, Any]:
+        return self._db
+
+    def refresh(self, key: str, value: Any) -> None:
+        if value is _MISSING:
+            self._db.pop(key, None)
+        else:
+            self._db[key] = value
+
+
+class SQLiteStorage:
+    """Stores every key as its own row in an SQLite database.
+
+    Values are only decoded when they're first requested and the most
+    recently used ones are kept in an LRU cache of ``cache_size`` entries.
+    Writes only touch the row being changed so several processes can safely
+    share the same database.
+
+    If the database is empty and ``migrate_from`` names a JSON file written
+    by :class:`JSONStorage` then its contents are copied over first.
+
+    Unlike :class:`JSONStorage`, :meth:`all` returns a freshly loaded copy
+    so mutating it does not change what is stored.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        object_hook: Optional[ObjectHook] = None,
+        encoder: Optional[Type[json.JSONEncoder]] = None,
+        cache_size: int = 256,
+        migrate_from: Optional[str] = None,
+    ):
+        self.name = name
+        self.object_hook = object_hook
+        self.encoder = encoder
+        self.loop = asyncio.get_running_loop()
+        # writes run one at a time in the executor, in the order they were made
+        self._write_lock = asyncio.Lock()
+        self._cache: LRU = LRU(cache_size)
+        self._writer = sqlite3.connect(name, isolation_level=None, check_same_thread=False)
+        self._writer.execute('PRAGMA journal_mode=WAL')
+        self._writer.execute('PRAGMA synchronous=NORMAL')
+        self._writer.execute('CREATE TABLE IF NOT EXISTS config (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID')
+        # reads happen on the event loop, with WAL they never wait for a write to finish
+        self._reader = sqlite3.connect(name, isolation_level=None)
+
+        if migrate_from is not None and not len(self):
+            self._migrate(migrate_from)
+
+    def _migrate(self, filename: str) -> None:
+        old = JSONStorage(filename, object_hook=self.object_hook, encoder=self.encoder, journal=True)
+        rows = [(key, self._encode(value)) for key, value in old.all().items()]
+        self._writer.execute('BEGIN')
+        self._writer.executemany('INSERT OR IGNORE INTO config (key, value) VALUES (?, ?)', rows)
+        self._writer.execute('COMMIT')
+
+    def _decode(self, value: str) -> Any:
+        return json.loads(value, object_hook=self.object_hook)
+
+    def _encode(self, value: Any) -> str:
+        return json.dumps(value, ensure_ascii=True, cls=self.encoder, separators=(',', ':'))
+
+    def _read(self, query: str, *args: Any) -> List[Any]:
+        return self._reader.execute(query, args).fetchall()
+
+    async def _write(self, query: str, *args: Any) -> None:
+        async with self._write_lock:
+            await self.loop.run_in_executor(None, self._writer.execute, query, args)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            value = self._cache[key]
+        except KeyError:
+            rows = self._read('SELECT value FROM config WHERE key=?', key)
+            # misses are cached too so repeated lookups don't hit the disk
+            value = self._decode(rows[0][0]) if rows else _MISSING
+            self._cache[key] = value
+
+        return default if value is _MISSING else value
+
+    async def put(self, key: str, value: Any) -> None:
+        encoded = self._encode(value)
+        await self._write('INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)', key, encoded)
+        self._cache[key] = value
+
+    async def remove(self, key: str) -> None:
+        if key not in self:
+            raise KeyError(key)
+
+        await self._write('DELETE FROM config WHERE key=?', key)
+        self._cache[key] = _MISSING
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return self._read('SELECT COUNT(*) FROM config')[0][0]
+
+    def all(self) -> Dict[str, Any]:
+        return {key: self._decode(value) for key, value in self._read('SELECT key, value FROM config')}
+
+    async def load(self) -> None:
+        self._cache.clear()
+
+    def refresh(self, key: str, value: Any) -> None:
+        # the other process already wrote it to the shared database
+        try:
+            del self._cache[key]
+        except KeyError:
+            pass
+
+    async def save(self) -> None:
+        # every write is committed as it happens
+        pass
+
+
+class Config(Generic[_T]):
+    """The "database" object. Internally based on ``json``.
+
+    The data is kept by a :class:`Storage` backend. If one isn't given then a
+    :class:`JSONStorage` is made with the given options, which keeps the
+    whole document in memory.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        object_hook: Optional[ObjectHook] = None,
+        encoder: Optional[Type[json.JSONEncoder]] = None,
+        load_later: bool = False,
+        journal: bool = False,
+        read_only: bool = False,
+        storage: Optional[Storage] = None,
+    ):
+        self.name = name
+        if storage is None:
+            storage = JSONStorage(
+                name,
+                object_hook=object_hook,
+                encoder=encoder,
+                load_later=load_later,
+                journal=journal,
+                read_only=read_only,
+            )
+        self.storage: Storage = storage
+
+    async def load(self):
+        await self.storage.load()
+
+    async def save(self) -> None:
+        await self.storage.save()
+
     @overload
     def get(self, key: Any) -> Optional[Union[_T, Any]]:
         ...
@@ -64,26 +407,35 @@ class Config(Generic[_T]):
 
     def get(self, key: Any, default: Any = None) -> Optional[Union[_T, Any]]:
         """Retrieves a config entry."""
-        return self._db.get(str(key), default)
+        return self.storage.get(str(key), default)
 
     async def put(self, key: Any, value: Union[_T, Any]) -> None:
         """Edits a config entry."""
-        self._db[str(key)] = value
-        await self.save()
+        await self.storage.put(str(key), value)
 
     async def remove(self, key: Any) -> None:
         """Removes a config entry."""
-        del self._db[str(key)]
-        await self.save()
+        await self.storage.remove(str(key))
+
+    def mirror_put(self, key: Any, value: Union[_T, Any]) -> None:
+        """Applies a :meth:`put` made by another process without writing it again."""
+        self.storage.refresh(str(key), value)
+
+    def mirror_remove(self, key: Any) -> None:
+        """Applies a :meth:`remove` made by another process without writing it again."""
+        self.storage.refresh(str(key), _MISSING)
 
     def __contains__(self, item: Any) -> bool:
-        return str(item) in self._db
+        return str(item) in self.storage
 
     def __getitem__(self, item: Any) -> Union[_T, Any]:
-        return self._db[str(item)]
+        value = self.storage.get(str(item), _MISSING)
+        if value is _MISSING:
+            raise KeyError(item)
+        return value
 
     def __len__(self) -> int:
-        return len(self._db)
+        return len(self.storage)
 
     def all(self) -> Dict[str, Union[_T, Any]]:
-        return self._db
+        return self.storage.all()
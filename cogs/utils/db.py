@@ -0,0 +1,712 @@
+from __future__ import annotations
+
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Generator, Optional, TypeVar, Union
+
+import asyncio
+import contextvars
+import datetime
+import json
+import logging
+import random
+import sys
+import time
+import asyncpg
+
+from .telemetry import percentile
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+if TYPE_CHECKING:
+    from asyncpg.prepared_stmt import PreparedStatement
+    from asyncpg.pool import PoolConnectionProxy
+
+T = TypeVar('T')
+
+log = logging.getLogger(__name__)
+
+# JSON codec
+
+# type: function that turns it into something JSON serializable
+_json_encoders: dict[type, Callable[[Any], Any]] = {}
+
+
+def register_json_encoder(cls: type, func: Callable[[Any], Any]) -> None:
+    """Registers how to turn a type that isn't JSON serializable into one that is.
+
+    This applies to every ``jsonb`` value sent to the database, subclasses included.
+    """
+    _json_encoders[cls] = func
+
+
+def _json_default(obj: Any) -> Any:
+    for cls in type(obj).__mro__:
+        func = _json_encoders.get(cls)
+        if func is not None:
+            return func(obj)
+    raise TypeError(f'Object of type {obj.__class__.__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    # str keys are required by default, the stdlib converts them like this too.
+    # Datetimes go through the registered encoders like they do with the stdlib
+    # rather than being encoded by orjson itself.
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def encode_json(value: Any) -> bytes:
+        return orjson.dumps(value, default=_json_default, option=_ORJSON_OPTIONS)
+
+    def decode_json(data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+else:
+
+    def encode_json(value: Any) -> bytes:
+        return json.dumps(value, default=_json_default, separators=(',', ':')).encode('utf-8')
+
+    def decode_json(data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+# The binary jsonb wire format is a version byte followed by the JSON text
+_JSONB_VERSION = b'\x01'
+
+
+def encode_jsonb(value: Any) -> bytes:
+    return _JSONB_VERSION + encode_json(value)
+
+
+def decode_jsonb(data: bytes) -> Any:
+    return decode_json(data[1:])
+
+
+# Prepared statements
+
+
+class PreparedStatements:
+    """A registry of named queries that are prepared on every connection.
+
+    Connections prepare every registered query when they're set up and again
+    when they're acquired after more queries were registered, such as by a
+    cog loaded after startup. The statements are kept for as long as the
+    connection lives.
+    """
+
+    def __init__(self) -> None:
+        # name: query
+        self._queries: dict[str, str] = {}
+        # bumped on every registration so connections know when to warm up again
+        self.version: int = 0
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._queries
+
+    def register(self, name: str, query: str) -> str:
+        """Registers a query under the given name and returns the name."""
+        self._queries[name] = query
+        self.version += 1
+        return name
+
+    def get_query(self, name: str) -> str:
+        return self._queries[name]
+
+    def names(self) -> list[str]:
+        return list(self._queries)
+
+
+prepared_statements = PreparedStatements()
+
+
+# Query log
+
+
+class QueryStats:
+    """Timings of a single query from a single call site.
+
+    Timings are grouped into one minute buckets so that only the most
+    recent ``window`` minutes are reported. Each bucket keeps a random
+    sample of at most ``max_samples`` durations for percentiles.
+    """
+
+    __slots__ = ('site', 'query', 'calls', 'total', 'buckets', 'last_explained', '_max_samples')
+
+    def __init__(self, site: str, query: str, *, window: int, max_samples: int) -> None:
+        self.site: str = site
+        self.query: str = query
+        self.calls: int = 0
+        self.total: float = 0.0
+        # [minute, calls, total, samples]
+        self.buckets: deque[list[Any]] = deque(maxlen=window)
+        self.last_explained: float = 0.0
+        self._max_samples: int = max_samples
+
+    def record(self, duration: float, minute: int) -> None:
+        self.calls += 1
+        self.total += duration
+        if not self.buckets or self.buckets[-1][0] != minute:
+            self.buckets.append([minute, 0, 0.0, []])
+
+        bucket = self.buckets[-1]
+        bucket[1] += 1
+        bucket[2] += duration
+        samples: list[float] = bucket[3]
+        if len(samples) < self._max_samples:
+            samples.append(duration)
+        else:
+            # reservoir sampling so later calls in the minute are represented too
+            index = random.randrange(bucket[1])
+            if index < self._max_samples:
+                samples[index] = duration
+
+    def _recent(self, since: int) -> list[list[Any]]:
+        return [bucket for bucket in self.buckets if bucket[0] >= since]
+
+    def window_calls(self, since: int) -> int:
+        return sum(bucket[1] for bucket in self._recent(since))
+
+    def window_total(self, since: int) -> float:
+        return sum(bucket[2] for bucket in self._recent(since))
+
+    def window_percentiles(self, since: int, *ps: float) -> list[float]:
+        samples = sorted(sample for bucket in self._recent(since) for sample in bucket[3])
+        return [percentile(samples, p) for p in ps]
+
+    @property
+    def display_query(self) -> str:
+        return ' '.join(self.query.split())
+
+
+class SlowQuery:
+    """A query that took longer than :attr:`QueryLog.slow_threshold`."""
+
+    __slots__ = ('when', 'site', 'query', 'args', 'duration', 'plan')
+
+    def __init__(self, site: str, query: str, args: tuple[Any, ...], duration: float) -> None:
+        self.when: datetime.datetime = datetime.datetime.now(datetime.timezone.utc)
+        self.site: str = site
+        self.query: str = query
+        self.args: tuple[Any, ...] = args
+        self.duration: float = duration
+        # filled in later if explain_pool is set
+        self.plan: Optional[str] = None
+
+
+# set inside the tasks that explain slow queries so those aren't logged as well
+_explaining: contextvars.ContextVar[bool] = contextvars.ContextVar('explaining', default=False)
+
+# set by the Pool helpers, which already know their call site, around the query they run
+_query_site: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('query_site', default=None)
+
+# statements asyncpg runs on its own, e.g. BEGIN/COMMIT or the reset when a connection is released
+_INTERNAL_MODULES = ('asyncpg.connection', 'asyncpg.transaction')
+
+
+class QueryLog:
+    """Times every query that goes through :class:`Connection`.
+
+    Queries are keyed by call site and query text. Queries that take longer
+    than ``slow_threshold`` seconds are logged and kept in :attr:`slow_queries`.
+    If :attr:`explain_pool` is set then the plan of a slow query is fetched
+    in the background, at most once every ``explain_cooldown`` seconds per query.
+    """
+
+    def __init__(
+        self,
+        *,
+        slow_threshold: float = 0.5,
+        window: int = 60,
+        max_queries: int = 2000,
+        max_samples: int = 100,
+        max_slow: int = 50,
+        explain_cooldown: float = 600.0,
+    ) -> None:
+        self.slow_threshold: float = slow_threshold
+        self.window: int = window
+        self.max_queries: int = max_queries
+        self.explain_cooldown: float = explain_cooldown
+        self.explain_pool: Optional[Pool] = None
+        self.slow_queries: deque[SlowQuery] = deque(maxlen=max_slow)
+        self.total_calls: int = 0
+        # (site, query): stats
+        self._stats: OrderedDict[tuple[str, str], QueryStats] = OrderedDict()
+        self._max_samples: int = max_samples
+
+    def __len__(self) -> int:
+        return len(self._stats)
+
+    @staticmethod
+    def _minute() -> int:
+        return int(time.monotonic() // 60)
+
+    def record(self, site: str, query: str, args: tuple[Any, ...], duration: float) -> None:
+        if _explaining.get():
+            return
+
+        self.total_calls += 1
+        key = (site, query)
+        try:
+            stats = self._stats[key]
+        except KeyError:
+            if len(self._stats) >= self.max_queries:
+                # drop the query that was least recently run
+                self._stats.popitem(last=False)
+            self._stats[key] = stats = QueryStats(site, query, window=self.window, max_samples=self._max_samples)
+        else:
+            self._stats.move_to_end(key)
+
+        stats.record(duration, self._minute())
+        if duration >= self.slow_threshold:
+            self._record_slow(stats, args, duration)
+
+    def _record_slow(self, stats: QueryStats, args: tuple[Any, ...], duration: float) -> None:
+        log.warning('Slow query (%.2fms) from %s: %s', duration * 1000, stats.site, stats.display_query)
+        slow = SlowQuery(stats.site, stats.query, args, duration)
+        self.slow_queries.append(slow)
+
+        now = time.monotonic()
+        if self.explain_pool is None or now - stats.last_explained < self.explain_cooldown:
+            return
+
+        if not stats.query.lstrip()[:6].upper().startswith(('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')):
+            return
+
+        stats.last_explained = now
+        asyncio.create_task(self._explain(self.explain_pool, slow))
+
+    async def _explain(self, pool: Pool, slow: SlowQuery) -> None:
+        _explaining.set(True)
+        try:
+            slow.plan = await explain(pool, slow.query, *slow.args)
+        except Exception as e:
+            slow.plan = f'Could not explain: {e}'
+
+    def top(self, *, key: str = 'total', limit: int = 10) -> list[QueryStats]:
+        """Returns the queries that took the most total or p99 time in the window."""
+        since = self.window_start
+        stats = [entry for entry in self._stats.values() if entry.buckets and entry.buckets[-1][0] >= since]
+        if key == 'p99':
+            return sorted(stats, key=lambda s: s.window_percentiles(since, 99)[0], reverse=True)[:limit]
+        return sorted(stats, key=lambda s: s.window_total(since), reverse=True)[:limit]
+
+    @property
+    def window_start(self) -> int:
+        """:class:`int`: The first minute that is part of the reporting window."""
+        return self._minute() - self.window + 1
+
+
+query_log = QueryLog()
+
+
+async def explain(db: Union[Pool, asyncpg.Pool, Connection], query: str, *args: Any, analyze: bool = False) -> str:
+    """Returns the JSON plan of a query.
+
+    Unless ``analyze`` is passed the query is only planned, not run.
+    """
+    if analyze:
+        query = f'EXPLAIN (ANALYZE, COSTS, VERBOSE, BUFFERS, FORMAT JSON)\n{query}'
+    else:
+        query = f'EXPLAIN (COSTS, VERBOSE, FORMAT JSON)\n{query}'
+    return await db.fetchval(query, *args)
+
+
+class Connection(asyncpg.Connection):
+    """A connection that keeps the statements from :data:`prepared_statements` around.
+
+    Every query run through it is timed and recorded in :data:`query_log`.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._prepared: dict[str, PreparedStatement] = {}
+        # the prepared_statements version this connection was last warmed at
+        self._prepared_version: int = -1
+
+    async def prepared(self, name: str) -> PreparedStatement:
+        query = prepared_statements.get_query(name)
+        statement = self._prepared.get(name)
+        # a reloaded cog could have registered a different query under the name
+        if statement is None or statement.get_query() != query:
+            statement = await self.prepare(query)
+            self._prepared[name] = statement
+        return statement
+
+    async def warm_prepared(self) -> None:
+        """Prepares every query in :data:`prepared_statements` this connection doesn't have prepared yet."""
+        if self._prepared_version == prepared_statements.version:
+            return
+
+        self._prepared_version = prepared_statements.version
+        for name in prepared_statements.names():
+            try:
+                await self.prepared(name)
+            except asyncpg.PostgresError as e:
+                # e.g. the table doesn't exist until a migration runs, it's
+                # prepared again on first use where the error is raised
+                log.warning('Could not prepare statement %r: %s', name, e)
+
+    async def _logged(self, query: str, args: tuple[Any, ...], coro: Awaitable[T], site: Optional[str]) -> T:
+        if site is None:
+            return await coro
+
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            query_log.record(site, query, args, time.perf_counter() - start)
+
+    @staticmethod
+    def _site() -> Optional[str]:
+        """Returns the call site of the query being run, or ``None`` if asyncpg is running it itself.
+
+        Must be called directly from the query method.
+        """
+        caller = sys._getframe(2)
+        if caller.f_globals.get('__name__') in _INTERNAL_MODULES:
+            return None
+        return _query_site.get() or _call_site(3)
+
+    async def execute(self, query: str, *args: Any, timeout: Optional[float] = None) -> str:
+        return await self._logged(query, args, super().execute(query, *args, timeout=timeout), self._site())
+
+    async def executemany(self, command: str, args: Any, *, timeout: Optional[float] = None) -> None:
+        return await self._logged(command, (), super().executemany(command, args, timeout=timeout), self._site())
+
+    async def fetch(self, query: str, *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> list[Any]:
+        return await self._logged(query, args, super().fetch(query, *args, timeout=timeout, **kwargs), self._site())
+
+    async def fetchval(self, query: str, *args: Any, column: int = 0, timeout: Optional[float] = None) -> Any:
+        coro = super().fetchval(query, *args, column=column, timeout=timeout)
+        return await self._logged(query, args, coro, self._site())
+
+    async def fetchrow(self, query: str, *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Optional[Any]:
+        coro = super().fetchrow(query, *args, timeout=timeout, **kwargs)
+        return await self._logged(query, args, coro, self._site())
+
+    async def _run_prepared(self, name: str, args: tuple[Any, ...], method: str) -> Any:
+        query = prepared_statements.get_query(name)
+        site = _query_site.get() or _call_site()
+        statement = await self.prepared(name)
+        try:
+            return await self._logged(query, args, getattr(statement, method)(*args), site)
+        except asyncpg.InvalidCachedStatementError:
+            # The schema changed under the statement, e.g. a migration added a
+            # column to a SELECT * query. Prepare it again and retry like
+            # asyncpg does for its own statement cache, unless the failure
+            # aborted the transaction we're in.
+            del self._prepared[name]
+            if self.is_in_transaction():
+                raise
+
+            statement = await self.prepared(name)
+            return await self._logged(query, args, getattr(statement, method)(*args), site)
+
+    async def fetch_prepared(self, name: str, *args: Any) -> list[Any]:
+        return await self._run_prepared(name, args, 'fetch')
+
+    async def fetchrow_prepared(self, name: str, *args: Any) -> Optional[Any]:
+        return await self._run_prepared(name, args, 'fetchrow')
+
+
+async def fetch_prepared(db: Union[Pool, asyncpg.Pool, Connection], name: str, *args: Any) -> list[Any]:
+    """Runs a named prepared statement and returns all of its rows."""
+    if isinstance(db, Pool):
+        async with _AcquireContext(db, None, _call_site(), tag_queries=True) as connection:
+            return await connection.fetch_prepared(name, *args)
+
+    if isinstance(db, asyncpg.Pool):
+        async with db.acquire() as connection:
+            return await connection.fetch_prepared(name, *args)
+
+    return await db.fetch_prepared(name, *args)
+
+
+async def fetchrow_prepared(db: Union[Pool, asyncpg.Pool, Connection], name: str, *args: Any) -> Optional[Any]:
+    """Runs a named prepared statement and returns the first row."""
+    if isinstance(db, Pool):
+        async with _AcquireContext(db, None, _call_site(), tag_queries=True) as connection:
+            return await connection.fetchrow_prepared(name, *args)
+
+    if isinstance(db, asyncpg.Pool):
+        async with db.acquire() as connection:
+            return await connection.fetchrow_prepared(name, *args)
+
+    return await db.fetchrow_prepared(name, *args)
+
+
+# Pool
+
+
+def _call_site(depth: int = 2) -> str:
+    """Returns ``module.function`` of the first caller outside of this module and asyncpg.
+
+    The search starts ``depth`` frames up from this function.
+    """
+    frame = sys._getframe(depth)
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', '')
+        if (
+            module != __name__
+            and module != 'asyncpg'
+            and not module.startswith('asyncpg.')
+            and code.co_name not in ('__aenter__', '__aexit__')
+        ):
+            return f'{module}.{code.co_name}'
+        frame = frame.f_back
+    return '<unknown>'
+
+
+class CallSiteStats:
+    """How often and for how long a call site held a connection."""
+
+    __slots__ = ('name', 'calls', 'total_hold', 'holds')
+
+    def __init__(self, name: str, *, max_samples: int) -> None:
+        self.name: str = name
+        self.calls: int = 0
+        self.total_hold: float = 0.0
+        self.holds: deque[float] = deque(maxlen=max_samples)
+
+    def record(self, hold: float) -> None:
+        self.calls += 1
+        self.total_hold += hold
+        self.holds.append(hold)
+
+    def percentiles(self, *ps: float) -> list[float]:
+        samples = sorted(self.holds)
+        return [percentile(samples, p) for p in ps]
+
+
+class _AcquireContext:
+    __slots__ = ('pool', 'timeout', 'site', 'connection', 'tag_queries', '_token')
+
+    def __init__(self, pool: Pool, timeout: Optional[float], site: str, *, tag_queries: bool = False) -> None:
+        self.pool: Pool = pool
+        self.timeout: Optional[float] = timeout
+        self.site: str = site
+        self.connection: Optional[PoolConnectionProxy] = None
+        # whether queries run inside the block are attributed to the acquiring call site
+        self.tag_queries: bool = tag_queries
+        self._token: Optional[contextvars.Token[Optional[str]]] = None
+
+    def __await__(self) -> Generator[Any, None, PoolConnectionProxy]:
+        return self.pool._acquire(self.timeout, self.site).__await__()
+
+    async def __aenter__(self) -> PoolConnectionProxy:
+        self.connection = await self.pool._acquire(self.timeout, self.site)
+        if self.tag_queries:
+            self._token = _query_site.set(self.site)
+        return self.connection
+
+    async def __aexit__(self, *args: Any) -> None:
+        if self._token is not None:
+            _query_site.reset(self._token)
+            self._token = None
+
+        connection, self.connection = self.connection, None
+        if connection is not None:
+            await self.pool.release(connection)
+
+
+class Pool:
+    """Wraps an :class:`asyncpg.Pool` to record how connections are used.
+
+    Every acquire records how long it waited, how many others were waiting
+    and, on release, how long the connection was held by its call site.
+
+    The number of connections that can be held at once starts at
+    ``initial_limit``. As soon as an acquire would have to wait the limit
+    grows to make room for it and everything already waiting, up to
+    ``max_size``. Every ``resize_every`` acquires, if nothing waited longer
+    than ``target_wait`` seconds and the limit was not reached, it shrinks by
+    one down to ``min_size``. The underlying pool opens connections on
+    demand and closes idle ones.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        *,
+        dsn: str,
+        min_size: int,
+        max_size: int,
+        initial_limit: Optional[int] = None,
+        target_wait: float = 0.05,
+        resize_every: int = 100,
+        max_samples: int = 2000,
+    ) -> None:
+        self._pool: asyncpg.Pool = pool
+        # used by things that need their own connection, like LISTEN
+        self.dsn: str = dsn
+        self.min_size: int = min_size
+        self.max_size: int = max_size
+        self.target_wait: float = target_wait
+        self.resize_every: int = resize_every
+        self.limit: int = max(min_size, min(initial_limit or min_size, max_size))
+        self.acquire_waits: deque[float] = deque(maxlen=max_samples)
+        self.queue_depths: deque[int] = deque(maxlen=max_samples)
+        # name: stats
+        self.call_sites: dict[str, CallSiteStats] = {}
+        self._max_samples: int = max_samples
+        self._in_use: int = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+        # connection: (call site, when it was acquired)
+        self._held_by: dict[Any, tuple[str, float]] = {}
+        self._window_waits: list[float] = []
+        self._window_peak: int = 0
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._pool, attr)
+
+    @property
+    def in_use(self) -> int:
+        """:class:`int`: The number of connections currently held."""
+        return self._in_use
+
+    @property
+    def waiting(self) -> int:
+        """:class:`int`: The number of acquires waiting for a connection."""
+        return len(self._waiters)
+
+    def get_size(self) -> int:
+        return self._pool.get_size()
+
+    def get_idle_size(self) -> int:
+        return self._pool.get_idle_size()
+
+    def acquire_percentiles(self, *ps: float) -> list[float]:
+        """Returns the given acquire wait percentiles, in seconds."""
+        samples = sorted(self.acquire_waits)
+        return [percentile(samples, p) for p in ps]
+
+    def queue_depth_percentiles(self, *ps: float) -> list[int]:
+        samples = sorted(self.queue_depths)
+        return [int(percentile(samples, p)) for p in ps]  # type: ignore
+
+    def _wake_waiters(self) -> None:
+        while self._in_use < self.limit and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_use += 1
+                waiter.set_result(None)
+
+    def _release_slot(self) -> None:
+        # hand the slot straight to the next waiter if there is one
+        while self._waiters and self._in_use <= self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_use -= 1
+
+    def _resize(self) -> None:
+        # growing happens as soon as anything has to wait, see _wait_for_slot
+        if max(self._window_waits) < self.target_wait and self._window_peak < self.limit:
+            self.limit = max(self.limit - 1, self.min_size)
+
+        self._window_waits.clear()
+        self._window_peak = self._in_use
+
+    def held_by(self, connection: Any) -> Optional[str]:
+        """Returns the call site currently holding the given connection, if any."""
+        try:
+            return self._held_by[connection][0]
+        except KeyError:
+            return None
+
+    async def _wait_for_slot(self) -> None:
+        if self.limit < self.max_size and (self._waiters or self._in_use >= self.limit):
+            # Waiting for a completed acquire to grow the limit could take
+            # forever, e.g. when every holder is itself waiting on a nested
+            # acquire, so make room for everyone that is waiting right away.
+            self.limit = min(max(self.limit, self._in_use + len(self._waiters) + 1), self.max_size)
+            self._wake_waiters()
+
+        if self._in_use < self.limit and not self._waiters:
+            self._in_use += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # got the slot right as we were cancelled
+                self._release_slot()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+    async def _acquire(self, timeout: Optional[float], site: str) -> PoolConnectionProxy:
+        start = time.perf_counter()
+        self.queue_depths.append(len(self._waiters))
+        await asyncio.wait_for(self._wait_for_slot(), timeout)
+
+        if timeout is not None:
+            timeout = max(timeout - (time.perf_counter() - start), 0.0)
+
+        try:
+            connection = await self._pool.acquire(timeout=timeout)
+        except BaseException:
+            self._release_slot()
+            raise
+
+        now = time.perf_counter()
+        wait = now - start
+        self.acquire_waits.append(wait)
+        self._held_by[connection] = (site, now)
+        self._window_waits.append(wait)
+        self._window_peak = max(self._window_peak, self._in_use)
+        if len(self._window_waits) >= self.resize_every:
+            self._resize()
+        return connection
+
+    def acquire(self, *, timeout: Optional[float] = None) -> _AcquireContext:
+        return _AcquireContext(self, timeout, _call_site())
+
+    async def release(self, connection: PoolConnectionProxy, *, timeout: Optional[float] = None) -> None:
+        try:
+            site, acquired = self._held_by.pop(connection)
+        except KeyError:
+            pass
+        else:
+            try:
+                stats = self.call_sites[site]
+            except KeyError:
+                self.call_sites[site] = stats = CallSiteStats(site, max_samples=self._max_samples // 10)
+            stats.record(time.perf_counter() - acquired)
+
+        try:
+            await self._pool.release(connection, timeout=timeout)
+        finally:
+            self._release_slot()
+
+    async def execute(self, query: str, *args: Any, timeout: Optional[float] = None) -> str:
+        async with _AcquireContext(self, None, _call_site(), tag_queries=True) as connection:
+            return await connection.execute(query, *args, timeout=timeout)
+
+    async def executemany(self, command: str, args: Any, *, timeout: Optional[float] = None) -> None:
+        async with _AcquireContext(self, None, _call_site(), tag_queries=True) as connection:
+            return await connection.executemany(command, args, timeout=timeout)
+
+    async def fetch(self, query: str, *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> list[Any]:
+        async with _AcquireContext(self, None, _call_site(), tag_queries=True) as connection:
+            return await connection.fetch(query, *args, timeout=timeout, **kwargs)
+
+    async def fetchval(self, query: str, *args: Any, column: int = 0, timeout: Optional[float] = None) -> Any:
+        async with _AcquireContext(self, None, _call_site(), tag_queries=True) as connection:
+            return await connection.fetchval(query, *args, column=column, timeout=timeout)
+
+    async def fetchrow(self, query: str, *args: Any, timeout: Optional[float] = None, **kwargs: Any) -> Optional[Any]:
+        async with _AcquireContext(self, None, _call_site(), tag_queries=True) as connection:
+            return await connection.fetchrow(query, *args, timeout=timeout, **kwargs)
+
+    async def close(self) -> None:
+        await self._pool.close()
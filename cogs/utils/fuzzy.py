@@ -12,9 +12,30 @@ from __future__ import annotations
 
 import re
 import heapq
-from typing import Callable, Iterable, Literal, Optional, Sequence, TypeVar, Generator, overload
+from collections import Counter
+from typing import (
+    Any,
+    Callable,
+    Generic,
+    Hashable,
+    Iterable,
+    Literal,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TypeVar,
+    Generator,
+    overload,
+)
 from difflib import SequenceMatcher
 
+from .cache import ExpiringCache
+
+try:
+    from rapidfuzz.distance import Indel as _Indel  # type: ignore
+except ImportError:
+    _Indel = None
+
 T = TypeVar('T')
 
 
@@ -74,6 +95,183 @@ def partial_token_sort_ratio(a: str, b: str) -> int:
     return partial_ratio(a, b)
 
 
+# Batch scoring
+#
+# SequenceMatcher only counts the characters it can find through its longest
+# matching blocks, which is at most the longest common subsequence (LCS) of
+# the two strings. The batch scorers count the LCS instead, with Hyyrö's
+# bit-parallel algorithm, so their scores are never lower than the scorers
+# above and usually the same. That makes them an upper bound: a choice whose
+# LCS score is below what's wanted can be skipped, and only the rest have to
+# be scored exactly with SequenceMatcher. ``launcher.py benchmark scorers``
+# checks the results are the same as scoring everything exactly.
+# If rapidfuzz is installed its compiled Indel similarity is used, which is
+# the same LCS based ratio.
+
+_popcount: Callable[[int], int] = getattr(int, 'bit_count', None) or (lambda v: bin(v).count('1'))
+
+
+def _character_masks(s: str) -> dict[str, int]:
+    # character: bit mask of where it is in the string
+    masks: dict[str, int] = {}
+    bit = 1
+    for char in s:
+        masks[char] = masks.get(char, 0) | bit
+        bit <<= 1
+    return masks
+
+
+def _lcs(masks: dict[str, int], length: int, other: str) -> int:
+    full = (1 << length) - 1
+    v = full
+    get = masks.get
+    for char in other:
+        u = v & get(char, 0)
+        v = ((v + u) | (v - u)) & full
+    return length - _popcount(v)
+
+
+if _Indel is not None:
+
+    def _indel_ratio(query: str, masks: dict[str, int], choice: str) -> float:
+        return _Indel.normalized_similarity(query, choice)
+
+else:
+
+    def _indel_ratio(query: str, masks: dict[str, int], choice: str) -> float:
+        total = len(query) + len(choice)
+        if not total:
+            return 1.0
+        return 2.0 * _lcs(masks, len(query), choice) / total
+
+
+def _partial_indel_ratio(query: str, masks: dict[str, int], choice: str) -> float:
+    if len(query) > len(choice):
+        query, choice = choice, query
+        masks = _character_masks(query)
+
+    size = len(query)
+    if not size:
+        return 1.0
+
+    # The best window always starts with a character of the query. Otherwise
+    # moving it right or cutting off its first character would score as high.
+    best = 0.0
+    for start, char in enumerate(choice):
+        if char not in masks:
+            continue
+        score = _indel_ratio(query, masks, choice[start : start + size])
+        if score > best:
+            best = score
+            if best > 0.99:
+                break
+    return best
+
+
+def _quick_ratios(query: str, choices: Sequence[str]) -> list[int]:
+    wanted = Counter(query).items()
+    length = len(query)
+    scores = []
+    for choice in choices:
+        total = length + len(choice)
+        if not total:
+            scores.append(100)
+            continue
+        matches = 0
+        for char, count in wanted:
+            found = choice.count(char)
+            matches += count if count < found else found
+        scores.append(int(round(100 * 2.0 * matches / total)))
+    return scores
+
+
+def _ratios(query: str, choices: Sequence[str]) -> list[int]:
+    masks = _character_masks(query)
+    if _Indel is not None:
+        return [int(round(100 * _indel_ratio(query, masks, choice))) for choice in choices]
+
+    # _lcs inlined, this is the hot loop
+    length = len(query)
+    full = (1 << length) - 1
+    get = masks.get
+    scores = []
+    for choice in choices:
+        total = length + len(choice)
+        if not total:
+            scores.append(100)
+            continue
+        v = full
+        for char in choice:
+            u = v & get(char, 0)
+            v = ((v + u) | (v - u)) & full
+        scores.append(int(round(100 * 2.0 * (length - _popcount(v)) / total)))
+    return scores
+
+
+def _partial_ratios(query: str, choices: Sequence[str]) -> list[int]:
+    masks = _character_masks(query)
+    scores = []
+    for choice in choices:
+        r = _partial_indel_ratio(query, masks, choice)
+        scores.append(100 if 100 * r > 99 else int(round(100 * r)))
+    return scores
+
+
+# scorer: (batch scorer, whether it's token sorted, whether its scores are exact)
+_BATCH_SCORERS: dict[Callable[[str, str], int], tuple[Callable[[str, Sequence[str]], list[int]], bool, bool]] = {
+    ratio: (_ratios, False, False),
+    quick_ratio: (_quick_ratios, False, True),
+    partial_ratio: (_partial_ratios, False, False),
+    token_sort_ratio: (_ratios, True, False),
+    quick_token_sort_ratio: (_quick_ratios, True, True),
+    partial_token_sort_ratio: (_partial_ratios, True, False),
+}
+
+
+def _score_bounds(query: str, choices: Sequence[str], scorer: Callable[[str, str], int]) -> Optional[tuple[list[int], bool]]:
+    # (upper bound of every choice's score, whether the bounds are the scores)
+    try:
+        batch, token_sorted, exact = _BATCH_SCORERS[scorer]
+    except KeyError:
+        return None
+
+    if token_sorted:
+        query = _sort_tokens(query)
+        choices = [_sort_tokens(choice) for choice in choices]
+    return batch(query, choices), exact
+
+
+def score_many(
+    query: str,
+    choices: Sequence[str],
+    *,
+    scorer: Callable[[str, str], int] = ratio,
+    score_cutoff: int = 0,
+) -> list[int]:
+    """Scores the query against every choice at once, returning the scores in the same order.
+
+    Choices scoring below ``score_cutoff`` are given 0. The scores are the
+    same as calling the scorer for every choice, but for the ratio scorers
+    and their token sorted variants only the choices that could reach the
+    cutoff are actually scored, see the comment above. Any other scorer is
+    just called for every choice.
+    """
+    bounds = _score_bounds(query, choices, scorer) if score_cutoff > 0 else None
+    if bounds is None:
+        scores = [scorer(query, choice) for choice in choices]
+        return [score if score >= score_cutoff else 0 for score in scores]
+
+    upper, exact = bounds
+    scores = []
+    for choice, bound in zip(choices, upper):
+        if bound < score_cutoff:
+            scores.append(0)
+            continue
+        score = bound if exact else scorer(query, choice)
+        scores.append(score if score >= score_cutoff else 0)
+    return scores
+
+
 @overload
 def _extraction_generator(
     query: str,
@@ -238,6 +436,35 @@ def extract_or_exact(
     return matches
 
 
+def _best_matches(
+    query: str,
+    strings: Sequence[str],
+    scorer: Callable[[str, str], int],
+    score_cutoff: int,
+    bounds: list[int],
+    exact: bool,
+) -> tuple[int, list[int]]:
+    # Scored from the highest bound down, until nothing left can tie the best score
+    best = -1
+    indices: list[int] = []
+    for index in sorted(range(len(strings)), key=bounds.__getitem__, reverse=True):
+        bound = bounds[index]
+        if bound < score_cutoff or bound < best:
+            break
+
+        score = bound if exact else scorer(query, strings[index])
+        if score < score_cutoff or score < best:
+            continue
+        if score > best:
+            best = score
+            indices = []
+        indices.append(index)
+
+    # back in their original order, like the stable sort in extract
+    indices.sort()
+    return best, indices
+
+
 @overload
 def extract_matches(
     query: str,
@@ -267,6 +494,14 @@ def extract_matches(
     scorer: Callable[[str, str], int] = quick_ratio,
     score_cutoff: int = 0,
 ) -> list[tuple[str, int]] | list[tuple[str, int, T]]:
+    strings = list(choices) if isinstance(choices, dict) else choices
+    bounds = _score_bounds(query, strings, scorer)
+    if bounds is not None:
+        best, indices = _best_matches(query, strings, scorer, score_cutoff, *bounds)
+        if isinstance(choices, dict):
+            return [(strings[index], best, choices[strings[index]]) for index in indices]
+        return [(strings[index], best) for index in indices]
+
     matches = extract(query, choices, scorer=scorer, score_cutoff=score_cutoff, limit=None)
     if len(matches) == 0:
         return []
@@ -355,3 +590,370 @@ def find(text: str, collection: Iterable[str], *, key: Optional[Callable[[str],
         return finder(text, collection, key=key)[0]
     except IndexError:
         return None
+
+
+class _ScoringView:
+    """The strings of a :class:`FuzzyIndex` as a scorer sees them, with their characters indexed."""
+
+    __slots__ = ('strings', 'lengths', 'postings')
+
+    def __init__(self, strings: list[str]) -> None:
+        self.strings: list[str] = strings
+        self.lengths: list[int] = [len(s) for s in strings]
+        # character: (index, how many times it's in that string)
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        for index, string in enumerate(strings):
+            for char, count in Counter(string).items():
+                self.postings.setdefault(char, []).append((index, count))
+
+    def matching_characters(self, query: str) -> list[int]:
+        """Returns how many characters each string has in common with the query, like quick_ratio counts them."""
+        matches = [0] * len(self.strings)
+        for char, wanted in Counter(query).items():
+            postings = self.postings.get(char)
+            if postings is None:
+                continue
+            if wanted == 1:
+                for index, _ in postings:
+                    matches[index] += 1
+            else:
+                for index, count in postings:
+                    matches[index] += wanted if wanted < count else count
+        return matches
+
+
+# scorer: (scorer to run on the prepared strings, whether they're token sorted, whether it's a partial scorer)
+_INDEXED_SCORERS: dict[Callable[[str, str], int], tuple[Callable[[str, str], int], bool, bool]] = {
+    ratio: (ratio, False, False),
+    quick_ratio: (quick_ratio, False, False),
+    partial_ratio: (partial_ratio, False, True),
+    token_sort_ratio: (ratio, True, False),
+    quick_token_sort_ratio: (quick_ratio, True, False),
+    partial_token_sort_ratio: (partial_ratio, True, True),
+}
+
+
+class FuzzyIndex(Generic[T]):
+    """A collection prepared for repeated fuzzy searches.
+
+    The strings to search are worked out once up front. Every character is
+    mapped to the strings that contain it, which is used to skip items that
+    can't match before doing the expensive part.
+
+    :meth:`finder` only looks at items containing every character of the
+    text. :meth:`extract` works out an upper bound of every score from the
+    characters in common and stops scoring once nothing left can make the
+    cut. Both return the same results in the same order as the functions
+    of the same name.
+
+    The collection is copied, so a new index has to be made if it changes.
+    """
+
+    __slots__ = ('items', 'strings', 'key', '_lowered', '_irregular', '_characters', '_views')
+
+    def __init__(self, collection: Iterable[T], *, key: Optional[Callable[[T], str]] = None) -> None:
+        self.items: list[T] = list(collection)
+        self.key: Optional[Callable[[T], str]] = key
+        self.strings: list[str] = [key(item) if key else str(item) for item in self.items]
+        self._lowered: list[str] = [s.lower() for s in self.strings]
+        # Lowering non-ASCII text doesn't always line up with how re.IGNORECASE
+        # matches it, and the regex doesn't match across newlines, so these
+        # are always searched with the regex
+        self._irregular: set[int] = set()
+        # character: indices of the (lowered) strings that contain it
+        self._characters: dict[str, set[int]] = {}
+        for index, string in enumerate(self._lowered):
+            if not string.isascii() or '\n' in string:
+                self._irregular.add(index)
+                continue
+            for char in set(string):
+                self._characters.setdefault(char, set()).add(index)
+
+        # token sorted: view
+        self._views: dict[bool, _ScoringView] = {}
+
+    def __repr__(self) -> str:
+        return f'<FuzzyIndex items={len(self.items)}>'
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _view(self, token_sorted: bool) -> _ScoringView:
+        try:
+            return self._views[token_sorted]
+        except KeyError:
+            strings = [_sort_tokens(s) for s in self.strings] if token_sorted else self.strings
+            view = self._views[token_sorted] = _ScoringView(strings)
+            return view
+
+    def _finder_candidates(self, text: str) -> Iterable[int]:
+        if not text or not text.isascii():
+            return range(len(self.items))
+
+        postings = []
+        for char in set(text.lower()):
+            indices = self._characters.get(char)
+            if indices is None:
+                return sorted(self._irregular)
+            postings.append(indices)
+
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        candidates.update(self._irregular)
+        return sorted(candidates)
+
+    @overload
+    def finder(self, text: str, *, raw: Literal[True], limit: Optional[int] = ...) -> list[tuple[int, int, T]]:
+        ...
+
+    @overload
+    def finder(self, text: str, *, raw: Literal[False] = ..., limit: Optional[int] = ...) -> list[T]:
+        ...
+
+    def finder(self, text: str, *, raw: bool = False, limit: Optional[int] = None) -> list[tuple[int, int, T]] | list[T]:
+        """Like :func:`finder` but only returning the first ``limit`` results if given."""
+        text = str(text)
+        pat = '.*?'.join(map(re.escape, text))
+        regex = re.compile(pat, flags=re.IGNORECASE)
+        needle = text.lower()
+        simple = needle.isascii()
+        irregular = self._irregular
+
+        # (match length, match start, index)
+        suggestions: list[tuple[int, int, int]] = []
+        for index in self._finder_candidates(text):
+            if simple and index not in irregular:
+                # The leftmost match starts at the first occurrence of the first
+                # character and the lazy regex takes the earliest one of the rest
+                haystack = self._lowered[index]
+                start = end = haystack.find(needle[0]) if needle else 0
+                for char in needle[1:]:
+                    end = haystack.find(char, end + 1)
+                    if end == -1:
+                        break
+                if start == -1 or end == -1:
+                    continue
+                suggestions.append((end - start + 1 if needle else 0, start, index))
+            else:
+                r = regex.search(self.strings[index])
+                if r:
+                    suggestions.append((len(r.group()), r.start(), index))
+
+        if self.key:
+            sort_key = lambda tup: (tup[0], tup[1], self.strings[tup[2]])
+        else:
+            sort_key = lambda tup: (tup[0], tup[1], self.items[tup[2]])
+
+        if limit is not None:
+            ordered = heapq.nsmallest(limit, suggestions, key=sort_key)
+        else:
+            ordered = sorted(suggestions, key=sort_key)
+
+        if raw:
+            return [(length, start, self.items[index]) for length, start, index in ordered]
+        return [self.items[index] for _, _, index in ordered]
+
+    def find(self, text: str) -> Optional[T]:
+        try:
+            return self.finder(text, limit=1)[0]
+        except IndexError:
+            return None
+
+    def extract(
+        self,
+        query: str,
+        *,
+        scorer: Callable[[str, str], int] = quick_ratio,
+        score_cutoff: int = 0,
+        limit: Optional[int] = 10,
+    ) -> list[tuple[str, int, T]]:
+        """Like :func:`extract` with a dict, returning ``(string, score, item)`` tuples."""
+        try:
+            base, token_sorted, partial = _INDEXED_SCORERS[scorer]
+        except KeyError:
+            # No idea what the scores can be so every item is scored
+            scored = ((index, scorer(query, string)) for index, string in enumerate(self.strings))
+            results = [(index, score) for index, score in scored if score >= score_cutoff]
+        else:
+            results = self._extract_bounded(query, base, token_sorted, partial, score_cutoff, limit)
+
+        key = lambda t: t[1]
+        if limit is not None:
+            results = heapq.nlargest(limit, results, key=key)
+        else:
+            results.sort(key=key, reverse=True)
+        return [(self.strings[index], score, self.items[index]) for index, score in results]
+
+    def _extract_bounded(
+        self,
+        query: str,
+        scorer: Callable[[str, str], int],
+        token_sorted: bool,
+        partial: bool,
+        score_cutoff: int,
+        limit: Optional[int],
+    ) -> list[tuple[int, int]]:
+        view = self._view(token_sorted)
+        if token_sorted:
+            query = _sort_tokens(query)
+
+        # Every scorer here gives at most the score quick_ratio would, or in the
+        # partial case what it would get if the matching characters were next
+        # to each other, so strings are scored from the highest bound down.
+        query_length = len(query)
+        buckets: list[list[int]] = [[] for _ in range(101)]
+        for index, (matches, length) in enumerate(zip(view.matching_characters(query), view.lengths)):
+            if partial:
+                short = min(query_length, length)
+                bound = 2.0 * matches / (short + matches) if short else 1.0
+            else:
+                total = query_length + length
+                bound = 2.0 * matches / total if total else 1.0
+
+            # partial_ratio rounds anything above 99 up to 100
+            bucket = 100 if partial and bound > 0.99 else int(round(100 * bound + 1e-9))
+            if bucket >= score_cutoff:
+                buckets[bucket].append(index)
+
+        # (score, -index), the worst result is at the top when a limit is given
+        heap: list[tuple[int, int]] = []
+        strings = view.strings
+        for bound in range(100, -1, -1):
+            bucket = buckets[bound]
+            if not bucket:
+                continue
+            if limit is not None and len(heap) >= limit and bound < heap[0][0]:
+                break
+
+            for index in bucket:
+                score = scorer(query, strings[index])
+                if score < score_cutoff:
+                    continue
+                if limit is None or len(heap) < limit:
+                    heapq.heappush(heap, (score, -index))
+                elif (score, -index) > heap[0]:
+                    heapq.heapreplace(heap, (score, -index))
+
+        # back in their original order for the stable sort in extract
+        return sorted(((-neg_index, score) for score, neg_index in heap))
+
+    def extract_one(
+        self,
+        query: str,
+        *,
+        scorer: Callable[[str, str], int] = quick_ratio,
+        score_cutoff: int = 0,
+    ) -> Optional[tuple[str, int, T]]:
+        try:
+            return self.extract(query, scorer=scorer, score_cutoff=score_cutoff, limit=1)[0]
+        except IndexError:
+            return None
+
+
+def _same_source(a: Any, b: Any) -> bool:
+    if type(a) is tuple and type(b) is tuple:
+        return len(a) == len(b) and all(x is y for x, y in zip(a, b))
+    return a is b
+
+
+class _Narrowed(NamedTuple):
+    text: str
+    source: Any
+    # raw finder results, sorted
+    matches: list[tuple[int, int, Any]]
+
+
+class AutocompleteCache:
+    """Remembers the matches of every user's last autocomplete query.
+
+    Autocomplete fires on every keystroke and usually the new text is the
+    old text with more typed after it. Anything matching the new text in
+    :func:`finder` also matches the old text, so only the old matches
+    have to be searched instead of the whole collection.
+
+    Entries are per user and ``scope``, so different searches don't mix,
+    and expire once a user hasn't typed for ``ttl`` seconds. They're only
+    reused while the same ``source`` is being searched, which defaults to
+    the collection itself, so a collection that's been replaced is
+    searched from scratch. A tuple of sources is compared one by one, for
+    collections built out of several others. Sources are compared by
+    identity, so a collection edited in place has to be replaced instead.
+    """
+
+    def __init__(self, *, ttl: float = 30.0, max_size: int = 5000) -> None:
+        # (user_id, scope): _Narrowed
+        self._entries: ExpiringCache = ExpiringCache(ttl, max_size=max_size)
+
+    def __repr__(self) -> str:
+        return f'<AutocompleteCache entries={len(self._entries)}>'
+
+    @overload
+    def finder(
+        self,
+        user_id: int,
+        text: str,
+        collection: Iterable[T] | FuzzyIndex[T] | Callable[[], Iterable[T]],
+        *,
+        key: Optional[Callable[[T], str]] = ...,
+        scope: Hashable = ...,
+        source: Any = ...,
+        raw: Literal[True],
+    ) -> list[tuple[int, int, T]]:
+        ...
+
+    @overload
+    def finder(
+        self,
+        user_id: int,
+        text: str,
+        collection: Iterable[T] | FuzzyIndex[T] | Callable[[], Iterable[T]],
+        *,
+        key: Optional[Callable[[T], str]] = ...,
+        scope: Hashable = ...,
+        source: Any = ...,
+        raw: Literal[False] = ...,
+    ) -> list[T]:
+        ...
+
+    def finder(
+        self,
+        user_id: int,
+        text: str,
+        collection: Iterable[T] | FuzzyIndex[T] | Callable[[], Iterable[T]],
+        *,
+        key: Optional[Callable[[T], str]] = None,
+        scope: Hashable = None,
+        source: Any = None,
+        raw: bool = False,
+    ) -> list[tuple[int, int, T]] | list[T]:
+        """Like :func:`finder`, narrowing down from the user's previous matches when possible.
+
+        The collection can also be a :class:`FuzzyIndex`, whose key is used, or a
+        function returning the collection, which is only called when it has to be
+        searched. In that case ``source`` should be passed.
+        """
+
+        if source is None:
+            source = collection
+        if isinstance(collection, FuzzyIndex):
+            key = collection.key
+
+        cache_key = (user_id, scope)
+        previous: Optional[_Narrowed] = self._entries.get(cache_key)
+        if previous is not None and _same_source(previous.source, source) and text.startswith(previous.text):
+            candidates = [item for _, _, item in previous.matches]
+            matches = finder(text, candidates, key=key, raw=True)
+        elif isinstance(collection, FuzzyIndex):
+            matches = collection.finder(text, raw=True)
+        else:
+            if callable(collection):
+                collection = collection()
+            matches = finder(text, collection, key=key, raw=True)  # type: ignore
+
+        self._entries[cache_key] = _Narrowed(text, source, matches)
+        if raw:
+            return matches
+        return [item for _, _, item in matches]
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -1,5 +1,6 @@
 from __future__ import annotations
 import asyncio
+import time
 from collections import deque, OrderedDict
 from typing import Generic, Optional, TypeVar
 
@@ -8,11 +9,19 @@ V = TypeVar('V')
 
 
 class CancellableQueue(Generic[K, V]):
-    """A queue that lets you cancel the items pending for work by a provided unique ID."""
+    """A queue that lets you cancel the items pending for work by a provided unique ID.
 
-    def __init__(self) -> None:
+    Items can be put into one of ``priorities`` lanes. Items in lane 0 are
+    handed out first, then lane 1 and so on. Within a lane items are handed
+    out in the order they were put in.
+    """
+
+    def __init__(self, *, priorities: int = 1) -> None:
         self._waiters: deque[asyncio.Future[None]] = deque()
-        self._data: OrderedDict[K, V] = OrderedDict()
+        # key: (value, time it was queued)
+        self._lanes: list[OrderedDict[K, tuple[V, float]]] = [OrderedDict() for _ in range(priorities)]
+        # key: its lane
+        self._priorities: dict[K, int] = {}
         self._loop = asyncio.get_running_loop()
 
     def __wakeup_next(self) -> None:
@@ -23,26 +32,83 @@ class CancellableQueue(Generic[K, V]):
                 break
 
     def __repr__(self) -> str:
-        return f'<{self.__class__.__name__} data={self._data!r} getters[{len(self._waiters)}]>'
+        return f'<{self.__class__.__name__} depth={len(self)} lanes={len(self._lanes)} getters[{len(self._waiters)}]>'
 
     def __len__(self) -> int:
-        return len(self._data)
+        return len(self._priorities)
 
     def is_empty(self) -> bool:
         """:class:`bool`: Returns ``True`` if the queue is empty."""
-        return not self._data
-
-    def put(self, key: K, value: V) -> None:
+        return not self._priorities
+
+    def depth(self, priority: Optional[int] = None) -> int:
+        """Returns how many items are pending, either in total or in a single lane."""
+        if priority is None:
+            return len(self._priorities)
+        return len(self._lanes[priority])
+
+    def oldest_age(self) -> float:
+        """Returns how many seconds the oldest pending item has been waiting for, or 0 if there are none."""
+        oldest = None
+        for lane in self._lanes:
+            if lane:
+                _, queued_at = lane[next(iter(lane))]
+                if oldest is None or queued_at < oldest:
+                    oldest = queued_at
+
+        if oldest is None:
+            return 0.0
+        return time.monotonic() - oldest
+
+    def put(self, key: K, value: V, *, priority: int = 0) -> None:
         """Puts an item into the queue.
 
-        If the key is the same as one that already exists then it's overwritten.
+        If the key is the same as one that already exists then it's overwritten,
+        keeping its place if it stays in the same lane.
 
         This wakes up the first coroutine waiting for the queue.
         """
 
-        self._data[key] = value
+        lane = self._lanes[priority]
+        previous = self._priorities.get(key)
+        if previous == priority:
+            _, queued_at = lane[key]
+        else:
+            if previous is not None:
+                del self._lanes[previous][key]
+            queued_at = time.monotonic()
+
+        lane[key] = (value, queued_at)
+        self._priorities[key] = priority
         self.__wakeup_next()
 
+    async def __wait(self, timeout: Optional[float] = None) -> None:
+        getter = self._loop.create_future()
+        self._waiters.append(getter)
+
+        try:
+            await asyncio.wait_for(getter, timeout=timeout)
+        except:
+            getter.cancel()
+            try:
+                self._waiters.remove(getter)
+            except ValueError:
+                pass
+
+            if not self.is_empty() and not getter.cancelled():
+                self.__wakeup_next()
+
+            raise
+
+    def __pop(self) -> V:
+        for lane in self._lanes:
+            if lane:
+                key, (value, _) = lane.popitem(last=False)
+                del self._priorities[key]
+                return value
+
+        raise KeyError('queue is empty')
+
     async def get(self) -> V:
         """Removes and returns an item from the queue.
 
@@ -50,34 +116,52 @@ class CancellableQueue(Generic[K, V]):
         """
 
         while self.is_empty():
-            getter = self._loop.create_future()
-            self._waiters.append(getter)
+            await self.__wait()
 
-            try:
-                await getter
-            except:
-                getter.cancel()
-                try:
-                    self._waiters.remove(getter)
-                except ValueError:
-                    pass
+        return self.__pop()
 
-                if not self.is_empty() and not getter.cancelled():
-                    self.__wakeup_next()
+    async def get_many(self, max_items: int, max_wait: Optional[float] = None) -> list[V]:
+        """Removes and returns up to ``max_items`` items from the queue, highest priority first.
 
-                raise
+        If the queue is empty then it waits until one is available. After that
+        it waits up to ``max_wait`` seconds for the batch to fill up before
+        returning whatever is there.
+        """
 
-        _, value = self._data.popitem(last=False)
-        return value
+        while self.is_empty():
+            await self.__wait()
+
+        if max_wait is not None and len(self) < max_items:
+            deadline = self._loop.time() + max_wait
+            while len(self) < max_items:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    await self.__wait(remaining)
+                except asyncio.TimeoutError:
+                    break
+
+        items = [self.__pop() for _ in range(min(max_items, len(self)))]
+        if not self.is_empty():
+            # the items left over could have woken up another getter
+            self.__wakeup_next()
+        return items
 
     def is_pending(self, key: K) -> bool:
         """Returns ``True`` if the key is currently pending in the queue."""
-        return key in self._data
+        return key in self._priorities
 
     def cancel(self, key: K) -> Optional[V]:
         """Attempts to cancel the queue item at the given key and returns it if so."""
-        return self._data.pop(key, None)
+        priority = self._priorities.pop(key, None)
+        if priority is None:
+            return None
+        value, _ = self._lanes[priority].pop(key)
+        return value
 
     def cancel_all(self) -> None:
         """Cancels all the queue items"""
-        self._data.clear()
+        self._priorities.clear()
+        for lane in self._lanes:
+            lane.clear()
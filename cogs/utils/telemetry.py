@@ -0,0 +1,296 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Iterator, Optional
+
+import asyncio
+import datetime
+import os
+import sys
+import threading
+import time
+import traceback
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class ShardTelemetry:
+    """The gateway history of a single shard.
+
+    Everything is kept in fixed size ring buffers so appending is O(1) and
+    memory use is bounded regardless of how often the shard reconnects.
+    Events older than ``max_age`` are dropped from the front as new ones
+    come in.
+    """
+
+    __slots__ = (
+        'shard_id',
+        'max_age',
+        'identifies',
+        'resumes',
+        'latencies',
+        'reconnect_durations',
+        'successful_resumes',
+        'failed_resumes',
+        '_disconnected_at',
+    )
+
+    def __init__(
+        self,
+        shard_id: int,
+        *,
+        max_events: int = 1000,
+        max_samples: int = 120,
+        max_age: datetime.timedelta = datetime.timedelta(days=7),
+    ) -> None:
+        self.shard_id: int = shard_id
+        self.max_age: datetime.timedelta = max_age
+        self.identifies: deque[datetime.datetime] = deque(maxlen=max_events)
+        self.resumes: deque[datetime.datetime] = deque(maxlen=max_events)
+        # (when, latency in seconds)
+        self.latencies: deque[tuple[datetime.datetime, float]] = deque(maxlen=max_samples)
+        # seconds between a disconnect and the session being usable again
+        self.reconnect_durations: deque[float] = deque(maxlen=max_samples)
+        self.successful_resumes: int = 0
+        self.failed_resumes: int = 0
+        self._disconnected_at: Optional[float] = None
+
+    def _expire(self, events: deque[datetime.datetime], now: datetime.datetime) -> None:
+        cutoff = now - self.max_age
+        while events and events[0] < cutoff:
+            events.popleft()
+
+    def _reconnected(self) -> None:
+        if self._disconnected_at is not None:
+            self.reconnect_durations.append(time.monotonic() - self._disconnected_at)
+            self._disconnected_at = None
+
+    def record_disconnect(self) -> None:
+        if self._disconnected_at is None:
+            self._disconnected_at = time.monotonic()
+
+    def record_identify(self, *, initial: bool) -> None:
+        now = _utcnow()
+        self._expire(self.identifies, now)
+        self.identifies.append(now)
+        if not initial and self._disconnected_at is not None:
+            # we had to IDENTIFY again so the session could not be resumed
+            self.failed_resumes += 1
+
+    def record_ready(self) -> None:
+        self._reconnected()
+
+    def record_resume(self) -> None:
+        now = _utcnow()
+        self._expire(self.resumes, now)
+        self.resumes.append(now)
+        self.successful_resumes += 1
+        self._reconnected()
+
+    def record_latency(self, latency: float) -> None:
+        self.latencies.append((_utcnow(), latency))
+
+    @staticmethod
+    def count_since(events: deque[datetime.datetime], since: datetime.datetime) -> int:
+        """Counts the events that happened after the given time."""
+        total = 0
+        # newest events are at the end so stop at the first one that's too old
+        for dt in reversed(events):
+            if dt <= since:
+                break
+            total += 1
+        return total
+
+    @property
+    def resume_success_rate(self) -> Optional[float]:
+        """Optional[:class:`float`]: The ratio of reconnects that managed to resume the session."""
+        total = self.successful_resumes + self.failed_resumes
+        if total == 0:
+            return None
+        return self.successful_resumes / total
+
+    @property
+    def average_latency(self) -> Optional[float]:
+        if not self.latencies:
+            return None
+        return sum(latency for _, latency in self.latencies) / len(self.latencies)
+
+    @property
+    def average_reconnect_duration(self) -> Optional[float]:
+        if not self.reconnect_durations:
+            return None
+        return sum(self.reconnect_durations) / len(self.reconnect_durations)
+
+
+class GatewayTelemetry:
+    """The gateway history of every shard, see :class:`ShardTelemetry`."""
+
+    def __init__(self, **options) -> None:
+        self._options = options
+        self._shards: dict[int, ShardTelemetry] = {}
+
+    def __getitem__(self, shard_id: int) -> ShardTelemetry:
+        try:
+            return self._shards[shard_id]
+        except KeyError:
+            self._shards[shard_id] = shard = ShardTelemetry(shard_id, **self._options)
+            return shard
+
+    def __iter__(self) -> Iterator[ShardTelemetry]:
+        return iter(self._shards.values())
+
+    def get(self, shard_id: int) -> Optional[ShardTelemetry]:
+        return self._shards.get(shard_id)
+
+
+def percentile(samples: list[float], p: float) -> float:
+    """Returns the ``p``-th percentile (0-100) of already sorted samples."""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(len(samples) * p / 100))
+    return samples[index]
+
+
+class LoopStall:
+    """A time the event loop was blocked for longer than the threshold."""
+
+    __slots__ = ('when', 'duration', 'location', 'cog', 'event', 'stack')
+
+    def __init__(self, *, duration: float, location: str, cog: Optional[str], event: Optional[str], stack: str) -> None:
+        self.when: datetime.datetime = _utcnow()
+        # this is updated once the loop becomes responsive again
+        self.duration: float = duration
+        self.location: str = location
+        self.cog: Optional[str] = cog
+        self.event: Optional[str] = event
+        self.stack: str = stack
+
+    @property
+    def source(self) -> str:
+        parts = [part for part in (self.cog, self.event) if part]
+        parts.append(self.location)
+        return ' / '.join(parts)
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop is at running scheduled callbacks.
+
+    A task sleeps for ``interval`` seconds at a time and records how much
+    longer than that it took to wake up. The most recent ``max_samples``
+    measurements are kept for percentiles.
+
+    A watchdog thread checks on that task. As soon as the loop is
+    ``threshold`` seconds late it grabs the stack of the loop thread and
+    tries to attribute the stall to an extension and event listener.
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = 0.25,
+        threshold: float = 0.25,
+        max_samples: int = 2400,
+        max_stalls: int = 50,
+    ) -> None:
+        self.interval: float = interval
+        self.threshold: float = threshold
+        self.lags: deque[float] = deque(maxlen=max_samples)
+        self.stalls: deque[LoopStall] = deque(maxlen=max_stalls)
+        self.total_stalls: int = 0
+        self._heartbeat: float = time.monotonic()
+        self._pending_stall: Optional[LoopStall] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task[None]] = None
+        self._stopped = threading.Event()
+        self._cogs_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def start(self) -> None:
+        """Starts monitoring the running event loop. Must be called from the loop's thread."""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._sample())
+        threading.Thread(target=self._watch, name='loop-lag-watchdog', daemon=True).start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sample(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - start - self.interval, 0.0)
+            self.lags.append(lag)
+            self._heartbeat = time.monotonic()
+
+            stall = self._pending_stall
+            if stall is not None:
+                stall.duration = lag
+                self._pending_stall = None
+
+    def _watch(self) -> None:
+        captured_for = None
+        timeout = self.interval
+        while not self._stopped.wait(timeout):
+            heartbeat = self._heartbeat
+            # the loop is stalled once it's threshold seconds late for its next heartbeat
+            deadline = heartbeat + self.interval + self.threshold
+            now = time.monotonic()
+            if now < deadline:
+                timeout = deadline - now
+                continue
+
+            timeout = self.interval
+            # only capture once per stall
+            if captured_for == heartbeat:
+                continue
+
+            captured_for = heartbeat
+            frame = sys._current_frames().get(self._loop_thread_id)  # type: ignore
+            if frame is None:
+                continue
+
+            # only the code locations are copied, the frame's locals belong to the other thread
+            stack = traceback.extract_stack(frame)
+            del frame
+            stall = self._make_stall(stack, now - heartbeat - self.interval)
+            self._pending_stall = stall
+            self.stalls.append(stall)
+            self.total_stalls += 1
+
+    def _make_stall(self, stack: traceback.StackSummary, overdue: float) -> LoopStall:
+        location = None
+        cog = None
+        event = None
+        previous = None
+        # innermost frame first
+        for summary in reversed(stack):
+            if summary.filename.startswith(self._cogs_directory):
+                module = os.path.relpath(summary.filename, self._cogs_directory)
+                if location is None:
+                    location = f'{module}:{summary.lineno} in {summary.name}'
+                if cog is None and not module.startswith('utils'):
+                    cog = 'cogs.' + os.path.splitext(module)[0].replace(os.sep, '.')
+
+            # discord.py runs every listener from _run_event, so the frame above it is the listener
+            if event is None and summary.name == '_run_event' and previous is not None:
+                event = previous.name
+
+            previous = summary
+
+        if location is None:
+            summary = stack[-1]
+            location = f'{os.path.basename(summary.filename)}:{summary.lineno} in {summary.name}'
+
+        formatted = ''.join(traceback.format_list(stack[-15:]))
+        return LoopStall(duration=overdue, location=location, cog=cog, event=event, stack=formatted)
+
+    def percentiles(self, *ps: float) -> list[float]:
+        """Returns the given lag percentiles, in seconds."""
+        samples = sorted(self.lags)
+        return [percentile(samples, p) for p in ps]
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import TypedDict
+from typing import Any, Optional, TypedDict
 
 import re
 import os
@@ -13,15 +13,24 @@ import asyncpg
 import discord
 import datetime
 import contextlib
+import multiprocessing
+import psutil
+import queue
+import signal
+import time
 
 from bot import RoboDanny
+from cogs.utils import db as database
 
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 import config
 import traceback
 
+# not `log` since that is the name of a db command below
+cluster_log = logging.getLogger('launcher.cluster')
+
 try:
     import uvloop  # type: ignore
 except ImportError:
@@ -164,9 +173,51 @@ class RemoveNoise(logging.Filter):
         return True
 
 
+class NonBlockingQueueHandler(QueueHandler):
+    """A :class:`QueueHandler` that never blocks the thread that is logging.
+
+    The message is merged with its arguments on the logging thread so later
+    changes to them don't show up, but formatting exceptions and the rest of
+    the record is left to the handlers of the :class:`QueueListener`. Once the
+    queue is filled past ``high_water`` only one in every ``sample_every``
+    records below ``WARNING`` is kept and when the queue is full records
+    are dropped. Both of these count towards ``dropped``.
+    """
+
+    def __init__(self, queue: queue.Queue[logging.LogRecord], *, high_water: int, sample_every: int = 10):
+        super().__init__(queue)
+        self.high_water: int = high_water
+        self.sample_every: int = sample_every
+        self.dropped: int = 0
+        self._sampled: int = 0
+        self.listener: Optional[QueueListener] = None
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The arguments could be mutated by the time the listener gets to the
+        # record, so the message is merged now. The record is consumed in the
+        # same process so unlike the default implementation the exception
+        # doesn't have to be formatted ahead of time to make it pickleable.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if record.levelno < logging.WARNING and self.queue.qsize() >= self.high_water:
+            self._sampled += 1
+            if self._sampled % self.sample_every != 0:
+                self.dropped += 1
+                return
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
 @contextlib.contextmanager
-def setup_logging():
+def setup_logging(filename: str = 'rdanny.log'):
     log = logging.getLogger()
+    listener = None
 
     try:
         discord.utils.setup_logging()
@@ -177,47 +228,95 @@ def setup_logging():
         logging.getLogger('discord.state').addFilter(RemoveNoise())
 
         log.setLevel(logging.INFO)
-        handler = RotatingFileHandler(filename='rdanny.log', encoding='utf-8', mode='w', maxBytes=max_bytes, backupCount=5)
+        handler = RotatingFileHandler(filename=filename, encoding='utf-8', mode='w', maxBytes=max_bytes, backupCount=5)
         dt_fmt = '%Y-%m-%d %H:%M:%S'
         fmt = logging.Formatter('[{asctime}] [{levelname:<7}] {name}: {message}', dt_fmt, style='{')
         handler.setFormatter(fmt)
         log.addHandler(handler)
 
-        yield
-    finally:
-        # __exit__
+        # Move the actual handlers behind a queue so formatting and file I/O
+        # happen on the listener thread rather than the event loop
         handlers = log.handlers[:]
         for hdlr in handlers:
-            hdlr.close()
             log.removeHandler(hdlr)
 
+        max_records = 10_000
+        log_queue: queue.Queue[logging.LogRecord] = queue.Queue(max_records)
+        queue_handler = NonBlockingQueueHandler(log_queue, high_water=max_records // 2)
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        queue_handler.listener = listener
+        log.addHandler(queue_handler)
+        listener.start()
 
-async def create_pool() -> asyncpg.Pool:
-    def _encode_jsonb(value):
-        return json.dumps(value)
+        yield
+    finally:
+        # __exit__
+        if listener is not None:
+            # flushes everything still in the queue
+            listener.stop()
+            handlers = list(listener.handlers)
+        else:
+            handlers = []
+
+        for hdlr in log.handlers[:]:
+            log.removeHandler(hdlr)
+            handlers.append(hdlr)
+
+        for hdlr in handlers:
+            hdlr.close()
 
-    def _decode_jsonb(value):
-        return json.loads(value)
 
-    async def init(con):
+async def create_pool(uri: Optional[str] = None) -> database.Pool:
+    async def init(con: database.Connection):
         await con.set_type_codec(
             'jsonb',
             schema='pg_catalog',
-            encoder=_encode_jsonb,
-            decoder=_decode_jsonb,
-            format='text',
+            encoder=database.encode_jsonb,
+            decoder=database.decode_jsonb,
+            format='binary',
         )
-
-    return await asyncpg.create_pool(
-        config.postgresql,
+        await con.warm_prepared()
+
+    async def setup(con: database.Connection):
+        # picks up queries registered after the connection was made
+        await con.warm_prepared()
+
+    # Connections are opened on demand up to max_size and closed again after
+    # sitting idle, the wrapper decides how many may be held at once.
+    min_size = getattr(config, 'postgresql_pool_min_size', 5)
+    max_size = getattr(config, 'postgresql_pool_max_size', 30)
+    pool = await asyncpg.create_pool(
+        uri or config.postgresql,
         init=init,
+        setup=setup,
+        connection_class=database.Connection,
         command_timeout=300,
-        max_size=20,
-        min_size=20,
-    )  # type: ignore
-
-
-async def run_bot():
+        max_size=max_size,
+        min_size=min_size,
+        max_inactive_connection_lifetime=120.0,
+    )
+    wrapper = database.Pool(
+        pool,  # type: ignore
+        dsn=uri or config.postgresql,
+        min_size=min_size,
+        max_size=max_size,
+        # the pool used to be a fixed 20 connections
+        initial_limit=getattr(config, 'postgresql_pool_initial_size', 20),
+    )
+    database.query_log.slow_threshold = getattr(config, 'slow_query_threshold', 0.5)
+    if getattr(config, 'explain_slow_queries', False):
+        database.query_log.explain_pool = wrapper
+    return wrapper
+
+
+async def run_bot(
+    *,
+    shard_ids: Optional[list[int]] = None,
+    shard_count: Optional[int] = None,
+    cluster_id: Optional[int] = None,
+    identify_gate: Optional[IdentifyGate] = None,
+    health: Optional[multiprocessing.Queue[ClusterHealth]] = None,
+):
     log = logging.getLogger()
     try:
         pool = await create_pool()
@@ -226,11 +325,315 @@ async def run_bot():
         log.exception('Could not set up PostgreSQL. Exiting.')
         return
 
-    async with RoboDanny() as bot:
+    async with RoboDanny(
+        shard_ids=shard_ids,
+        shard_count=shard_count,
+        cluster_id=cluster_id,
+        identify_gate=identify_gate,
+    ) as bot:
         bot.pool = pool
+        if health is not None:
+            asyncio.create_task(report_health(bot, health))
         await bot.start()
 
 
+# Cluster mode
+
+
+class IdentifyGate:
+    """Spaces out IDENTIFYs across every process of the cluster.
+
+    Each call reserves the next free slot, ``interval`` seconds after the
+    previous one, and waits for it. The lock is only held while reserving
+    so waiting does not block the other processes.
+    """
+
+    def __init__(self, context: multiprocessing.context.BaseContext, interval: float = 5.0) -> None:
+        self.interval: float = interval
+        self._lock = context.Lock()
+        self._next_slot = context.Value('d', 0.0, lock=False)
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next_slot.value)
+            self._next_slot.value = slot + self.interval
+        return slot - now
+
+    async def wait(self) -> None:
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class ClusterHealth(TypedDict):
+    cluster_id: int
+    pid: int
+    shard_ids: list[int]
+    ready: bool
+    guilds: int
+    latency: float
+    loop_lag_p99: float
+    memory: int
+    timestamp: float
+
+
+async def report_health(bot: RoboDanny, health: multiprocessing.Queue[ClusterHealth], interval: float = 15.0):
+    process = psutil.Process()
+    while not bot.is_closed():
+        latency = bot.latency
+        health_data: ClusterHealth = {
+            'cluster_id': bot.cluster_id or 0,
+            'pid': os.getpid(),
+            'shard_ids': bot.shard_ids or [],
+            'ready': bot.is_ready(),
+            'guilds': len(bot.guilds),
+            'latency': latency if latency == latency else -1.0,  # nan before the first heartbeat
+            'loop_lag_p99': bot.loop_monitor.percentiles(99)[0],
+            'memory': process.memory_full_info().uss,
+            'timestamp': time.time(),
+        }
+        try:
+            health.put_nowait(health_data)
+        except queue.Full:
+            pass
+        await asyncio.sleep(interval)
+
+
+def run_worker(
+    cluster_id: int,
+    shard_ids: list[int],
+    shard_count: int,
+    identify_gate: IdentifyGate,
+    health: multiprocessing.Queue[ClusterHealth],
+):
+    # turn SIGTERM from the supervisor into a normal shutdown
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    with setup_logging(f'rdanny-cluster-{cluster_id}.log'):
+        try:
+            asyncio.run(
+                run_bot(
+                    shard_ids=shard_ids,
+                    shard_count=shard_count,
+                    cluster_id=cluster_id,
+                    identify_gate=identify_gate,
+                    health=health,
+                )
+            )
+        except KeyboardInterrupt:
+            pass
+
+
+class Worker:
+    __slots__ = ('cluster_id', 'shard_ids', 'process', 'started_at', 'restarts', 'backoff', 'restart_at', 'health')
+
+    def __init__(self, cluster_id: int, shard_ids: list[int]) -> None:
+        self.cluster_id: int = cluster_id
+        self.shard_ids: list[int] = shard_ids
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.started_at: float = 0.0
+        self.restarts: int = 0
+        self.backoff: float = 1.0
+        self.restart_at: Optional[float] = None
+        self.health: Optional[ClusterHealth] = None
+
+
+class Supervisor:
+    """Runs the shards across several worker processes and restarts them when they crash.
+
+    Each worker runs a contiguous range of shard IDs. Workers report their
+    health over a queue and the supervisor logs an aggregate of it every
+    ``report_interval`` seconds and writes it to ``health_file``.
+
+    A worker that exits is restarted after a delay that doubles with every
+    crash, up to ``max_backoff`` seconds. The delay is reset once a worker
+    has stayed up for ``stable_after`` seconds.
+    """
+
+    def __init__(
+        self,
+        shard_count: int,
+        workers: int,
+        *,
+        report_interval: float = 60.0,
+        health_file: str = 'cluster_health.json',
+        max_backoff: float = 60.0,
+        stable_after: float = 300.0,
+    ) -> None:
+        self.shard_count: int = shard_count
+        self.report_interval: float = report_interval
+        self.health_file: str = health_file
+        self.max_backoff: float = max_backoff
+        self.stable_after: float = stable_after
+        self.context = multiprocessing.get_context('spawn')
+        self.identify_gate: IdentifyGate = IdentifyGate(self.context)
+        self.health: multiprocessing.Queue[ClusterHealth] = self.context.Queue(1000)
+        self.workers: list[Worker] = [
+            Worker(cluster_id, shard_ids) for cluster_id, shard_ids in enumerate(self.split_shards(shard_count, workers))
+        ]
+        self._stopping = False
+
+    @staticmethod
+    def split_shards(shard_count: int, workers: int) -> list[list[int]]:
+        """Splits the shard IDs into at most ``workers`` contiguous ranges of nearly equal size."""
+        workers = min(workers, shard_count)
+        size, extra = divmod(shard_count, workers)
+        ranges = []
+        start = 0
+        for index in range(workers):
+            end = start + size + (index < extra)
+            ranges.append(list(range(start, end)))
+            start = end
+        return ranges
+
+    def start_worker(self, worker: Worker) -> None:
+        process = self.context.Process(
+            target=run_worker,
+            args=(worker.cluster_id, worker.shard_ids, self.shard_count, self.identify_gate, self.health),
+            name=f'cluster-{worker.cluster_id}',
+        )
+        process.start()
+        worker.process = process
+        worker.started_at = time.monotonic()
+        worker.restart_at = None
+        cluster_log.info('Started cluster %s (PID %s) with shards %s', worker.cluster_id, process.pid, worker.shard_ids)
+
+    def check_workers(self) -> None:
+        now = time.monotonic()
+        for worker in self.workers:
+            process = worker.process
+            if process is not None and process.is_alive():
+                if worker.backoff > 1.0 and now - worker.started_at >= self.stable_after:
+                    worker.backoff = 1.0
+                continue
+
+            if worker.restart_at is None:
+                exitcode = process.exitcode if process is not None else None
+                worker.restart_at = now + worker.backoff
+                cluster_log.warning(
+                    'Cluster %s exited with code %s, restarting in %.0fs', worker.cluster_id, exitcode, worker.backoff
+                )
+                worker.backoff = min(worker.backoff * 2, self.max_backoff)
+                worker.health = None
+            elif now >= worker.restart_at:
+                worker.restarts += 1
+                self.start_worker(worker)
+
+    def drain_health(self) -> None:
+        while True:
+            try:
+                health = self.health.get_nowait()
+            except queue.Empty:
+                return
+            self.workers[health['cluster_id']].health = health
+
+    def report(self) -> None:
+        reports = [worker.health for worker in self.workers if worker.health is not None]
+        ready = sum(report['ready'] for report in reports)
+        guilds = sum(report['guilds'] for report in reports)
+        memory = sum(report['memory'] for report in reports)
+        worst_latency = max((report['latency'] for report in reports), default=-1.0)
+        worst_lag = max((report['loop_lag_p99'] for report in reports), default=0.0)
+        cluster_log.info(
+            'Cluster health: %s/%s workers ready, %s guilds, %.2f MiB, worst latency %.2fms, worst loop lag p99 %.2fms',
+            ready,
+            len(self.workers),
+            guilds,
+            memory / 1024**2,
+            worst_latency * 1000,
+            worst_lag * 1000,
+        )
+
+        data = {
+            'shard_count': self.shard_count,
+            'timestamp': time.time(),
+            'workers': [
+                {
+                    'cluster_id': worker.cluster_id,
+                    'shard_ids': worker.shard_ids,
+                    'alive': worker.process is not None and worker.process.is_alive(),
+                    'restarts': worker.restarts,
+                    'health': worker.health,
+                }
+                for worker in self.workers
+            ],
+        }
+        temp = f'{self.health_file}.{uuid.uuid4()}.tmp'
+        with open(temp, 'w', encoding='utf-8') as fp:
+            json.dump(data, fp)
+        os.replace(temp, self.health_file)
+
+    def stop(self, *args: Any) -> None:
+        self._stopping = True
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for worker in self.workers:
+            self.start_worker(worker)
+
+        next_report = time.monotonic() + self.report_interval
+        while not self._stopping:
+            time.sleep(1.0)
+            self.drain_health()
+            self.check_workers()
+            if time.monotonic() >= next_report:
+                self.report()
+                next_report += self.report_interval
+
+        cluster_log.info('Shutting down %s workers', len(self.workers))
+        for worker in self.workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.process.terminate()
+
+        for worker in self.workers:
+            if worker.process is not None:
+                worker.process.join(timeout=30.0)
+                if worker.process.is_alive():
+                    cluster_log.warning('Cluster %s did not shut down in time, killing it', worker.cluster_id)
+                    worker.process.kill()
+
+
+async def fetch_recommended_shard_count() -> int:
+    http = discord.http.HTTPClient(asyncio.get_running_loop())
+    try:
+        await http.static_login(config.token)
+        data = await http.request(discord.http.Route('GET', '/gateway/bot'))
+        return data['shards']
+    finally:
+        await http.close()
+
+
+async def run_loadtest(
+    *,
+    uri: str,
+    rate: float,
+    total: int,
+    guilds: int,
+    members: int,
+    command_ratio: float,
+    seed: int,
+    record: Optional[str],
+    replay: Optional[str],
+):
+    from loadtest import LoadTest, SyntheticGateway, generate, load_recording
+
+    pool = await create_pool(uri)
+    gateway = SyntheticGateway(guilds=guilds, members=members, command_ratio=command_ratio, seed=seed)
+    if replay is not None:
+        events = load_recording(replay, gateway)
+    else:
+        events = generate(gateway, total, record)
+
+    async with RoboDanny() as bot:
+        bot.pool = pool
+        test = LoadTest(bot, gateway, rate=rate)
+        boot_time = await test.boot()
+        click.echo(f'Booted in {boot_time * 1000:.2f}ms with {len(bot.guilds)} guilds, feeding events...')
+        report = await test.run(events)
+        click.echo(report.render())
+
+
 @click.group(invoke_without_command=True, options_metavar='[options]')
 @click.pass_context
 def main(ctx):
@@ -240,6 +643,77 @@ def main(ctx):
             asyncio.run(run_bot())
 
 
+@main.command(short_help='runs the bot across several processes', options_metavar='[options]')
+@click.option('--workers', default=os.cpu_count() or 1, show_default=True, help='How many worker processes to run.')
+@click.option('--shards', 'shard_count', type=int, help='Total number of shards, defaults to what Discord recommends.')
+@click.option('--report-interval', default=60.0, show_default=True, help='Seconds between aggregated health reports.')
+def cluster(workers, shard_count, report_interval):
+    """Runs the bot as a cluster of worker processes.
+
+    Every worker runs its own event loop with a contiguous range of the
+    shards. The blacklist and prefixes are kept in sync between them over
+    PostgreSQL LISTEN/NOTIFY and IDENTIFYs are spaced out across all of them.
+    """
+    with setup_logging('rdanny-supervisor.log'):
+        if shard_count is None:
+            shard_count = asyncio.run(fetch_recommended_shard_count())
+
+        Supervisor(shard_count, workers, report_interval=report_interval).run()
+
+
+@main.command(short_help='benchmarks the bot with synthetic events', options_metavar='[options]')
+@click.option('--database', 'uri', required=True, help='PostgreSQL URI of a local database, never the configured one.')
+@click.option('--rate', default=200.0, show_default=True, help='Events to feed per second.')
+@click.option('--events', 'total', default=5000, show_default=True, help='How many events to generate.')
+@click.option('--guilds', default=10, show_default=True, help='How many synthetic guilds to create.')
+@click.option('--members', default=200, show_default=True, help='How many members each synthetic guild has.')
+@click.option('--command-ratio', default=0.1, show_default=True, help='The ratio of messages that invoke a command.')
+@click.option('--seed', default=0, show_default=True, help='Seed for the generated events.')
+@click.option('--record', type=click.Path(dir_okay=False), help='Save the generated events to this file.')
+@click.option('--replay', type=click.Path(exists=True, dir_okay=False), help='Replay events saved with --record.')
+def loadtest(uri, rate, total, guilds, members, command_ratio, seed, record, replay):
+    """Runs the bot against synthetic gateway events without connecting to Discord.
+
+    REST calls are answered with canned responses and requests to any other
+    service are refused, but PostgreSQL is real.
+    Once every event has been handled this reports the throughput, the
+    latency of each event handler, the number of queries and HTTP requests
+    made and how much memory grew.
+    """
+    if uri == config.postgresql:
+        raise click.BadParameter('refusing to run against the configured database', param_hint='--database')
+
+    with setup_logging():
+        asyncio.run(
+            run_loadtest(
+                uri=uri,
+                rate=rate,
+                total=total,
+                guilds=guilds,
+                members=members,
+                command_ratio=command_ratio,
+                seed=seed,
+                record=record,
+                replay=replay,
+            )
+        )
+
+
+@main.command(short_help='runs micro benchmarks of the utilities', options_metavar='[options]')
+@click.argument('suite', type=click.Choice(['fuzzy', 'scorers', 'journal', 'spam', 'logging', 'jsonb', 'expiring']))
+@click.option('--size', default=30000, show_default=True, help='How many entries the largest inventory has.')
+@click.option('--queries', default=20, show_default=True, help='How many queries to time each operation with.')
+@click.option('--seed', default=0, show_default=True, help='Seed for the generated inventories and queries.')
+def benchmark(suite, size, queries, seed):
+    """Times the hot helpers in cogs.utils against realistically sized inventories.
+
+    Results are checked against the code they replace before being timed.
+    """
+    from benchmarks import SUITES
+
+    click.echo(SUITES[suite](size=size, queries=queries, seed=seed).render())
+
+
 @main.group(short_help='database stuff', options_metavar='[options]')
 def db():
     pass
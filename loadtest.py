@@ -0,0 +1,601 @@
+"""Drives RoboDanny with synthetic gateway events without connecting to Discord.
+
+The bot is logged in against :class:`FakeHTTP`, which answers every REST
+call with a canned payload, and events are fed straight into the gateway
+parsers as if they came from the websocket. The bot's aiohttp session is
+replaced by one that refuses to connect anywhere so cogs talking to other
+services fail fast instead of reaching them. PostgreSQL is real so this
+should be pointed at a local database.
+"""
+
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from typing import IO, TYPE_CHECKING, Any, AsyncIterator, Iterable, Optional
+
+import asyncio
+import datetime
+import json
+import random
+import time
+
+import aiohttp
+import discord
+import psutil
+from discord.webhook.async_ import AsyncWebhookAdapter, async_context
+
+from cogs.utils import db
+from cogs.utils.formats import TabularData
+from cogs.utils.telemetry import percentile
+
+if TYPE_CHECKING:
+    from discord.http import Route
+    from bot import RoboDanny
+
+
+def _iso(dt: datetime.datetime) -> str:
+    return dt.isoformat()
+
+
+class Snowflakes:
+    """Generates unique, increasing snowflakes for the current time."""
+
+    def __init__(self) -> None:
+        self._last: int = 0
+
+    def __call__(self) -> str:
+        self._last = max(discord.utils.time_snowflake(discord.utils.utcnow()), self._last + 1)
+        return str(self._last)
+
+
+class FakeHTTP:
+    """Answers the REST calls the bot makes with canned payloads.
+
+    This covers both :class:`discord.http.HTTPClient` and the webhook
+    adapter used for interaction responses. Every request is counted by
+    its route so the report can show how many calls a real run would
+    have made.
+    """
+
+    def __init__(self, bot_user: dict[str, Any], owner: dict[str, Any], snowflake: Snowflakes) -> None:
+        self.bot_user: dict[str, Any] = bot_user
+        self.owner: dict[str, Any] = owner
+        self.snowflake: Snowflakes = snowflake
+        self.requests: Counter[str] = Counter()
+
+    # enough of a PNG for discord.utils to recognise it when it's uploaded again
+    ASSET: bytes = b'\x89PNG\r\n\x1a\n' + bytes(32)
+
+    def install(self, http: discord.http.HTTPClient) -> None:
+        http.request = self.request  # type: ignore
+        http.get_from_cdn = self.get_from_cdn  # type: ignore
+        # event tasks are created after this, so they inherit the adapter
+        async_context.set(_FakeWebhookAdapter(self))
+
+    async def request(self, route: Route, *, files: Any = None, form: Any = None, **kwargs: Any) -> Any:
+        return self.respond(route, kwargs.get('json'))
+
+    async def get_from_cdn(self, url: str) -> bytes:
+        self.requests['GET cdn'] += 1
+        return self.ASSET
+
+    def respond(self, route: Route, payload: Optional[dict[str, Any]]) -> Any:
+        key = f'{route.method} {route.path}'
+        self.requests[key] += 1
+        payload = payload or {}
+
+        if key == 'GET /users/@me':
+            return self.bot_user
+        if key == 'GET /oauth2/applications/@me':
+            return {
+                'id': self.bot_user['id'],
+                'name': self.bot_user['username'],
+                'description': '',
+                'icon': None,
+                'bot_public': True,
+                'bot_require_code_grant': False,
+                'owner': self.owner,
+                'verify_key': '',
+                'flags': 0,
+            }
+        if key == 'POST /users/@me/channels':
+            return {
+                'id': self.snowflake(),
+                'type': 1,
+                'recipients': [{**self.owner, 'id': str(payload.get('recipient_id'))}],
+            }
+        if route.path.endswith('/callback'):
+            return {'interaction': {'id': str(route.webhook_id), 'type': 2}}
+        if route.method == 'DELETE' or '/reactions' in route.path:
+            return None
+        if route.path.endswith(('/messages', '/messages/{message_id}', '/messages/@original', '{webhook_token}')):
+            return self.message(route, payload)
+        return None
+
+    def message(self, route: Route, payload: dict[str, Any]) -> dict[str, Any]:
+        return {
+            'id': self.snowflake(),
+            'channel_id': str(getattr(route, 'channel_id', 0)),
+            'author': self.bot_user,
+            'content': payload.get('content') or '',
+            'timestamp': _iso(discord.utils.utcnow()),
+            'edited_timestamp': None,
+            'tts': False,
+            'mention_everyone': False,
+            'mentions': [],
+            'mention_roles': [],
+            'attachments': [],
+            'embeds': payload.get('embeds') or [],
+            'components': payload.get('components') or [],
+            'pinned': False,
+            'type': 0,
+            'flags': 0,
+        }
+
+
+class _FakeWebhookAdapter(AsyncWebhookAdapter):
+    def __init__(self, http: FakeHTTP) -> None:
+        super().__init__()
+        self.http: FakeHTTP = http
+
+    async def request(self, route: Route, session: Any, *, payload: Optional[dict[str, Any]] = None, **kwargs: Any) -> Any:
+        return self.http.respond(route, payload)
+
+
+class OfflineConnector(aiohttp.BaseConnector):
+    """An aiohttp connector that refuses every connection.
+
+    Cogs post statistics, scrape SplatNet and sync Open Collective through
+    ``bot.session``, none of which should happen during a load test. The
+    refused requests are counted by host for the report.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.requests: Counter[str] = Counter()
+
+    async def _create_connection(self, req: aiohttp.ClientRequest, traces: Any, timeout: Any) -> Any:
+        self.requests[f'{req.method} {req.url.host}'] += 1
+        # not an OSError, cogs treat those as transient and retry straight away
+        raise aiohttp.ClientConnectionError(f'load test refused to connect to {req.url.host}')
+
+
+class SyntheticGateway:
+    """Builds synthetic guilds and a random stream of gateway events for them.
+
+    The same ``seed`` always produces the same mix of guilds, events and
+    message contents so that runs can be compared against each other. IDs
+    are based on the current time so a stream can be saved with
+    :func:`generate` and replayed with :func:`load_recording` instead.
+    """
+
+    # event type: relative weight
+    DEFAULT_MIX: dict[str, int] = {
+        'MESSAGE_CREATE': 80,
+        'MESSAGE_REACTION_ADD': 10,
+        'GUILD_MEMBER_ADD': 5,
+        'INTERACTION_CREATE': 5,
+    }
+
+    DEFAULT_COMMANDS: tuple[str, ...] = ('?charinfo abc', '?choose a b c', '?uptime', '?about', '?tag test')
+
+    CHATTER: tuple[str, ...] = (
+        'hello',
+        'does anyone know how to use discord.py',
+        'https://example.com',
+        'lol',
+        'this is a somewhat longer message that goes on for a while to look like actual conversation',
+    )
+
+    def __init__(
+        self,
+        *,
+        guilds: int = 10,
+        channels: int = 5,
+        members: int = 200,
+        command_ratio: float = 0.1,
+        commands: Iterable[str] = DEFAULT_COMMANDS,
+        mix: Optional[dict[str, int]] = None,
+        seed: int = 0,
+    ) -> None:
+        self.random = random.Random(seed)
+        self.snowflake = Snowflakes()
+        self.command_ratio: float = command_ratio
+        self.commands: list[str] = list(commands)
+        self.mix: dict[str, int] = mix or self.DEFAULT_MIX
+        self.bot_user: dict[str, Any] = self.user(bot=True)
+        self.owner: dict[str, Any] = self.user()
+        self.application_commands: list[str] = []
+        self.guilds: list[dict[str, Any]] = [self.guild(channels, members) for _ in range(guilds)]
+
+    def user(self, *, bot: bool = False) -> dict[str, Any]:
+        user_id = self.snowflake()
+        return {
+            'id': user_id,
+            'username': f'user-{user_id[-6:]}',
+            'global_name': None,
+            'discriminator': '0',
+            'avatar': None,
+            'bot': bot,
+        }
+
+    def member(self, user: dict[str, Any]) -> dict[str, Any]:
+        return {
+            'user': user,
+            'roles': [],
+            'joined_at': _iso(discord.utils.utcnow()),
+            'deaf': False,
+            'mute': False,
+            'flags': 0,
+        }
+
+    def guild(self, channels: int, members: int) -> dict[str, Any]:
+        guild_id = self.snowflake()
+        users = [self.owner] + [self.user() for _ in range(members)]
+        return {
+            'id': guild_id,
+            'name': f'guild-{guild_id[-6:]}',
+            'icon': None,
+            'owner_id': self.owner['id'],
+            'member_count': len(users) + 1,
+            'features': [],
+            'emojis': [],
+            'stickers': [],
+            'premium_tier': 0,
+            'roles': [
+                {
+                    'id': guild_id,
+                    'name': '@everyone',
+                    'permissions': str(discord.Permissions.general().value | discord.Permissions.text().value),
+                    'position': 0,
+                    'color': 0,
+                    'hoist': False,
+                    'managed': False,
+                    'mentionable': False,
+                }
+            ],
+            'channels': [
+                {
+                    'id': self.snowflake(),
+                    'type': 0,
+                    'name': f'channel-{index}',
+                    'position': index,
+                    'permission_overwrites': [],
+                    'nsfw': False,
+                }
+                for index in range(channels)
+            ],
+            'members': [self.member(user) for user in users + [self.bot_user]],
+        }
+
+    def _pick(self) -> tuple[dict[str, Any], dict[str, Any], dict[str, Any]]:
+        guild = self.random.choice(self.guilds)
+        channel = self.random.choice(guild['channels'])
+        member = self.random.choice(guild['members'][:-1])
+        return guild, channel, member
+
+    def message_create(self) -> dict[str, Any]:
+        guild, channel, member = self._pick()
+        if self.commands and self.random.random() < self.command_ratio:
+            content = self.random.choice(self.commands)
+        else:
+            content = self.random.choice(self.CHATTER)
+
+        return {
+            'id': self.snowflake(),
+            'channel_id': channel['id'],
+            'guild_id': guild['id'],
+            'author': member['user'],
+            'member': {key: value for key, value in member.items() if key != 'user'},
+            'content': content,
+            'timestamp': _iso(discord.utils.utcnow()),
+            'edited_timestamp': None,
+            'tts': False,
+            'mention_everyone': False,
+            'mentions': [],
+            'mention_roles': [],
+            'attachments': [],
+            'embeds': [],
+            'pinned': False,
+            'type': 0,
+            'flags': 0,
+        }
+
+    def message_reaction_add(self) -> dict[str, Any]:
+        guild, channel, member = self._pick()
+        return {
+            'user_id': member['user']['id'],
+            'channel_id': channel['id'],
+            'message_id': self.snowflake(),
+            'guild_id': guild['id'],
+            'member': member,
+            'emoji': {'id': None, 'name': self.random.choice(('\N{WHITE MEDIUM STAR}', '\N{THUMBS UP SIGN}'))},
+            'type': 0,
+            'burst': False,
+        }
+
+    def guild_member_add(self) -> dict[str, Any]:
+        guild = self.random.choice(self.guilds)
+        return {'guild_id': guild['id'], **self.member(self.user())}
+
+    def interaction_create(self) -> Optional[dict[str, Any]]:
+        if not self.application_commands:
+            return None
+
+        guild, channel, member = self._pick()
+        return {
+            'id': self.snowflake(),
+            'application_id': self.bot_user['id'],
+            'type': 2,
+            'token': 'synthetic',
+            'version': 1,
+            'guild_id': guild['id'],
+            'channel_id': channel['id'],
+            'channel': {'id': channel['id'], 'type': 0},
+            'member': {**member, 'permissions': guild['roles'][0]['permissions']},
+            'app_permissions': guild['roles'][0]['permissions'],
+            'locale': 'en-US',
+            'guild_locale': 'en-US',
+            'entitlements': [],
+            'authorizing_integration_owners': {},
+            'attachment_size_limit': 8 * 1024 * 1024,
+            'data': {
+                'id': self.snowflake(),
+                'name': self.random.choice(self.application_commands),
+                'type': 1,
+                'options': [],
+            },
+        }
+
+    def events(self, total: int) -> Iterable[dict[str, Any]]:
+        """Yields ``total`` events in the ``{"t": ..., "d": ...}`` form the gateway uses."""
+        names = list(self.mix)
+        weights = list(self.mix.values())
+        produced = 0
+        while produced < total:
+            name = self.random.choices(names, weights)[0]
+            data = getattr(self, name.lower())()
+            if data is not None:
+                produced += 1
+                yield {'t': name, 'd': data}
+
+
+class HandlerStats:
+    __slots__ = ('calls', 'errors', 'durations')
+
+    def __init__(self) -> None:
+        self.calls: int = 0
+        self.errors: int = 0
+        self.durations: list[float] = []
+
+
+class LoadTest:
+    """Replays events into a logged in but disconnected :class:`RoboDanny`.
+
+    Events are fed at ``rate`` events per second. Once they have all been
+    fed the run waits up to ``drain_timeout`` seconds for the handlers
+    they started to finish before reporting.
+    """
+
+    def __init__(self, bot: RoboDanny, gateway: SyntheticGateway, *, rate: float, drain_timeout: float = 30.0) -> None:
+        self.bot: RoboDanny = bot
+        self.gateway: SyntheticGateway = gateway
+        self.rate: float = rate
+        self.drain_timeout: float = drain_timeout
+        self.http: FakeHTTP = FakeHTTP(gateway.bot_user, gateway.owner, gateway.snowflake)
+        self.connector: OfflineConnector = OfflineConnector()
+        self.handlers: defaultdict[str, HandlerStats] = defaultdict(HandlerStats)
+        self.events: Counter[str] = Counter()
+        self.in_flight: int = 0
+        self._drained = asyncio.Event()
+        self._process = psutil.Process()
+
+    async def boot(self) -> float:
+        """Logs the bot in and makes the synthetic guilds available. Returns how long it took."""
+        bot = self.bot
+        start = time.perf_counter()
+        self.http.install(bot.http)
+        # has to be in place before setup_hook so cog_load never sees a real session
+        bot.session = aiohttp.ClientSession(connector=self.connector)
+        bot.shard_count = bot._connection.shard_count = 1
+        await bot.login('synthetic')
+
+        state = bot._connection
+        for data in self.gateway.guilds:
+            state._add_guild_from_data(data)  # type: ignore
+
+        self.gateway.application_commands = [
+            command.name
+            for command in bot.tree.get_commands(type=discord.AppCommandType.chat_input)
+            if isinstance(command, discord.app_commands.Command) and not any(p.required for p in command.parameters)
+        ]
+
+        bot._run_event = self._run_event  # type: ignore
+        bot._ready.set()
+        bot.dispatch('ready')
+        return time.perf_counter() - start
+
+    async def _run_event(self, coro: Any, event_name: str, *args: Any, **kwargs: Any) -> None:
+        stats = self.handlers[getattr(coro, '__qualname__', event_name)]
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await coro(*args, **kwargs)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            stats.errors += 1
+            try:
+                await self.bot.on_error(event_name, *args, **kwargs)
+            except asyncio.CancelledError:
+                pass
+        finally:
+            stats.calls += 1
+            stats.durations.append(time.perf_counter() - start)
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._drained.set()
+
+    def feed(self, event: dict[str, Any]) -> None:
+        name = event['t']
+        data = event['d']
+        state = self.bot._connection
+        self.events[name] += 1
+        self.bot.dispatch('socket_event_type', name)
+        if name == 'GUILD_CREATE':
+            state._add_guild_from_data(data)
+            return
+
+        try:
+            parser = state.parsers[name]
+        except KeyError:
+            return
+        parser(data)
+
+    async def run(self, events: AsyncIterator[dict[str, Any]]) -> LoadReport:
+        memory_before = self._process.memory_full_info().uss
+        queries_before = db.query_log.total_calls
+        fed = 0
+        start = time.perf_counter()
+        async for event in events:
+            self.feed(event)
+            fed += 1
+            ahead = start + fed / self.rate - time.perf_counter()
+            if ahead > 0.001:
+                await asyncio.sleep(ahead)
+            elif fed % 100 == 0:
+                await asyncio.sleep(0)
+
+        feed_time = time.perf_counter() - start
+        if self.in_flight:
+            self._drained.clear()
+            try:
+                await asyncio.wait_for(self._drained.wait(), timeout=self.drain_timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        return LoadReport(
+            events=self.events,
+            feed_time=feed_time,
+            total_time=time.perf_counter() - start,
+            handlers=self.handlers,
+            pending=self.in_flight,
+            requests=self.http.requests,
+            refused=self.connector.requests,
+            queries=db.query_log.total_calls - queries_before,
+            memory_growth=self._process.memory_full_info().uss - memory_before,
+            loop_lag=self.bot.loop_monitor.percentiles(50, 99),
+        )
+
+
+class LoadReport:
+    def __init__(
+        self,
+        *,
+        events: Counter[str],
+        feed_time: float,
+        total_time: float,
+        handlers: dict[str, HandlerStats],
+        pending: int,
+        requests: Counter[str],
+        refused: Counter[str],
+        queries: int,
+        memory_growth: int,
+        loop_lag: list[float],
+    ) -> None:
+        self.events: Counter[str] = events
+        self.feed_time: float = feed_time
+        self.total_time: float = total_time
+        self.handlers: dict[str, HandlerStats] = handlers
+        self.pending: int = pending
+        self.requests: Counter[str] = requests
+        self.refused: Counter[str] = refused
+        self.queries: int = queries
+        self.memory_growth: int = memory_growth
+        self.loop_lag: list[float] = loop_lag
+
+    def render(self) -> str:
+        total = sum(self.events.values())
+        lag_p50, lag_p99 = self.loop_lag
+        lines = [
+            f'Events: {total} in {self.feed_time:.2f}s ({total / self.feed_time:.1f}/s fed, '
+            f'{total / self.total_time:.1f}/s processed), {self.pending} handlers still pending',
+            ', '.join(f'{name}: {count}' for name, count in self.events.most_common()),
+            f'DB Queries: {self.queries} ({self.queries / total:.2f} per event)',
+            f'HTTP Requests: {sum(self.requests.values())} ({sum(self.refused.values())} outside Discord refused)',
+            f'Memory Growth: {self.memory_growth / 1024**2:.2f} MiB',
+            f'Loop Lag: p50 {lag_p50 * 1000:.2f}ms, p99 {lag_p99 * 1000:.2f}ms',
+            '',
+        ]
+
+        table = TabularData()
+        table.set_columns(['Handler', 'Calls', 'Errors', 'p50', 'p99', 'max'])
+        for name, stats in sorted(self.handlers.items(), key=lambda t: sum(t[1].durations), reverse=True):
+            p50, p99, worst = (percentile(sorted(stats.durations), p) for p in (50, 99, 100))
+            table.add_row(
+                [name, stats.calls, stats.errors, f'{p50 * 1000:.2f}ms', f'{p99 * 1000:.2f}ms', f'{worst * 1000:.2f}ms']
+            )
+        lines.append(table.render())
+
+        if self.requests:
+            table = TabularData()
+            table.set_columns(['Route', 'Requests'])
+            table.add_rows(self.requests.most_common())
+            lines.append(table.render())
+
+        if self.refused:
+            table = TabularData()
+            table.set_columns(['Refused', 'Requests'])
+            table.add_rows(self.refused.most_common())
+            lines.append(table.render())
+        return '\n'.join(lines)
+
+
+async def _replay(fp: IO[str], first: Optional[str]) -> AsyncIterator[dict[str, Any]]:
+    with fp:
+        if first is not None:
+            yield json.loads(first)
+        for line in fp:
+            if line.strip():
+                yield json.loads(line)
+
+
+def load_recording(path: str, gateway: SyntheticGateway) -> AsyncIterator[dict[str, Any]]:
+    """Loads a stream written by :func:`generate` and returns its events.
+
+    The file has one ``{"t": ..., "d": ...}`` JSON object per line. An
+    ``IDENTITY`` line sets the bot user and owner and the ``GUILD_CREATE``
+    lines that follow it replace the guilds of the gateway, so both have to
+    come before the events.
+    """
+    fp = open(path, 'r', encoding='utf-8')
+    gateway.guilds = []
+    for line in fp:
+        if not line.strip():
+            continue
+
+        event = json.loads(line)
+        if event['t'] == 'IDENTITY':
+            gateway.bot_user = event['d']['user']
+            gateway.owner = event['d']['owner']
+        elif event['t'] == 'GUILD_CREATE':
+            gateway.guilds.append(event['d'])
+        else:
+            return _replay(fp, line)
+    return _replay(fp, None)
+
+
+async def generate(gateway: SyntheticGateway, total: int, record: Optional[str] = None) -> AsyncIterator[dict[str, Any]]:
+    """Yields synthetic events, optionally writing them to a file to be loaded with :func:`load_recording`."""
+    if record is None:
+        for event in gateway.events(total):
+            yield event
+        return
+
+    with open(record, 'w', encoding='utf-8') as fp:
+        fp.write(json.dumps({'t': 'IDENTITY', 'd': {'user': gateway.bot_user, 'owner': gateway.owner}}) + '\n')
+        for data in gateway.guilds:
+            fp.write(json.dumps({'t': 'GUILD_CREATE', 'd': data}) + '\n')
+        for event in gateway.events(total):
+            fp.write(json.dumps(event) + '\n')
+            yield event